@@ -1,21 +1,30 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from logging import Logger
 import logging
-from typing import List
-from app.sdk.models import KernelPlancksterSourceData, BaseJobState, JobOutput, ProtocolEnum
+import multiprocessing
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from app.spatial import FirePointIndex, positions_near_fires
+from app.sdk.models import DownloadResult, KernelPlancksterSourceData, BaseJobState, JobOutput, ProtocolEnum
 from app.sdk.scraped_data_repository import ScrapedDataRepository,  KernelPlancksterSourceData
+from app.columnar import read_feed, read_sentinel, write_parquet
+from app.manifest import AugmentationManifest
+from app.feed_index import FeedDateIndex
+from app.feed_stream import StreamedFeed
+from app.sdk.concurrency import BoundedPipeline
+from app.sdk.download_cache import file_sha256
+from app.source_routes import JobSourceRoutes, SENTINEL_KIND, SOURCE_ROUTES
+from app.warm_state import WarmState
+from app.sdk.metrics import StageMetrics
+from app.matching import DateIndexedFeed, SocialFeed, join_date_rows, sentinel_date_from_file_name, sentinel_date_key, sentinel_rows
+import gzip
+import hashlib
+import io
 import time
 import os
 import json
 import pandas as pd
-from dotenv import load_dotenv
-from models import PipelineRequestModel
-from numpy import ndarray
-import numpy as np
-import cv2
-import tempfile
-
-# Load environment variables
-load_dotenv()
+from models import AugmentationOptions
 
 
 def augment(
@@ -23,12 +32,17 @@ def augment(
     tracer_id: str,
     scraped_data_repository: ScrapedDataRepository,
     log_level: Logger,
-    work_dir: str
-
+    work_dir: str,
+    options: AugmentationOptions | None = None,
+    warm_state: WarmState | None = None,
 
 ) -> JobOutput:
 
 
+    options = options or AugmentationOptions()
+    metrics = StageMetrics()
+    start_time = time.time()
+
     try:
         logger = logging.getLogger(__name__)
         logging.basicConfig(level=log_level)
@@ -41,164 +55,593 @@ def augment(
         job_state = BaseJobState.RUNNING
         #job.touch()
 
-        start_time = time.time()  # Record start time for response time measurement #TODO: decide wether we want this or not
         #Download all relevant files from minio
         kernel_planckster = scraped_data_repository.kernel_planckster
-        source_list = kernel_planckster.list_all_source_data()
-
-        minimum_info = {"sentinel": False, "twitter": False, "telegram": False}
-        for source in source_list:
-            res = download_source_if_relevant(source, job_id, tracer_id, scraped_data_repository, work_dir)
-            if res["sentinel"] == True: minimum_info["sentinel"] = True; 
-            elif res["twitter"] == True: minimum_info["twitter"] = True; 
-            elif res["telegram"] == True: minimum_info["telegram"] = True
+        # only this job's sources are listed, page by page, and downloads start with the first page
+        source_pages = kernel_planckster.iter_source_data(relevant_source_prefixes(job_id, tracer_id), page_size=options.list_page_size)
+
+        manifest = AugmentationManifest.load(options.manifest_path or os.path.join(work_dir, "manifest.json")) if options.incremental else None
+
+        minimum_info, local_sources = download_relevant_sources(source_pages, job_id, tracer_id, scraped_data_repository, work_dir, options.download_workers, manifest, metrics)
+
+        feed_indexes = None
+        if options.feed_index:
+            # indexes live next to the cached feed when there is a download cache, so that every job shares them
+            download_cache = scraped_data_repository.download_cache
+            index_dir = download_cache.indexes_dir if download_cache else os.path.join(work_dir, "feed_index")
+            feed_indexes = index_social_feeds(local_sources, index_dir, job_id, metrics, warm_state)
         
         #do matching/ augmentation
     
-        if minimum_info["sentinel"] == True and minimum_info["twitter"] == True or minimum_info["sentinel"] == True and minimum_info["telegram"] == True:
-            augment_by_date(work_dir, job_id, tracer_id, scraped_data_repository, protocol, minimum_info)
+        if minimum_info[SENTINEL_KIND] and any(minimum_info[route.kind] for route in SOURCE_ROUTES.feed_routes):
+            # the content versions of the sources fingerprint the inputs of each date, and let a warm worker reuse
+            # the tables of feeds whose content it parsed for an earlier job
+            source_versions = {local_path: result.sha256 for _, local_path, result in local_sources if result.sha256}
+            output_source_data_list = augment_by_date(work_dir, job_id, tracer_id, scraped_data_repository, protocol, minimum_info, options, manifest, feed_indexes, metrics, warm_state, source_versions)
+            job_state = BaseJobState.FINISHED
         else:
-            logger.warn("Could not run augmentation, try again after running data pipeline for sentinel, twitter, and telegram")
+            logger.warn(f"Could not run augmentation, try again after running data pipeline for sentinel and at least one of {', '.join(route.kind for route in SOURCE_ROUTES.feed_routes)}")
+            output_source_data_list = []
+            job_state = BaseJobState.FAILED
 
-            
+        logger.info(f"{job_id}: Kernel Planckster health: {kernel_planckster.health.metrics()}")
+        if warm_state:
+            logger.info(f"{job_id}: Warm state: {warm_state.metrics()}")
+
+        return JobOutput(
+            job_state=job_state,
+            tracer_id=tracer_id,
+            source_data_list=output_source_data_list,
+            report=write_job_report(job_id, tracer_id, job_state, work_dir, time.time() - start_time, metrics, scraped_data_repository),
+        )
 
-                
-        
     except Exception as error:
         logger.error(f"{job_id}: Unable to scrape data. Job with tracer_id {tracer_id} failed. Error:\n{error}")
         job_state = BaseJobState.FAILED
         #job.messages.append(f"Status: FAILED. Unable to scrape data. {e}")
+        return JobOutput(
+            job_state=job_state,
+            tracer_id=tracer_id,
+            source_data_list=None,
+            report=write_job_report(job_id, tracer_id, job_state, work_dir, time.time() - start_time, metrics, scraped_data_repository),
+        )
+
+
+def write_job_report(job_id: int, tracer_id: str, job_state: BaseJobState, work_dir: str, elapsed: float, metrics: StageMetrics, scraped_data_repository: ScrapedDataRepository) -> Dict[str, Any]:
+    """
+    Write the per-stage timings, gateway latencies, gateway health and circuit breaker states of a job to '<work_dir>/reports/<job_id>.json'.
+    A report that can not be written is logged, the job does not fail because of it.
+    """
+    logger = logging.getLogger(__name__)
+    kernel_planckster = scraped_data_repository.kernel_planckster
+    report = {
+        "job_id": job_id,
+        "tracer_id": tracer_id,
+        "job_state": job_state.value,
+        "elapsed_seconds": elapsed,
+        "stages": metrics.snapshot(),
+        "gateway_latencies": kernel_planckster.latencies.snapshot(),
+        "gateway_health": kernel_planckster.health.metrics(),
+        "circuit_breakers": {
+            breaker.name: breaker.metrics()
+            for breaker in (kernel_planckster.breaker, scraped_data_repository.file_repository.breaker)
+        },
+    }
+
+    report_path = os.path.join(work_dir, "reports", f"{job_id}.json")
+    try:
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"{job_id}: Wrote the job report to {report_path}")
+    except OSError as error:
+        logger.warning(f"{job_id}: Unable to write the job report to {report_path}. Error:\n{error}")
 
+    return report
 
 
 
-def download_source_if_relevant(source: KernelPlancksterSourceData, job_id:int, tracer_id: str, scraped_data_repository: ScrapedDataRepository, work_dir: str):
-    name = source["name"]
-    protocol = source["protocol"]
-    relative_path = source["relative_path"]
 
-    #reconstruct the source_data object
+def download_relevant_sources(source_pages: Iterable[List[dict]], job_id: int, tracer_id: str, scraped_data_repository: ScrapedDataRepository, work_dir: str, max_workers: int, manifest: AugmentationManifest | None = None, metrics: StageMetrics | None = None) -> Tuple[dict, List[Tuple[str, str, DownloadResult]]]:
+    """
+    Download every relevant source with batched signed urls and a bounded number of transfers in flight.
+
+    The listing is consumed lazily: each page of sources starts downloading while the next page is being listed.
+    A failing source is logged and skipped, it does not abort the other downloads.
+    With a manifest, sources whose local copy is still current are not downloaded again.
+    Returns which kinds of sources are available locally, and the kind, local path and download result of each of them.
+    """
+    logger = logging.getLogger(__name__)
+
+    routes = SOURCE_ROUTES.for_job(job_id, tracer_id, work_dir)
+    minimum_info = {kind: False for kind in SOURCE_ROUTES.kinds}
+    local_sources: List[Tuple[str, str, DownloadResult]] = []
+    downloaded_files = 0
+    downloaded_bytes = 0
+    failed_files = 0
+
+    start_time = time.time()
+    listed_sources = 0
+    listing_seconds = 0.0
+    page_downloads: List[Tuple[List[Tuple[str, KernelPlancksterSourceData, str]], Future]] = []
+    # one page downloads at a time, with max_workers transfers of its own, while the listing goes on
+    with ThreadPoolExecutor(max_workers=1) as page_executor:
+        pages = iter(source_pages)
+        while True:
+            list_start_time = time.perf_counter()
+            source_list = next(pages, None)
+            listing_seconds += time.perf_counter() - list_start_time
+            if source_list is None:
+                break
+
+            listed_sources += len(source_list)
+            relevant_sources = [
+                relevant_source
+                for relevant_source in (locate_relevant_source(source, routes) for source in source_list)
+                if relevant_source is not None
+            ]
+            if not relevant_sources:
+                continue
+            page_downloads.append((relevant_sources, page_executor.submit(
+                scraped_data_repository.download_jsons,
+                [(source_data, local_path) for _, source_data, local_path in relevant_sources],
+                job_id,
+                max_workers=max_workers,
+                etags=[manifest.source_etag(source_data.relative_path, local_path) for _, source_data, local_path in relevant_sources] if manifest else None,
+            )))
+
+    if metrics:
+        metrics.record("list_sources", listing_seconds, rows=listed_sources)
+
+    unchanged_files = 0
+    cached_files = 0
+    for (kind, source_data, local_path), result in (
+        (relevant_source, result)
+        for relevant_sources, page_download in page_downloads
+        for relevant_source, result in zip(relevant_sources, page_download.result())
+    ):
+        if isinstance(result, Exception):
+            failed_files += 1
+            logger.error(f"{job_id}: Failed to download source {source_data.relative_path}. Error:\n{result}")
+            continue
+
+        minimum_info[kind] = True
+        if manifest:
+            manifest.record_source(source_data.relative_path, result.size, result.etag, result.sha256)
+            if not result.sha256:
+                # an up to date local copy keeps the SHA256 recorded when it was downloaded
+                result = result.model_copy(update={"sha256": manifest.source_sha256(source_data.relative_path)})
+        local_sources.append((kind, local_path, result))
+        if result.from_cache:
+            cached_files += 1
+            continue
+        if not result.modified:
+            unchanged_files += 1
+            continue
+        downloaded_files += 1
+        downloaded_bytes += result.size
+
+    if manifest:
+        manifest.save()
+
+    elapsed = max(time.time() - start_time, 1e-9)
+    if metrics:
+        # sources download concurrently, so the stage is timed as one batch; its rows are the sources downloaded
+        metrics.record("download", elapsed, bytes=downloaded_bytes, rows=downloaded_files)
+    logger.info(
+        f"{job_id}: Downloaded {downloaded_files} relevant sources ({downloaded_bytes / 1e6:.2f} MB) out of {listed_sources} listed "
+        f"in {elapsed:.2f}s with {max_workers} workers: {downloaded_files / elapsed:.2f} files/s, {downloaded_bytes / 1e6 / elapsed:.2f} MB/s. "
+        f"{cached_files} sources came from the download cache, {unchanged_files} were up to date, {failed_files} downloads failed."
+    )
+
+    return minimum_info, local_sources
+
+
+def index_social_feeds(local_sources: List[Tuple[str, str, DownloadResult]], index_dir: str, job_id: int, metrics: StageMetrics | None = None, warm_state: WarmState | None = None) -> Dict[str, FeedDateIndex]:
+    """
+    Build the date index of every downloaded social feed file that has none yet for its current content.
+
+    Indexes are keyed by the SHA256 of the file, so an unchanged feed is indexed once across runs and jobs.
+    A feed that fails to index is logged and read without an index. Returns the indexes by local path.
+    With a warm state, indexes used by earlier jobs of the worker are not even read from disk again.
+    """
+    logger = logging.getLogger(__name__)
+    feeds = {route.kind: route.feed for route in SOURCE_ROUTES.feed_routes}
+
+    def load_or_build(kind: str, local_path: str, sha256: str) -> FeedDateIndex:
+        feed_index = FeedDateIndex.load(index_dir, feeds[kind], sha256)
+        if feed_index is None:
+            start_time = time.time()
+            feed_index = FeedDateIndex.build(feeds[kind], local_path, sha256)
+            feed_index.save(index_dir)
+            elapsed = time.time() - start_time
+            if metrics:
+                metrics.record("index_feeds", elapsed, bytes=os.path.getsize(local_path), rows=len(feed_index))
+            logger.info(f"{job_id}: Indexed {len(feed_index)} rows of {local_path} by date in {elapsed:.2f}s")
+        return feed_index
+
+    feed_indexes: Dict[str, FeedDateIndex] = {}
+    for kind, local_path, result in local_sources:
+        if kind not in feeds:
+            continue
+        try:
+            sha256 = result.sha256 or file_sha256(local_path)
+            if warm_state:
+                feed_indexes[local_path] = warm_state.feed_index(kind, sha256, lambda: load_or_build(kind, local_path, sha256))
+            else:
+                feed_indexes[local_path] = load_or_build(kind, local_path, sha256)
+        except Exception as error:
+            logger.error(f"{job_id}: Failed to index {local_path} by date. Error:\n{error}")
+
+    return feed_indexes
+
+
+def relevant_source_prefixes(job_id: int, tracer_id: str) -> List[str]:
+    """
+    The relative path prefixes of the sources locate_relevant_source accepts, for server-side filtering of the listing.
+    """
+    return SOURCE_ROUTES.prefixes(job_id, tracer_id)
+
+
+def locate_relevant_source(source: dict, routes: JobSourceRoutes) -> Tuple[str, KernelPlancksterSourceData, str] | None:
+    """
+    Find out whether a listed source is an input of this job, by the parent path of the source in the job's routes.
+
+    Returns the kind of the source, its source data and the local path to download it to, or None if it is not relevant.
+    """
+    located = routes.locate(source["relative_path"])
+    if located is None:
+        return None
+
+    kind, local_path = located
     source_data = KernelPlancksterSourceData(
-        name= name,
-        protocol=protocol,
-        relative_path=relative_path,
+        name=source["name"],
+        protocol=source["protocol"],
+        relative_path=source["relative_path"],
     )
+    return kind, source_data, local_path
+
+@dataclass
+class _DateWorkerState:
+    """
+    Everything the per-date work reads. Process workers inherit it through fork instead of receiving it per task.
+    """
+    work_dir: str
+    job_id: int
+    tracer_id: str
+    protocol: ProtocolEnum
+    options: AugmentationOptions
+    columnar_dir: str | None
+    social_feeds: List[DateIndexedFeed]
+    # in incremental mode, the fingerprint of the inputs of each date to run
+    fingerprints: Dict[str, str] | None
+
+
+@dataclass
+class _DateOutput:
+    sentinel_file_name: str
+    fingerprint: str | None
+    uploads: List[Tuple[KernelPlancksterSourceData, bytes]] = field(default_factory=list)
+    # the matched rows and output name of a date that still has to be serialized
+    frame: pd.DataFrame | None = None
+    output_name: str | None = None
+    # stage totals of the date, merged by the parent since the date may have been matched in another process
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+_date_worker_state: _DateWorkerState | None = None
+
+
+def _load_feed(feed: SocialFeed, path: str | None, options: AugmentationOptions, columnar_dir: str | None, feed_index: FeedDateIndex | None = None) -> DateIndexedFeed:
+    if path is None:
+        return DateIndexedFeed(feed, pd.DataFrame())
+    if options.feed_ingestion == "stream":
+        # only date keys, coordinates and offsets stay in memory, matched rows are read back from the file
+        return feed_index.streamed_feed(feed, path) if feed_index else StreamedFeed.scan(feed, path)
+
+    df = read_feed(path, feed, columnar_dir)
+    if feed_index and len(feed_index) != len(df):
+        # e.g. duplicate record ids, which read_json collapses
+        logging.getLogger(__name__).warning(f"The date index of {path} does not match its {len(df)} rows, ignoring it")
+        feed_index = None
+    return DateIndexedFeed(feed, df, feed_index.groups() if feed_index else None)
 
-    file_name = os.path.basename(relative_path)         
-    
-    res = {"sentinel": False, "twitter": False, "telegram": False}
-    if os.path.split(source_data.relative_path)[0] == f"sentinel/{tracer_id}/{job_id}/augmented":
-        sentinel_coords_path = os.path.join(work_dir, "wildfire_coords", file_name)
-        scraped_data_repository.download_json(source_data, job_id, sentinel_coords_path)
-        res["sentinel"] = True
-
-    #TODO: replace with regex
-    elif os.path.split(source_data.relative_path)[0] == f"twitter/{tracer_id}/{job_id}/augmented":
-        
-        twitter_coords_path = os.path.join(work_dir, "twitter_augment", file_name)
-        scraped_data_repository.download_json(source_data, job_id, twitter_coords_path)
-        res["twitter"] = True
-
-    elif os.path.split(source_data.relative_path)[0] == f"telegram/{tracer_id}/{job_id}/augmented":
-        telegram_coords_path = os.path.join(work_dir, "telegram_augment", file_name)
-        scraped_data_repository.download_json(source_data, job_id, telegram_coords_path)
-        res["telegram"] = True
-    
-    return res
 
 #TODO: plan system that uses generic sattelitedata() and socialfeeddata() classes
-def augment_by_date(work_dir: str, job_id:int, tracer_id:str, scraped_data_repository: ScrapedDataRepository, protocol: ProtocolEnum, minimum_info: dict ):
-    key = {
-    "01": "January",
-    "02": "February",
-    "03": "March",
-    "04": "April",
-    "05": "May",
-    "06": "June",
-    "07": "July",
-    "08": "August",
-    "09": "September",
-    "10": "October",
-    "11": "November",
-    "12": "December"
-    }
-    twitter_df=pd.DataFrame()
-    telegram_df=pd.DataFrame()
-    if minimum_info["twitter"]:
-        latest_twitter_data = sorted([f for f in os.listdir(f'{work_dir}/twitter_augment')], key=lambda x: x[5:20], reverse=True)[0]
-        twitter_df = pd.read_json(f'{work_dir}/twitter_augment/{latest_twitter_data}', orient="index")
-    if minimum_info["telegram"]:
-        telegram_df = pd.read_json(f'{work_dir}/telegram_augment/data.json', orient="index")
-    sentinel_dir = os.path.join(work_dir, "wildfire_coords")
-    
-    for wildifre_coords_json_file_path in os.listdir(sentinel_dir):
-        data = []
-        sentinel_df= pd.read_json(os.path.join(sentinel_dir,wildifre_coords_json_file_path), orient="index")
-        for index, row in sentinel_df.iloc[0:].iterrows():
-            lattitude = row['latitude']
-            longitude = row['longitude']
-            status = row['status']
-                                                       #title tweet location
-            data.append([status, lattitude, longitude, "n/a", "n/a", "n/a" ])
-
-        underscore_date=wildifre_coords_json_file_path[2:wildifre_coords_json_file_path.index("____")]
-        split_date = underscore_date.split("_")
-        sat_image_year = split_date[0]; sat_image_month = key[split_date[1]]; sat_image_day = split_date[2]
-    
-        matches_found_twitter = 0
-        for index, row in twitter_df.iloc[0:].iterrows():
-            tweet_title = row['Title']
-            tweet_tweet = row['Tweet']
-            tweet_location = row['Extracted_Location']
-            tweet_latitude = row['Resolved_Latitude']
-            tweet_longitude = row['Resolved_Longitude']
-            tweet_month = row['Month']
-            tweet_day = row['Day']
-            tweet_year = row['Year']
-            tweet_disaster_type = row['Disaster_Type']
-
-            
-            if(int(sat_image_year) == int(tweet_year) and sat_image_month == tweet_month and int(sat_image_day) == int(tweet_day)):
-                matches_found_twitter += 1
-                
-                data.append([f"tweet about {tweet_disaster_type}", tweet_latitude, tweet_longitude, tweet_title, tweet_tweet, tweet_location ])
-        
-        matches_found_telegram = 0
-        for index, row in telegram_df.iloc[0:].iterrows():
-            telegram_title = row['Title']
-            telegram_tweet = row['Telegram']
-            telegram_location = row['Extracted_Location']
-            telegram_latitude = row['Resolved_Latitude']
-            telegram_longitude = row['Resolved_Longitude']
-            telegram_month = row['Month']
-            telegram_day = row['Day']
-            telegram_year = row['Year']
-            telegram_disaster_type = row['Disaster_Type']
+def augment_by_date(work_dir: str, job_id:int, tracer_id:str, scraped_data_repository: ScrapedDataRepository, protocol: ProtocolEnum, minimum_info: dict, options: AugmentationOptions | None = None, manifest: AugmentationManifest | None = None, feed_indexes: Dict[str, FeedDateIndex] | None = None, metrics: StageMetrics | None = None, warm_state: WarmState | None = None, source_versions: Dict[str, str] | None = None) -> List[KernelPlancksterSourceData]:
+    logger = logging.getLogger(__name__)
+    options = options or AugmentationOptions()
+    metrics = metrics or StageMetrics()
+    source_versions = source_versions or {}
 
-        
-            if(int(sat_image_year) == int(telegram_year) and sat_image_month == telegram_month and int(sat_image_day) == int(telegram_day)):
-                matches_found_telegram += 1
-                data.append([f"telegram post about {telegram_disaster_type}", telegram_latitude, telegram_longitude, telegram_title, telegram_tweet, telegram_location ])
+    def version(path: str | None) -> str | None:
+        return (source_versions.get(path) or file_sha256(path)) if path else None
+
+    # with the parquet work format, feeds and coordinates are converted once and memory-mapped on later runs
+    columnar_dir = os.path.join(work_dir, "columnar") if options.work_format == "parquet" else None
+    feed_routes = SOURCE_ROUTES.feed_routes
+    feed_paths = {route.kind: route.feed_path(work_dir) if minimum_info[route.kind] else None for route in feed_routes}
 
-        date_df = pd.DataFrame(data, columns=["Status", "Lattitude", "Longitude", "Title", "Text", "Location"])
+    sentinel_dir = SOURCE_ROUTES.local_dir(SENTINEL_KIND, work_dir)
+    sentinel_file_names = os.listdir(sentinel_dir)
+
+    # in incremental mode, a date whose inputs did not change since its last upload is skipped before any feed is read
+    fingerprints = None
+    if manifest:
+        feed_versions = {kind: version(feed_path) for kind, feed_path in feed_paths.items()}
+        fingerprints = {
+            name: _date_fingerprint(version(os.path.join(sentinel_dir, name)), feed_versions, options)
+            for name in sentinel_file_names
+        }
+        changed = [name for name in sentinel_file_names if manifest.date_fingerprint(name) != fingerprints[name]]
+        if len(changed) < len(sentinel_file_names):
+            logger.info(f"{job_id}: {len(sentinel_file_names) - len(changed)} of {len(sentinel_file_names)} dates are unchanged since the last run, skipping them")
+        sentinel_file_names = changed
+
+    # bucket every feed by date once, so that each sentinel date below is a hash lookup instead of a full scan
+    feed_indexes = feed_indexes or {}
+    social_feeds = []
+    # with every date skipped, no feed is read at all
+    for feed in [route.feed for route in feed_routes] if sentinel_file_names else []:
+        feed_path = feed_paths[feed.kind]
+        with metrics.stage("parse_feeds") as counts:
+            load = lambda: _load_feed(feed, feed_path, options, columnar_dir, feed_indexes.get(feed_path))
+            if warm_state and feed_path:
+                # streamed feeds read their rows back from their file, so they are only reused for the same path
+                key = (feed.kind, version(feed_path), options.feed_ingestion, options.work_format, feed_path if options.feed_ingestion == "stream" else None)
+                social_feeds.append(warm_state.feed_table(key, load))
+            else:
+                social_feeds.append(load())
+            counts["rows"] = len(social_feeds[-1].df)
+            counts["bytes"] = os.path.getsize(feed_path) if feed_path else 0
+    if options.local_outputs:
         os.makedirs(f"{work_dir}/by_date", exist_ok=True)
-        if matches_found_twitter >= 1 or matches_found_telegram >= 1:
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            local_json_path = f"{work_dir}/by_date/{sat_image_year}_{sat_image_month}_{sat_image_day}_{timestamp}.json"
-            date_df.to_json(local_json_path, orient='index', indent=4)
-            
-            #upload to minio
-            source_data = KernelPlancksterSourceData(
-            name=f"{sat_image_year}_{sat_image_month}_{sat_image_day}_{timestamp}",
-            protocol=protocol,
-            relative_path=f"augmented/{tracer_id}/{job_id}/by_date/{sat_image_year}_{sat_image_month}_{sat_image_day}_{timestamp}.json"
-            )
 
-            try:
-                scraped_data_repository.register_scraped_json(
-                job_id=job_id,
-                source_data=source_data,
-                local_file_name=local_json_path,
-                )
-            except Exception as e:
+    state = _DateWorkerState(
+        work_dir=work_dir,
+        job_id=job_id,
+        tracer_id=tracer_id,
+        protocol=protocol,
+        options=options,
+        columnar_dir=columnar_dir,
+        social_feeds=social_feeds,
+        fingerprints=fingerprints,
+    )
+
+    output_source_data_list: List[KernelPlancksterSourceData] = []
+    # matched dates are serialized and uploaded by their own workers while the next dates are still being matched;
+    # at most publish_queue_size dates wait in front of each, so matching pauses when publishing falls behind
+    published: List[Tuple[_DateOutput, List[KernelPlancksterSourceData | Exception] | Exception]] = []
+    pipeline: BoundedPipeline | None = None
+    try:
+        for date_output in _map_dates(state, sentinel_file_names):
+            metrics.merge(date_output.stages)
+            if date_output.frame is None and not date_output.uploads:
+                if manifest:
+                    manifest.record_date(date_output.sentinel_file_name, date_output.fingerprint, None)
                 continue
+
+            # created only after the process pool forked its workers, so no worker inherits its threads
+            pipeline = pipeline or BoundedPipeline(
+                [
+                    (lambda pending: _serialize_date(state, pending, metrics), 1),
+                    (lambda pending: _upload_date(scraped_data_repository, pending.uploads, job_id, options, metrics), options.upload_workers),
+                ],
+                max_pending=options.publish_queue_size,
+            )
+            pipeline.put(date_output)
+    finally:
+        if pipeline:
+            published = pipeline.close()
+
+    # uploads that failed even after their retries are dead-lettered and replayed once every date is done
+    dead_letters: List[Tuple[_DateOutput, KernelPlancksterSourceData, bytes]] = []
+    failed_dates = set()
+    for date_output, results in published:
+        if isinstance(results, Exception):
+            failed_dates.add(date_output.sentinel_file_name)
+            logger.error(f"{job_id}: Failed to serialize {date_output.sentinel_file_name}. Error:\n{results}")
+            continue
+        for (source_data, content), result in zip(date_output.uploads, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{job_id}: Failed to upload {source_data.relative_path}, it will be replayed at the end of the run. Error:\n{result}")
+                dead_letters.append((date_output, source_data, content))
+            else:
+                output_source_data_list.append(result)
+
+    if dead_letters:
+        for (date_output, source_data, _), result in zip(dead_letters, _replay_dead_letters(scraped_data_repository, dead_letters, job_id, options, metrics)):
+            if isinstance(result, Exception):
+                failed_dates.add(date_output.sentinel_file_name)
+                logger.error(f"{job_id}: Failed to upload {source_data.relative_path}. Error:\n{result}")
+            else:
+                output_source_data_list.append(result)
+
+    if manifest:
+        for date_output, _ in published:
+            if date_output.sentinel_file_name not in failed_dates:
+                manifest.record_date(date_output.sentinel_file_name, date_output.fingerprint, date_output.uploads[-1][0].relative_path)
+
+    if manifest:
+        manifest.save()
+
+    return output_source_data_list
+
+
+def _date_fingerprint(sentinel_version: str | None, feed_versions: Dict[str, str | None], options: AugmentationOptions) -> str:
+    """
+    A digest of everything the by-date output of a Sentinel file depends on: the SHA256 of the file, of each social
+    feed version, and the options that change the matched rows or their serialization. The work format and the feed
+    ingestion change how values are parsed, e.g. parquet stores the coordinates as float32.
+    """
+    inputs = {
+        "sentinel": sentinel_version,
+        "feeds": feed_versions,
+        "options": options.model_dump(include={"work_format", "feed_ingestion", "match_mode", "radius_km", "day_window", "output_format", "output_json_indent", "output_gzip"}),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _serialize_date(state: _DateWorkerState, date_output: _DateOutput, metrics: StageMetrics) -> _DateOutput:
+    """
+    Serialize the matched rows of a date in memory, in the output formats, and list their uploads. Dates
+    serialized already by their worker process pass through.
+
+    With `options.local_outputs`, every output is also written to '<work_dir>/by_date' for inspection.
+    """
+    if date_output.frame is None:
+        return date_output
+
+    options = state.options
+    outputs: List[Tuple[str, bytes]] = []
+    with metrics.stage("serialize") as counts:
+        if options.output_format in ("json", "both"):
+            outputs.append((f"{date_output.output_name}.json", date_output.frame.to_json(orient='index', indent=options.output_json_indent).encode()))
+        if options.output_format in ("parquet", "both"):
+            buffer = io.BytesIO()
+            write_parquet(date_output.frame, buffer)
+            outputs.append((f"{date_output.output_name}.parquet", buffer.getvalue()))
+        counts["bytes"] = sum(len(content) for _, content in outputs)
+        counts["rows"] = len(date_output.frame)
+
+    if options.local_outputs:
+        for file_name, content in outputs:
+            with open(os.path.join(state.work_dir, "by_date", file_name), "wb") as f:
+                f.write(content)
+
+    #upload to minio
+    for file_name, content in outputs:
+        source_data = KernelPlancksterSourceData(
+        name=date_output.output_name,
+        protocol=state.protocol,
+        relative_path=f"augmented/{state.tracer_id}/{state.job_id}/by_date/{file_name}"
+        )
+
+        date_output.uploads.append((source_data, content))
+
+    # the serialized outputs replace the rows, the queue should not keep both in memory
+    date_output.frame = None
+    return date_output
+
+
+def _upload_date(scraped_data_repository: ScrapedDataRepository, uploads: List[Tuple[KernelPlancksterSourceData, bytes]], job_id: int, options: AugmentationOptions, metrics: StageMetrics) -> List[KernelPlancksterSourceData | Exception]:
+    with metrics.stage("upload") as counts:
+        counts["bytes"] = sum(len(content) for _, content in uploads)
+        counts["rows"] = len(uploads)
+        return _publish(scraped_data_repository, uploads, job_id, len(uploads), options.output_gzip)
+
+
+def _publish(scraped_data_repository: ScrapedDataRepository, uploads: List[Tuple[KernelPlancksterSourceData, bytes]], job_id: int, max_workers: int, gzip_json: bool) -> List[KernelPlancksterSourceData | Exception]:
+    """
+    Upload and register in-memory outputs. With gzip_json, JSON bodies are sent gzip-compressed with a gzip
+    Content-Encoding; parquet is compressed already and always sent as is.
+    """
+    if not gzip_json:
+        return scraped_data_repository.register_scraped_jsons(uploads, job_id, max_workers)
+
+    results: List[KernelPlancksterSourceData | Exception | None] = [None] * len(uploads)
+    is_json = [source_data.relative_path.endswith(".json") for source_data, _ in uploads]
+    json_indexes = [index for index in range(len(uploads)) if is_json[index]]
+    other_indexes = [index for index in range(len(uploads)) if not is_json[index]]
+    for indexes, content_encoding in ((json_indexes, "gzip"), (other_indexes, None)):
+        if not indexes:
+            continue
+        batch = [
+            (uploads[index][0], gzip.compress(uploads[index][1], mtime=0) if content_encoding else uploads[index][1])
+            for index in indexes
+        ]
+        for index, result in zip(indexes, scraped_data_repository.register_scraped_jsons(batch, job_id, max_workers, content_encoding=content_encoding)):
+            results[index] = result
+    return results
+
+
+def _replay_dead_letters(scraped_data_repository: ScrapedDataRepository, dead_letters: List[Tuple[_DateOutput, KernelPlancksterSourceData, bytes]], job_id: int, options: AugmentationOptions, metrics: StageMetrics) -> List[KernelPlancksterSourceData | Exception]:
+    """
+    Upload the dead-lettered outputs of the run once more, after waiting for an open circuit breaker to let calls
+    through again.
+    """
+    logger = logging.getLogger(__name__)
+    breakers = [scraped_data_repository.kernel_planckster.breaker, scraped_data_repository.file_repository.breaker]
+    wait = max((breaker.reset_timeout for breaker in breakers if breaker.is_open()), default=0.0)
+    if wait:
+        logger.warning(f"{job_id}: Waiting {wait:.0f}s for Kernel Planckster or the object store to recover before replaying {len(dead_letters)} failed uploads")
+        time.sleep(wait)
+
+    logger.info(f"{job_id}: Replaying {len(dead_letters)} failed uploads")
+    with metrics.stage("replay_uploads") as counts:
+        counts["rows"] = len(dead_letters)
+        return _publish(scraped_data_repository, [(source_data, content) for _, source_data, content in dead_letters], job_id, options.upload_workers, options.output_gzip)
+
+
+def _map_dates(state: _DateWorkerState, sentinel_file_names: List[str]) -> Iterator[_DateOutput]:
+    """
+    Run the per-date work, in this process or, with `options.processes` > 1, on a fork-based process pool.
+    """
+    global _date_worker_state
+
+    processes = min(state.options.processes, len(sentinel_file_names))
+    if processes <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for sentinel_file_name in sentinel_file_names:
+            yield _augment_date(state, sentinel_file_name)
+        return
+
+    # forked workers inherit the feed tables copy-on-write, tasks only carry a file name
+    _date_worker_state = state
+    try:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork")) as executor:
+            futures = [executor.submit(_augment_date_in_worker, sentinel_file_name) for sentinel_file_name in sentinel_file_names]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        _date_worker_state = None
+
+
+def _augment_date_in_worker(sentinel_file_name: str) -> _DateOutput:
+    assert _date_worker_state is not None
+    # serialized here rather than in the parent, which would otherwise pickle and write every frame on one thread
+    return _augment_date(_date_worker_state, sentinel_file_name, serialize=True)
+
+
+def _augment_date(state: _DateWorkerState, wildifre_coords_json_file_path: str, serialize: bool = False) -> _DateOutput:
+    """
+    Match one Sentinel coordinates file against the social feeds. With serialize, its by-date outputs are also
+    written, otherwise its matched rows are returned for the publishing pipeline to write.
+    """
+    options = state.options
+    metrics = StageMetrics()
+    sentinel_dir = SOURCE_ROUTES.local_dir(SENTINEL_KIND, state.work_dir)
+    with metrics.stage("read_sentinel") as counts:
+        sentinel_path = os.path.join(sentinel_dir,wildifre_coords_json_file_path)
+        sentinel_df= read_sentinel(sentinel_path, state.columnar_dir)
+        counts["bytes"] = os.path.getsize(sentinel_path)
+        counts["rows"] = len(sentinel_df)
+
+    sat_image_year, sat_image_month, sat_image_day = sentinel_date_from_file_name(wildifre_coords_json_file_path)
+    sat_image_date_key = sentinel_date_key(sat_image_year, sat_image_month, sat_image_day)
+
+    with metrics.stage("match") as counts:
+        if options.match_mode == "spatial":
+            fire_index = FirePointIndex(
+                pd.to_numeric(sentinel_df["latitude"], errors="coerce").to_numpy() if len(sentinel_df) else [],
+                pd.to_numeric(sentinel_df["longitude"], errors="coerce").to_numpy() if len(sentinel_df) else [],
+            )
+            matches = [
+                social_feed.rows(positions_near_fires(social_feed, fire_index, sat_image_date_key, options.radius_km, options.day_window))
+                for social_feed in state.social_feeds
+            ]
+        else:
+            matches = [social_feed.rows_for_date(sat_image_date_key) for social_feed in state.social_feeds]
+        date_df = join_date_rows([sentinel_rows(sentinel_df), *matches])
+        has_matches = any(len(feed_matches) >= 1 for feed_matches in matches)
+        counts["rows"] = sum(len(feed_matches) for feed_matches in matches)
+
+    fingerprint = state.fingerprints[wildifre_coords_json_file_path] if state.fingerprints is not None else None
+    date_output = _DateOutput(wildifre_coords_json_file_path, fingerprint)
+    if has_matches:
+        date_output.output_name = f"{sat_image_year}_{sat_image_month}_{sat_image_day}_{time.strftime('%Y%m%d_%H%M%S')}"
+        date_output.frame = date_df
+        if serialize:
+            _serialize_date(state, date_output, metrics)
+
+    date_output.stages = metrics.snapshot()
+    return date_output
@@ -0,0 +1,129 @@
+import logging
+import os
+import tempfile
+from typing import IO
+
+import numpy as np
+import pandas as pd
+
+from app.matching import SocialFeed, feed_date_keys
+
+
+# pyarrow is only needed for the parquet work and output formats
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as error:
+        raise ImportError("The parquet format needs pyarrow, install it with 'pip install pyarrow'.") from error
+
+
+def _sidecar_path(columnar_dir: str, json_path: str) -> str:
+    return os.path.join(columnar_dir, f"{os.path.basename(json_path)}.parquet")
+
+
+def _source_stamp(json_path: str) -> str:
+    stat = os.stat(json_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _read_sidecar(sidecar_path: str, json_path: str) -> pd.DataFrame | None:
+    """
+    Memory-map a parquet sidecar, if it exists and was converted from the current version of json_path.
+    """
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(sidecar_path):
+        return None
+
+    metadata = pq.read_schema(sidecar_path).metadata or {}
+    if metadata.get(b"source_stamp", b"").decode() != _source_stamp(json_path):
+        return None
+
+    return pq.read_table(sidecar_path, memory_map=True).to_pandas()
+
+
+def _write_sidecar(df: pd.DataFrame, sidecar_path: str, json_path: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"source_stamp": _source_stamp(json_path).encode()})
+
+    os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+    # unique per writer, as threads of one process may convert the same feed at the same time
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar_path), prefix=f".{os.path.basename(sidecar_path)}.", suffix=".part")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, sidecar_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_feed(json_path: str, feed: SocialFeed, columnar_dir: str | None = None) -> pd.DataFrame:
+    """
+    Read a social feed JSON (orient="index").
+
+    With a columnar_dir, the feed is converted once to a typed parquet sidecar in that directory (date_key, float32
+    coordinates, categorical disaster type) and later reads memory-map the sidecar instead of parsing the JSON.
+    """
+    if columnar_dir is None:
+        return pd.read_json(json_path, orient="index")
+
+    _require_pyarrow()
+    sidecar_path = _sidecar_path(os.path.join(columnar_dir, feed.kind), json_path)
+    df = _read_sidecar(sidecar_path, json_path)
+    if df is not None:
+        return df
+
+    logging.getLogger(__name__).info(f"Converting {json_path} to parquet")
+    df = pd.read_json(json_path, orient="index")
+    if len(df) > 0:
+        df["date_key"] = feed_date_keys(df)
+        df["Resolved_Latitude"] = pd.to_numeric(df["Resolved_Latitude"], errors="coerce").astype(np.float32)
+        df["Resolved_Longitude"] = pd.to_numeric(df["Resolved_Longitude"], errors="coerce").astype(np.float32)
+        df["Disaster_Type"] = df["Disaster_Type"].astype("category")
+        for column in ["Title", feed.text_column, "Extracted_Location", "Month"]:
+            df[column] = df[column].astype("string")
+        for column in ["Year", "Day"]:
+            df[column] = df[column].astype(str)
+    _write_sidecar(df, sidecar_path, json_path)
+    return df
+
+
+def read_sentinel(json_path: str, columnar_dir: str | None = None) -> pd.DataFrame:
+    """
+    Read a Sentinel coordinates JSON (orient="index"), through a float32 parquet sidecar when columnar_dir is set.
+    """
+    if columnar_dir is None:
+        return pd.read_json(json_path, orient="index")
+
+    _require_pyarrow()
+    sidecar_path = _sidecar_path(os.path.join(columnar_dir, "sentinel"), json_path)
+    df = _read_sidecar(sidecar_path, json_path)
+    if df is not None:
+        return df
+
+    df = pd.read_json(json_path, orient="index")
+    if len(df) > 0:
+        df["latitude"] = df["latitude"].astype(np.float32)
+        df["longitude"] = df["longitude"].astype(np.float32)
+        df["status"] = df["status"].astype("category")
+    _write_sidecar(df, sidecar_path, json_path)
+    return df
+
+
+def write_parquet(df: pd.DataFrame, path: str | IO[bytes]) -> None:
+    """
+    Write by-date output rows as parquet, to a path or a binary buffer, with text columns as strings and coordinates
+    as floats.
+    """
+    _require_pyarrow()
+    df = df.copy()
+    for column in ["Status", "Title", "Text", "Location"]:
+        df[column] = df[column].astype(str)
+    for column in ["Lattitude", "Longitude"]:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df.to_parquet(path, index=False)
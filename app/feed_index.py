@@ -0,0 +1,112 @@
+import logging
+import os
+import tempfile
+import zipfile
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.feed_stream import StreamedFeed
+from app.matching import SocialFeed, groups_from_ranges, sort_by_key
+
+
+class FeedDateIndex:
+    """
+    Persistent date index of one version of a social feed file, keyed by the file's SHA256.
+
+    For every date key it holds the range of the feed's rows with that date (as a slice of a key-sorted row order),
+    and for every row its coordinates and the byte offset and length of its JSON record. Once built, later runs and
+    other jobs look a date's posts up directly, and a streamed feed is reopened without parsing the file again.
+    """
+    VERSION = 1
+
+    def __init__(self, kind: str, sha256: str, key_frame: pd.DataFrame, offsets: np.ndarray, lengths: np.ndarray) -> None:
+        self._kind = kind
+        self._sha256 = sha256
+        self._key_frame = key_frame
+        self._offsets = offsets
+        self._lengths = lengths
+        self._order, self._keys, self._starts, self._stops = sort_by_key(key_frame["date_key"].to_numpy(dtype=np.int64))
+
+    @property
+    def kind(self) -> str:
+        return self._kind
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256
+
+    def __len__(self) -> int:
+        return len(self._key_frame)
+
+    @staticmethod
+    def file_name(kind: str, sha256: str) -> str:
+        return f"{sha256}.{kind}.dateindex.npz"
+
+    @classmethod
+    def build(cls, feed: SocialFeed, path: str, sha256: str) -> "FeedDateIndex":
+        """
+        Index a feed file with one streaming pass over it.
+        """
+        streamed = StreamedFeed.scan(feed, path)
+        return cls(feed.kind, sha256, streamed.df, streamed.offsets, streamed.lengths)
+
+    @classmethod
+    def load(cls, index_dir: str, feed: SocialFeed, sha256: str) -> "FeedDateIndex | None":
+        """
+        Load the index of the feed file with the given SHA256, or None if it was not built yet or can not be read.
+        """
+        index_path = os.path.join(index_dir, cls.file_name(feed.kind, sha256))
+        try:
+            with np.load(index_path) as arrays:
+                if int(arrays["version"]) != cls.VERSION:
+                    return None
+                key_frame = pd.DataFrame({
+                    "date_key": arrays["date_key"],
+                    "Resolved_Latitude": arrays["latitude"],
+                    "Resolved_Longitude": arrays["longitude"],
+                })
+                return cls(feed.kind, sha256, key_frame, arrays["offset"], arrays["length"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as error:
+            logging.getLogger(__name__).warning(f"Ignoring unreadable feed index '{index_path}'. Error:\n{error}")
+            return None
+
+    def save(self, index_dir: str) -> str:
+        """
+        Write the index atomically into index_dir and return its path.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        index_path = os.path.join(index_dir, self.file_name(self._kind, self._sha256))
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=np.int64(self.VERSION),
+                    date_key=self._key_frame["date_key"].to_numpy(dtype=np.int64),
+                    latitude=self._key_frame["Resolved_Latitude"].to_numpy(dtype=np.float64),
+                    longitude=self._key_frame["Resolved_Longitude"].to_numpy(dtype=np.float64),
+                    offset=self._offsets,
+                    length=self._lengths,
+                )
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return index_path
+
+    def groups(self) -> Dict[int, np.ndarray]:
+        """
+        The row positions of every valid date key, in feed order within a key.
+        """
+        return groups_from_ranges(self._order, self._keys, self._starts, self._stops)
+
+    def streamed_feed(self, feed: SocialFeed, path: str) -> StreamedFeed:
+        """
+        Open the indexed feed file as a streamed feed, without scanning it.
+        """
+        return StreamedFeed(feed, path, self._key_frame, self._offsets, self._lengths, self.groups())
@@ -0,0 +1,190 @@
+import codecs
+import io
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.matching import DateIndexedFeed, SocialFeed, feed_date_keys
+
+
+_WHITESPACE = " \t\n\r"
+
+# the columns kept in memory for every row of a streamed feed, everything else is read back only for matched rows
+_KEY_COLUMNS = ["Year", "Month", "Day", "Resolved_Latitude", "Resolved_Longitude"]
+
+
+def iter_json_records(path: str, chunk_size: int = 1024 * 1024) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    """
+    Incrementally parse a feed file, yielding each record with the byte offset and byte length of its JSON object.
+
+    Reads NDJSON ('.ndjson'/'.jsonl', one record per line) or a JSON object of records keyed by row id, as written
+    by `to_json(orient="index")`. Only one chunk plus the record being parsed is held in memory at a time.
+    """
+    if path.endswith((".ndjson", ".jsonl")):
+        yield from _iter_ndjson_records(path)
+        return
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    with open(path, "rb") as f:
+        buf = ""
+        pos = 0
+        pos_byte = 0  # byte offset of buf[pos] in the file
+        eof = False
+
+        def fill() -> None:
+            nonlocal buf, pos, eof
+            # drop what was consumed before growing the buffer
+            buf = buf[pos:]
+            pos = 0
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf += utf8.decode(chunk, final=eof)
+
+        def advance(new_pos: int) -> None:
+            nonlocal pos, pos_byte
+            pos_byte += len(buf[pos:new_pos].encode("utf-8"))
+            pos = new_pos
+
+        def skip_whitespace() -> str:
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    advance(pos + 1)
+                if pos < len(buf):
+                    return buf[pos]
+                if eof:
+                    raise ValueError(f"Unexpected end of feed file '{path}'")
+                fill()
+
+        def decode() -> Any:
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                # a value ending exactly at the buffer end, e.g. a number, may continue in the next chunk
+                if end == len(buf) and not eof:
+                    fill()
+                    continue
+                return value, end
+
+        if skip_whitespace() != "{":
+            raise ValueError(f"Feed file '{path}' is not a JSON object of records")
+        advance(pos + 1)
+
+        while True:
+            token = skip_whitespace()
+            if token == "}":
+                return
+            if token == ",":
+                advance(pos + 1)
+                continue
+
+            _, end = decode()
+            advance(end)
+            if skip_whitespace() != ":":
+                raise ValueError(f"Malformed feed file '{path}' at byte {pos_byte}")
+            advance(pos + 1)
+            skip_whitespace()
+
+            record_byte = pos_byte
+            record, end = decode()
+            advance(end)
+            yield record, record_byte, pos_byte - record_byte
+
+
+def _iter_ndjson_records(path: str) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                yield json.loads(line), offset, len(line)
+            offset += len(line)
+
+
+class StreamedFeed(DateIndexedFeed):
+    """
+    A date-indexed social feed of which only the date keys, coordinates and file offsets of the rows are in memory.
+
+    Title and text of a row are read back from the feed file only when the row matched, so memory grows with the
+    number of matches instead of with the size of the feed.
+    """
+    def __init__(self, feed: SocialFeed, path: str, key_frame: pd.DataFrame, offsets: np.ndarray, lengths: np.ndarray, groups: Dict[int, np.ndarray] | None = None) -> None:
+        super().__init__(feed, key_frame, groups)
+        self._path = path
+        self._offsets = offsets
+        self._lengths = lengths
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths
+
+    @classmethod
+    def scan(cls, feed: SocialFeed, path: str, batch_size: int = 100_000) -> "StreamedFeed":
+        """
+        Stream through a feed file once, keeping only the key columns and the offsets of its rows.
+        """
+        date_keys: List[np.ndarray] = []
+        latitudes: List[np.ndarray] = []
+        longitudes: List[np.ndarray] = []
+        offsets: List[int] = []
+        lengths: List[int] = []
+        batch: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            batch_df = pd.DataFrame.from_records(batch, columns=_KEY_COLUMNS)
+            date_keys.append(feed_date_keys(batch_df))
+            latitudes.append(pd.to_numeric(batch_df["Resolved_Latitude"], errors="coerce").to_numpy(dtype=np.float64))
+            longitudes.append(pd.to_numeric(batch_df["Resolved_Longitude"], errors="coerce").to_numpy(dtype=np.float64))
+            batch.clear()
+
+        for record, offset, length in iter_json_records(path):
+            batch.append({column: record.get(column) for column in _KEY_COLUMNS})
+            offsets.append(offset)
+            lengths.append(length)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        key_frame = pd.DataFrame({
+            "date_key": np.concatenate(date_keys) if date_keys else np.empty(0, dtype=np.int64),
+            "Resolved_Latitude": np.concatenate(latitudes) if latitudes else np.empty(0),
+            "Resolved_Longitude": np.concatenate(longitudes) if longitudes else np.empty(0),
+        })
+        return cls(feed, path, key_frame, np.asarray(offsets, dtype=np.int64), np.asarray(lengths, dtype=np.int64))
+
+    def load_records(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        Read the full records at the given row positions back from the feed file, in the order of the positions.
+        """
+        raw_records: Dict[int, bytes] = {}
+        with open(self._path, "rb") as f:
+            # read in file order, so that the reads are sequential
+            for position in sorted(set(int(position) for position in positions)):
+                f.seek(self._offsets[position])
+                raw_records[position] = f.read(self._lengths[position])
+
+        # parse through read_json like the in-memory ingestion does, so that values come out identical
+        document = b"{" + b",".join(b'"%d":%s' % (i, raw_records[int(position)]) for i, position in enumerate(positions)) + b"}"
+        return pd.read_json(io.BytesIO(document), orient="index")
+
+    def rows(self, positions: np.ndarray) -> pd.DataFrame:
+        if len(positions) == 0:
+            return super().rows(positions)
+
+        return self._output_rows(self.load_records(positions))
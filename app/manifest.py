@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict
+
+
+class AugmentationManifest:
+    """
+    Local record of what previous augmentation runs downloaded and emitted, used by incremental runs to skip work.
+
+    - sources: for each input relative_path, the size, ETag and SHA256 of the local copy
+    - dates: for each Sentinel coordinates file, the fingerprint of the inputs of its by-date output and where it was uploaded
+    """
+    VERSION = 1
+
+    def __init__(self, path: str, sources: Dict[str, Dict[str, Any]] | None = None, dates: Dict[str, Dict[str, Any]] | None = None) -> None:
+        self._path = path
+        self._sources = sources or {}
+        self._dates = dates or {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @classmethod
+    def load(cls, path: str) -> "AugmentationManifest":
+        """
+        Load the manifest at path, or start an empty one if there is none or it can not be read.
+        """
+        try:
+            with open(path) as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as error:
+            logging.getLogger(__name__).warning(f"Ignoring unreadable manifest '{path}'. Error:\n{error}")
+            return cls(path)
+
+        if content.get("version") != cls.VERSION:
+            return cls(path)
+
+        return cls(path, sources=content.get("sources"), dates=content.get("dates"))
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically, so an interrupted run never leaves a truncated manifest behind.
+        """
+        with self._lock:
+            content = {"version": self.VERSION, "sources": self._sources, "dates": self._dates}
+
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest.", suffix=".part")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(content, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def source_etag(self, relative_path: str, local_path: str) -> str | None:
+        """
+        The ETag of the local copy of a source, if it is still the copy recorded in the manifest.
+        """
+        with self._lock:
+            record = self._sources.get(relative_path)
+
+        if not record or not os.path.exists(local_path) or os.path.getsize(local_path) != record.get("size"):
+            return None
+
+        return record.get("etag")
+
+    def source_sha256(self, relative_path: str) -> str | None:
+        with self._lock:
+            return self._sources.get(relative_path, {}).get("sha256")
+
+    def record_source(self, relative_path: str, size: int, etag: str | None, sha256: str | None) -> None:
+        with self._lock:
+            record = self._sources.setdefault(relative_path, {})
+            record["size"] = size
+            record["etag"] = etag
+            if sha256:
+                record["sha256"] = sha256
+
+    def date_fingerprint(self, sentinel_file_name: str) -> str | None:
+        with self._lock:
+            return self._dates.get(sentinel_file_name, {}).get("fingerprint")
+
+    def record_date(self, sentinel_file_name: str, fingerprint: str, relative_path: str | None) -> None:
+        """
+        Record the fingerprint of a date's inputs once its output was uploaded (relative_path) or found to be empty (None).
+        """
+        with self._lock:
+            self._dates[sentinel_file_name] = {"fingerprint": fingerprint, "relative_path": relative_path}
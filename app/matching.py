@@ -0,0 +1,218 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+MONTHS = {
+    "01": "January",
+    "02": "February",
+    "03": "March",
+    "04": "April",
+    "05": "May",
+    "06": "June",
+    "07": "July",
+    "08": "August",
+    "09": "September",
+    "10": "October",
+    "11": "November",
+    "12": "December",
+}
+
+MONTH_NUMBERS = {name: int(number) for number, name in MONTHS.items()}
+
+OUTPUT_COLUMNS = ["Status", "Lattitude", "Longitude", "Title", "Text", "Location"]
+
+# Date keys are days since the unix epoch; rows whose date cannot be resolved get this key and never match.
+INVALID_DATE_KEY = np.iinfo(np.int64).min
+
+
+@dataclass(frozen=True)
+class SocialFeed:
+    """
+    Describes how the rows of a social feed are turned into augmentation output rows.
+
+    @attr kind: the source kind of the feed, e.g. "twitter"
+    @attr text_column: the column holding the body of the post
+    @attr status_prefix: prepended to the disaster type to build the output "Status"
+    """
+    kind: str
+    text_column: str
+    status_prefix: str
+
+
+TWITTER_FEED = SocialFeed(kind="twitter", text_column="Tweet", status_prefix="tweet about")
+TELEGRAM_FEED = SocialFeed(kind="telegram", text_column="Telegram", status_prefix="telegram post about")
+
+
+def date_key(year: int, month: int, day: int) -> int:
+    """
+    Build the date key (days since the unix epoch) of a calendar date.
+    """
+    return int(np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D").astype(np.int64))
+
+
+def sentinel_date_from_file_name(file_name: str) -> Tuple[str, str, str]:
+    """
+    Extract the (year, month name, day) of a Sentinel coordinates file named like 'XX2023_08_15____*.json'.
+    """
+    underscore_date = file_name[2:file_name.index("____")]
+    split_date = underscore_date.split("_")
+    return split_date[0], MONTHS[split_date[1]], split_date[2]
+
+
+def sentinel_date_key(year: str, month_name: str, day: str) -> int:
+    """
+    The date key of a Sentinel file's date, or INVALID_DATE_KEY (which matches nothing) if it is not a calendar date.
+    """
+    try:
+        return date_key(int(year), MONTH_NUMBERS[month_name], int(day))
+    except (KeyError, ValueError):
+        return INVALID_DATE_KEY
+
+
+def feed_date_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Normalize the 'Year', 'Month' (full month name) and 'Day' columns of a social feed into one date key per row.
+
+    Year and day are truncated to integers like the scrapers' own int() casts; rows with a missing or
+    unparseable component get INVALID_DATE_KEY. Feeds read from the columnar work format carry a precomputed
+    'date_key' column, which is used as is.
+    """
+    if len(df) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if "date_key" in df.columns:
+        return df["date_key"].to_numpy(dtype=np.int64)
+
+    year = np.trunc(pd.to_numeric(df["Year"], errors="coerce"))
+    month = df["Month"].map(MONTH_NUMBERS)
+    day = np.trunc(pd.to_numeric(df["Day"], errors="coerce"))
+
+    dates = pd.to_datetime(
+        pd.DataFrame({"year": year, "month": month, "day": day}),
+        errors="coerce",
+    )
+    keys = dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    keys[dates.isna().to_numpy()] = INVALID_DATE_KEY
+    return keys
+
+
+def sort_by_key(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stable-sort row positions by date key.
+
+    :return: (order, unique keys, starts, stops), where order[starts[i]:stops[i]] are the positions of unique key i.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    unique_keys, starts = np.unique(sorted_keys, return_index=True)
+    stops = np.append(starts[1:], len(sorted_keys))
+    return order, unique_keys, starts, stops
+
+
+def group_positions_by_key(keys: np.ndarray) -> Dict[int, np.ndarray]:
+    """
+    Hash the row positions of a feed by date key. Positions keep their original order within a key.
+    """
+    return groups_from_ranges(*sort_by_key(keys))
+
+
+def groups_from_ranges(order: np.ndarray, unique_keys: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> Dict[int, np.ndarray]:
+    return {
+        int(key): order[start:stop]
+        for key, start, stop in zip(unique_keys, starts, stops)
+        if key != INVALID_DATE_KEY
+    }
+
+
+class DateIndexedFeed:
+    """
+    A social feed whose rows are bucketed by date key once, so that each Sentinel date is a dictionary lookup.
+
+    The buckets can be passed in as groups, e.g. from a persisted feed date index, instead of being computed from df.
+    """
+    def __init__(self, feed: SocialFeed, df: pd.DataFrame, groups: Dict[int, np.ndarray] | None = None) -> None:
+        self._feed = feed
+        self._df = df
+        self._groups = groups if groups is not None else group_positions_by_key(feed_date_keys(df))
+
+    @property
+    def feed(self) -> SocialFeed:
+        return self._feed
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._df
+
+    def positions_for_date(self, key: int) -> np.ndarray:
+        return self._groups.get(key, np.empty(0, dtype=np.int64))
+
+    def positions_in_window(self, key: int, days: int) -> np.ndarray:
+        """
+        The positions of the rows dated within `days` days of the date key, in feed order.
+        """
+        groups = [self._groups[window_key] for window_key in range(key - days, key + days + 1) if window_key in self._groups]
+        if not groups:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(groups))
+
+    def rows(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        Turn the feed rows at the given positions into augmentation output rows.
+        """
+        if len(positions) == 0:
+            return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+        return self._output_rows(self._df.iloc[positions])
+
+    def _output_rows(self, matched: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "Status": f"{self._feed.status_prefix} " + matched["Disaster_Type"].astype(str),
+                "Lattitude": matched["Resolved_Latitude"],
+                "Longitude": matched["Resolved_Longitude"],
+                "Title": matched["Title"],
+                "Text": matched[self._feed.text_column],
+                "Location": matched["Extracted_Location"],
+            },
+            columns=OUTPUT_COLUMNS,
+        ).reset_index(drop=True)
+
+    def rows_for_date(self, key: int) -> pd.DataFrame:
+        return self.rows(self.positions_for_date(key))
+
+
+def sentinel_rows(sentinel_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn the fire points of a Sentinel coordinates file into augmentation output rows.
+    """
+    if len(sentinel_df) == 0:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    return pd.DataFrame(
+        {
+            "Status": sentinel_df["status"],
+            "Lattitude": sentinel_df["latitude"],
+            "Longitude": sentinel_df["longitude"],
+            "Title": "n/a",
+            "Text": "n/a",
+            "Location": "n/a",
+        },
+        columns=OUTPUT_COLUMNS,
+    ).reset_index(drop=True)
+
+
+def join_date_rows(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Stack the output rows of one date: Sentinel fire points first, then the matched posts of each feed in order.
+    """
+    frames = [frame for frame in frames if len(frame) > 0]
+    if not frames:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    # Build from plain rows so column dtypes are inferred exactly as for a row-by-row constructed frame.
+    rows = np.concatenate([frame.to_numpy(dtype=object) for frame in frames]).tolist()
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from typing import Any, Callable, List, Sequence, Tuple, TypeVar
+
+
+TItem = TypeVar("TItem")
+TResult = TypeVar("TResult")
+
+
+def map_isolated(fn: Callable[[TItem], TResult], items: Sequence[TItem], max_workers: int) -> List[TResult | Exception]:
+    """
+    Apply fn to every item on a bounded thread pool.
+
+    Results keep the order of the items. An item whose call raised gets the exception in place of its result,
+    so one failure does not cancel the others.
+    """
+    def _call(item: TItem) -> TResult | Exception:
+        try:
+            return fn(item)
+        except Exception as error:
+            return error
+
+    if not items:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(_call, items))
+
+
+class BoundedPipeline:
+    """
+    Runs items through a chain of stages, each drained by its own worker threads from a bounded queue.
+
+    put() blocks while the first queue is full, so a fast producer is held back by the slowest stage instead of
+    buffering without bound. An item whose stage raised skips the remaining stages and gets the exception as result.
+    """
+    _DONE = object()
+
+    def __init__(self, stages: Sequence[Tuple[Callable[[Any], Any], int]], max_pending: int) -> None:
+        """
+        :param stages: the function of each stage, applied to the output of the previous one, and its number of workers.
+        :param max_pending: the maximum number of items waiting in front of each stage.
+        """
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max(1, max_pending)) for _ in stages]
+        self._results: List[Tuple[Any, Any]] = []
+        self._lock = threading.Lock()
+        self._workers: List[List[threading.Thread]] = []
+        for index, (fn, workers) in enumerate(stages):
+            self._workers.append([
+                threading.Thread(target=self._work, args=(index, fn), name=f"pipeline-stage-{index}", daemon=True)
+                for _ in range(max(1, workers))
+            ])
+        for stage_workers in self._workers:
+            for worker in stage_workers:
+                worker.start()
+
+    def put(self, item: Any) -> None:
+        """
+        Feed an item to the first stage, blocking while the stage has max_pending items waiting.
+        """
+        self._queues[0].put((item, item))
+
+    def close(self) -> List[Tuple[Any, Any]]:
+        """
+        Wait for every item to go through all stages. Returns each item, in completion order, with the output of the
+        last stage or the exception that stopped it.
+        """
+        for index, stage_workers in enumerate(self._workers):
+            for _ in stage_workers:
+                self._queues[index].put(self._DONE)
+            for worker in stage_workers:
+                worker.join()
+        return self._results
+
+    def _work(self, index: int, fn: Callable[[Any], Any]) -> None:
+        while True:
+            entry = self._queues[index].get()
+            if entry is self._DONE:
+                return
+            item, value = entry
+            try:
+                output = fn(value)
+            except Exception as error:
+                output = error
+            if isinstance(output, Exception) or index == len(self._queues) - 1:
+                with self._lock:
+                    self._results.append((item, output))
+            else:
+                self._queues[index + 1].put((item, output))
@@ -0,0 +1,226 @@
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.sdk.models import DownloadResult, ProtocolEnum
+
+
+class DownloadCache:
+    """
+    Content-addressed on-disk cache of downloaded sources, shared by every job and worker on a host.
+
+    Entries are keyed by protocol, relative_path and an optional validator (ETag or content hash); their bytes live
+    in read-only blobs named after their SHA256, so identical content is stored once. Cached files are hard-linked
+    into the job's work dir (copied if the work dir is on another filesystem). Entries are evicted least recently
+    used first once the blobs exceed `max_bytes`. Derived files of a blob, like feed date indexes, live in `indexes/`
+    under the blob's SHA256 and are evicted with it.
+
+    Writers serialize on a lock file and publish blobs and entries with atomic renames, so concurrent workers never
+    see partial files.
+    """
+    def __init__(self, root: str, max_bytes: int = 10 * 1024 ** 3) -> None:
+        self._root = root
+        self._max_bytes = max_bytes
+        self._entries_dir = os.path.join(root, "entries")
+        self._blobs_dir = os.path.join(root, "blobs")
+        self._indexes_dir = os.path.join(root, "indexes")
+        self._lock_path = os.path.join(root, ".lock")
+        self._logger = logging.getLogger(__name__)
+        os.makedirs(self._entries_dir, exist_ok=True)
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        os.makedirs(self._indexes_dir, exist_ok=True)
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    @property
+    def indexes_dir(self) -> str:
+        return self._indexes_dir
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self._logger
+
+    @staticmethod
+    def key(protocol: ProtocolEnum, relative_path: str, validator: str | None = None) -> str:
+        return hashlib.sha256(f"{protocol.value}:{relative_path}:{validator or ''}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._entries_dir, f"{key}.json")
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self._blobs_dir, sha256[:2], sha256)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_entry(self, key: str) -> Dict[str, Any] | None:
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, protocol: ProtocolEnum, relative_path: str, file_path: str, validator: str | None = None) -> DownloadResult | None:
+        """
+        Place the cached copy of a source at file_path.
+
+        :return: the download result of the cached copy, or None on a cache miss.
+        """
+        key = self.key(protocol, relative_path, validator)
+        entry = self._read_entry(key)
+        if not entry:
+            return None
+
+        try:
+            self._link(self._blob_path(entry["sha256"]), file_path)
+        except FileNotFoundError:
+            # evicted by another worker since the entry was read
+            return None
+
+        # the entry's mtime is its last access, for LRU eviction
+        try:
+            os.utime(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+        return DownloadResult(modified=True, size=entry["size"], etag=entry.get("etag"), sha256=entry["sha256"], from_cache=True)
+
+    def put(self, protocol: ProtocolEnum, relative_path: str, file_path: str, validator: str | None = None, etag: str | None = None, sha256: str | None = None) -> None:
+        """
+        Add a downloaded file to the cache, then evict least recently used entries if over budget.
+        """
+        sha256 = sha256 or file_sha256(file_path)
+        blob_path = self._blob_path(sha256)
+        entry = {
+            "protocol": protocol.value,
+            "relative_path": relative_path,
+            "validator": validator,
+            "etag": etag,
+            "sha256": sha256,
+            "size": os.path.getsize(file_path),
+        }
+
+        with self._locked():
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".part")
+                os.close(fd)
+                try:
+                    shutil.copyfile(file_path, tmp_path)
+                    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                    os.replace(tmp_path, blob_path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+
+            fd, tmp_path = tempfile.mkstemp(dir=self._entries_dir, suffix=".part")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._entry_path(self.key(protocol, relative_path, validator)))
+
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Drop the blobs no entry references anymore, e.g. the previous content of a source rewritten in place, then
+        least recently used entries and their blobs until the blobs fit the budget.
+        """
+        entries: List[Tuple[float, str, Dict[str, Any]]] = []
+        for name in os.listdir(self._entries_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self._entries_dir, name)
+            try:
+                with open(path) as f:
+                    entries.append((os.path.getmtime(path), path, json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+        blob_sizes = {entry["sha256"]: entry["size"] for _, _, entry in entries}
+        references: Dict[str, int] = {}
+        for _, _, entry in entries:
+            references[entry["sha256"]] = references.get(entry["sha256"], 0) + 1
+
+        for sha256 in self._blobs():
+            if sha256 not in references:
+                self._remove_blob(sha256)
+
+        total_bytes = sum(blob_sizes.values())
+        for _, path, entry in sorted(entries, key=lambda item: item[0]):
+            if total_bytes <= self._max_bytes:
+                break
+            os.remove(path)
+            references[entry["sha256"]] -= 1
+            if references[entry["sha256"]] == 0:
+                self._remove_blob(entry["sha256"])
+                total_bytes -= blob_sizes[entry["sha256"]]
+                self.logger.info(f"Evicted {entry['relative_path']} from the download cache")
+
+    def _blobs(self) -> List[str]:
+        """
+        The SHA256 of every published blob.
+        """
+        return [
+            name
+            for directory in os.listdir(self._blobs_dir)
+            if os.path.isdir(os.path.join(self._blobs_dir, directory))
+            for name in os.listdir(os.path.join(self._blobs_dir, directory))
+            if not name.endswith(".part")
+        ]
+
+    def _remove_blob(self, sha256: str) -> None:
+        """
+        Remove a blob and its derived files. Copies hard-linked into work dirs keep their content.
+        """
+        try:
+            os.remove(self._blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        for name in os.listdir(self._indexes_dir):
+            if name.startswith(f"{sha256}."):
+                os.remove(os.path.join(self._indexes_dir, name))
+
+    @staticmethod
+    def _link(blob_path: str, file_path: str) -> None:
+        """
+        Atomically place a blob at file_path, as a hard link if possible and as a copy otherwise.
+        """
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{os.getpid()}.{time.monotonic_ns()}.part")
+        try:
+            os.link(blob_path, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(blob_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
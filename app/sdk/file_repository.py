@@ -1,9 +1,56 @@
+import hashlib
+import io
 import logging
 import os
 import shutil
+import tempfile
+from typing import BinaryIO, Callable
 
 import requests
-from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from requests.adapters import HTTPAdapter
+from app.sdk.models import DownloadResult, KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.resilience import CircuitBreaker, RetryableError, RetryPolicy, call_with_retries
+
+
+# failures of a transfer to or from a signed url that are worth another attempt
+_RETRYABLE_TRANSFER_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, RetryableError)
+
+
+class _HashingReader:
+    """
+    Wraps a binary file so that reading it for an upload computes its MD5 and SHA256 on the fly and reports progress.
+
+    Exposes its length, so requests sends a Content-Length instead of a chunked body, as presigned PUTs require.
+    """
+    def __init__(self, f, length: int, chunk_size: int, on_progress: Callable[[int, int], None] | None = None) -> None:
+        self._f = f
+        self._length = length
+        self._chunk_size = chunk_size
+        self._on_progress = on_progress
+        self._read = 0
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._length - self._read:
+            size = self._length - self._read
+        data = self._f.read(size)
+        self.md5.update(data)
+        self.sha256.update(data)
+        self._read += len(data)
+        if data and self._on_progress:
+            self._on_progress(self._read, self._length)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self._chunk_size)
+            if not data:
+                return
+            yield data
 
 
 class FileRepository:
@@ -11,10 +58,22 @@ class FileRepository:
             self,
             protocol: ProtocolEnum,
             data_dir: str = "data",  # can be used for config
+            chunk_size: int = 1024 * 1024,
+            pool_maxsize: int = 16,
+            retry_policy: RetryPolicy = RetryPolicy(),
+            breaker: CircuitBreaker | None = None,
     ) -> None:
         self._protocol = protocol
         self._data_dir = data_dir
+        self._chunk_size = chunk_size
+        self._retry_policy = retry_policy
+        self._breaker = breaker or CircuitBreaker("object store")
         self._logger = logging.getLogger(__name__)
+        # Pooled session, so transfers to the object store reuse their connections
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
     @property
     def protocol(self) -> ProtocolEnum:
@@ -24,9 +83,23 @@ class FileRepository:
     def data_dir(self) -> str:
         return self._data_dir
     
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size
+
     @property
     def logger(self) -> logging.Logger:
         return self._logger
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    def close(self) -> None:
+        """
+        Close the pooled connections of the repository.
+        """
+        self._session.close()
     
     def file_name_to_pfn(self, file_name: str) -> str:
         return f"{self.protocol}://{file_name}"
@@ -58,37 +131,158 @@ class FileRepository:
 
         return pfn
 
+    def save_bytes_locally(self, content: bytes | BinaryIO, source_data: KernelPlancksterSourceData, file_type: str) -> str:
+        """
+        Save an in-memory body, bytes or a binary stream read from its current position, to a local directory, like
+        save_file_locally.
+        """
+
+        file_name = self.source_data_to_file_name(source_data)
+        self.logger.info(f"Saving {file_type} '{source_data}' to '{file_name}'.")
+
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "wb") as f:
+            if isinstance(content, bytes):
+                f.write(content)
+            else:
+                shutil.copyfileobj(content, f, self.chunk_size)
+
+        self.logger.info(f"Saved {file_type} '{source_data}' to '{file_name}'.")
+
+        return self.file_name_to_pfn(file_name)
+
         
 
 
-    def public_upload(self, signed_url: str, file_path: str) -> None:
+    def public_upload(self, signed_url: str, file_path: str) -> str:
         """
         Upload a file to a signed url.
 
+        The MD5 and SHA256 of the file are computed while it is sent. When the object store answers with a plain
+        MD5 ETag, it is checked against the local MD5. Connection errors, 5xx answers and corrupted uploads are retried
+        with the repository's retry policy; a signed PUT can not be resumed, so each attempt re-sends the whole file.
+
         :param signed_url: The signed url to upload to.
         :param file_path: The path to the file to upload.
+        :return: The SHA256 hex digest of the uploaded file.
         """
 
-        with open(file_path, "rb") as f:
-            upload_res = requests.put(signed_url, data=f,verify=False)
+        file_size = os.path.getsize(file_path)
+
+        def _log_progress(sent: int, total: int) -> None:
+            self.logger.debug(f"Uploaded {sent}/{total} bytes of '{file_path}'.")
+
+        def _upload() -> str:
+            with open(file_path, "rb") as f:
+                reader = _HashingReader(f, file_size, self.chunk_size, _log_progress)
+                upload_res = self._session.put(signed_url, data=reader, verify=False)
+
+            self._check_upload(upload_res, reader.md5.hexdigest())
+            return reader.sha256.hexdigest()
+
+        return self._with_upload_retries(_upload, f"'{file_path}'")
+
+    def public_upload_bytes(self, signed_url: str, content: bytes | BinaryIO, description: str, content_encoding: str | None = None) -> str:
+        """
+        Upload an in-memory body to a signed url, without a local file.
+
+        Checked and retried like public_upload. A stream is sent in chunks of `chunk_size` bytes from its current
+        position to its end. It must be seekable: a signed PUT needs the Content-Length up front, and every attempt
+        re-reads the body.
+
+        :param signed_url: The signed url to upload to.
+        :param content: The body to upload, already encoded: bytes, or a seekable binary stream such as an io.BytesIO.
+        :param description: What is uploaded, for the logs.
+        :param content_encoding: The Content-Encoding of the body, e.g. "gzip", so that readers decode it transparently.
+        :return: The SHA256 hex digest of the uploaded body.
+        """
+
+        headers = {"Content-Encoding": content_encoding} if content_encoding else None
+        body = io.BytesIO(content) if isinstance(content, bytes) else content
+        start = body.tell()
+        length = body.seek(0, io.SEEK_END) - start
+
+        def _upload() -> str:
+            body.seek(start)
+            reader = _HashingReader(body, length, self.chunk_size)
+            upload_res = self._session.put(signed_url, data=reader, headers=headers, verify=False)
 
+            self._check_upload(upload_res, reader.md5.hexdigest())
+            return reader.sha256.hexdigest()
+
+        return self._with_upload_retries(_upload, description)
+
+    def _check_upload(self, upload_res: requests.Response, md5: str) -> None:
+        if upload_res.status_code >= 500:
+            raise RetryableError(f"Failed to upload file to signed url: {upload_res.text}")
         if upload_res.status_code != 200:
             raise ValueError(f"Failed to upload file to signed url: {upload_res.text}")
 
-    def public_download(self, signed_url: str, file_path: str) -> None:
-            """
-            download a file from a signed url.
+        # ETags that are not a plain MD5, e.g. from other object stores, can not be compared with the MD5 of the body
+        etag = upload_res.headers.get("ETag", "").strip('"')
+        if len(etag) == 32 and etag != md5:
+            raise RetryableError(f"Uploaded file is corrupted: object store ETag {etag} does not match local MD5 {md5}")
+
+    def _with_upload_retries(self, upload: Callable[[], object], description: str):
+        try:
+            return call_with_retries(upload, self._retry_policy, _RETRYABLE_TRANSFER_ERRORS, f"Upload of {description}", self.logger, self.breaker)
+        except _RETRYABLE_TRANSFER_ERRORS as error:
+            raise ValueError(f"Failed to upload {description} after {self._retry_policy.retries + 1} attempts: {error}") from error
+
+    def public_download(self, signed_url: str, file_path: str, etag: str | None = None) -> DownloadResult:
+        """
+        Download a file from a signed url.
+
+        The body is streamed to a temporary file in chunks of `chunk_size` bytes, which is renamed to `file_path`
+        once complete, so memory stays bounded and readers never see a partial file.
 
-            :param signed_url: The signed url to upload to.
-            :param file_path: The path to the file to upload.
-                """
-  
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            print(os.path.dirname(file_path))
-            with open(file_path, "wb") as f:
-                download_res = requests.get(signed_url, verify=False)
-                f.write(download_res.content)
+        :param signed_url: The signed url to download from.
+        :param file_path: The path to download the file to.
+        :param etag: The ETag of the local copy at `file_path`, if any. The download is then conditional, and the
+            local copy is kept if the object did not change.
 
+        Connection errors, interrupted bodies and 5xx answers are retried with the repository's retry policy.
+        """
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+
+        return call_with_retries(
+            lambda: self._download(signed_url, file_path, directory, etag),
+            self._retry_policy,
+            _RETRYABLE_TRANSFER_ERRORS,
+            f"Download of '{file_path}'",
+            self.logger,
+            self.breaker,
+        )
+
+    def _download(self, signed_url: str, file_path: str, directory: str, etag: str | None) -> DownloadResult:
+        headers = {"If-None-Match": etag} if etag else None
+        with self._session.get(signed_url, headers=headers, stream=True, verify=False) as download_res:
+            if download_res.status_code == 304 and os.path.exists(file_path):
+                return DownloadResult(modified=False, size=os.path.getsize(file_path), etag=etag)
+
+            if download_res.status_code >= 500:
+                raise RetryableError(f"Failed to download file from signed url: {download_res.text}")
             if download_res.status_code != 200:
                 raise ValueError(f"Failed to download file from signed url: {download_res.text}")
 
+            sha256 = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in download_res.iter_content(chunk_size=self.chunk_size):
+                        sha256.update(chunk)
+                        f.write(chunk)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            return DownloadResult(
+                modified=True,
+                size=os.path.getsize(file_path),
+                etag=download_res.headers.get("ETag"),
+                sha256=sha256.hexdigest(),
+            )
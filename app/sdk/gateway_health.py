@@ -0,0 +1,82 @@
+from enum import Enum
+import threading
+import time
+from typing import Dict
+
+
+class GatewayHealthState(Enum):
+    UNKNOWN = "unknown"
+    HEALTHY = "healthy"
+    UNHEALTHY = "unhealthy"
+
+
+class GatewayHealth:
+    """
+    Tracks whether Kernel Planckster was reachable recently, so that callers only ping it when they have to.
+
+    Any successful request counts as proof of liveness. The gateway is pinged again only once the last success
+    is older than the TTL, or after a failure.
+    """
+    def __init__(self, ttl: float = 30.0) -> None:
+        self._ttl = ttl
+        self._state = GatewayHealthState.UNKNOWN
+        self._last_success = 0.0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "pings_sent": 0,
+            "pings_skipped": 0,
+            "successes": 0,
+            "failures": 0,
+        }
+        self._transitions: Dict[str, int] = {}
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def state(self) -> GatewayHealthState:
+        return self._state
+
+    def is_fresh(self) -> bool:
+        """
+        Whether the gateway was seen alive within the TTL and has not failed since.
+        """
+        with self._lock:
+            return self._state == GatewayHealthState.HEALTHY and time.monotonic() - self._last_success < self._ttl
+
+    def record_ping(self) -> None:
+        with self._lock:
+            self._counters["pings_sent"] += 1
+
+    def record_skipped_ping(self) -> None:
+        with self._lock:
+            self._counters["pings_skipped"] += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counters["successes"] += 1
+            self._last_success = time.monotonic()
+            self._transition(GatewayHealthState.HEALTHY)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters["failures"] += 1
+            self._transition(GatewayHealthState.UNHEALTHY)
+
+    def _transition(self, state: GatewayHealthState) -> None:
+        if state != self._state:
+            transition = f"{self._state.value}->{state.value}"
+            self._transitions[transition] = self._transitions.get(transition, 0) + 1
+            self._state = state
+
+    def metrics(self) -> Dict[str, object]:
+        """
+        A snapshot of the health counters, e.g. to see how many pings the TTL saved.
+        """
+        with self._lock:
+            return {
+                "state": self._state.value,
+                **self._counters,
+                "transitions": dict(self._transitions),
+            }
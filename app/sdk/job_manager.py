@@ -1,43 +1,266 @@
-from typing import Any, Dict, List
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+import logging
+import multiprocessing
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Set, Tuple
 import os
 
-from app.sdk.models import BaseJob
+from app.sdk.job_store import BaseJobStore, InMemoryJobStore
+from app.sdk.metrics import LatencyHistograms, StageMetrics, render_prometheus
+from app.sdk.models import BaseJob, BaseJobState, JobOutput
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when a job is started while every worker is busy and the job queue is full.
+    """
 
 
 class BaseJobManager:
-    def __init__(self) -> None:
-        self._jobs: Dict[int, BaseJob] = {}
-        self._nonce = 0
+    """
+    Keeps track of jobs and runs them on a bounded pool of worker processes.
+
+    Started jobs wait in a bounded queue; a dispatcher thread hands them to the pool as soon as a worker is free, so a
+    job is RUNNING exactly while a worker process executes it. Starting a job while the queue is full raises
+    JobQueueFullError instead of piling up work. While a job runs its heartbeat is touched every `heartbeat_interval`
+    seconds.
+
+    The worker is called in a worker process as `worker(job_id=..., tracer_id=..., **job.args)` and returns a
+    JobOutput, so it must be picklable, e.g. a module level function or a functools.partial of one.
+
+    Jobs are kept in a job store, in memory by default. Every state change is saved to the store. Jobs a previous
+    process left queued or running are only marked failed by `recover_interrupted_jobs`, which the process owning
+    the store calls once on startup: other managers opened on the same store must not fail the jobs it is running.
+    """
+    def __init__(
+        self,
+        worker: Callable[..., JobOutput] | None = None,
+        max_workers: int = 2,
+        max_queued: int = 16,
+        heartbeat_interval: float = 5.0,
+        store: BaseJobStore | None = None,
+    ) -> None:
+        self._store = store or InMemoryJobStore()
+        self._worker = worker
+        self._max_workers = max_workers
+        self._heartbeat_interval = heartbeat_interval
+        self._queue: "queue.Queue[BaseJob | None]" = queue.Queue(maxsize=max_queued)
+        self._free_workers = threading.Semaphore(max_workers)
+        self._started: Set[int] = set()
+        self._running: Dict[int, Tuple[BaseJob, Future]] = {}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._executor: ProcessPoolExecutor | None = None
+        self._threads: List[threading.Thread] = []
+        self._logger = logging.getLogger(__name__)
+        # totals over the reports of every job this manager ran
+        self._stage_metrics = StageMetrics()
+        self._gateway_latencies = LatencyHistograms()
 
     @property
     def name(self) -> str:
         return os.getenv("JOB_MANAGER_NAME", "default")
 
     @property
-    def jobs(self) -> Dict[int, BaseJob]:
-        return self._jobs
+    def store(self) -> BaseJobStore:
+        return self._store
 
     @property
     def nonce(self) -> int:
-        self._nonce = self._nonce + 1
-        return self._nonce
+        return self._store.next_id()
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self._logger
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    @property
+    def queued_jobs(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running_jobs(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def metrics(self) -> str:
+        """
+        The stage totals and gateway latencies of the jobs run so far and the current queue, in the Prometheus text format.
+        """
+        return render_prometheus(
+            self._stage_metrics.snapshot(),
+            self._gateway_latencies.snapshot(),
+            gauges={"augmentation_jobs": {"queued": self.queued_jobs, "running": self.running_jobs}},
+        )
 
     def create_job(
         self, tracer_id: str, job_args: Dict[str, Any], *args: Any, **kwargs: Any
     ) -> BaseJob:
         id = self.nonce
+        now = datetime.now()
         job = BaseJob(
             id=id,
             name=f"{self.name}-{id}",
             tracer_id=tracer_id,
             args=job_args,
+            created_at=now,
+            heartbeat=now,
         )
 
-        self.jobs[job.id] = job  # type: ignore
+        self._store.save(job)
         return job
 
     def get_job(self, job_id: int) -> BaseJob:
-        return self.jobs[job_id]
+        with self._lock:
+            # a running job is served as the object its worker updates
+            if job_id in self._running:
+                return self._running[job_id][0]
+        return self._store.get(job_id)
+
+    def list_jobs(self, tracer_id: str | None = None, state: BaseJobState | None = None, limit: int | None = 100, before_id: int | None = None) -> List[BaseJob]:
+        """
+        List jobs newest first, optionally filtered by tracer_id and state. Pass the id of the last job of a page as
+        before_id to get the next page.
+        """
+        return self._store.list(tracer_id=tracer_id, state=state, limit=limit, before_id=before_id)
+
+    def recover_interrupted_jobs(self) -> None:
+        """
+        Mark the jobs a previous process left queued or running as failed. Call it once, before any job is started.
+        """
+        for state in (BaseJobState.RUNNING, BaseJobState.CREATED):
+            for job in self._store.list(state=state, limit=None):
+                if state == BaseJobState.CREATED and not job.messages:
+                    # never started, it can still be started
+                    continue
+                self._fail(job, ValueError("The job was interrupted by a restart of the job manager"))
+
+    def start_job(self, job_id: int) -> BaseJob:
+        """
+        Queue a created job for execution.
+
+        :raises KeyError: if there is no such job.
+        :raises ValueError: if the job was already started, or the manager has no worker or was shut down.
+        :raises JobQueueFullError: if the job queue is full.
+        """
+        if self._worker is None:
+            raise ValueError("This job manager has no worker to run jobs with")
+        if self._stopped.is_set():
+            raise ValueError("This job manager was shut down")
+
+        with self._lock:
+            job = self.get_job(job_id)
+            if job.state != BaseJobState.CREATED or job_id in self._started:
+                raise ValueError(f"Job {job_id} was already started")
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFullError(f"Job {job_id} can not be queued, {self._queue.maxsize} jobs are already waiting")
+            self._started.add(job_id)
+            job.messages.append("Status: QUEUED.")
+            job.touch()
+            self._store.save(job)
+            self._start_threads()
+
+        return job
+
+    def _start_threads(self) -> None:
+        if self._threads:
+            return
+
+        # spawned workers do not inherit the server's threads and locks, which forked ones would
+        self._executor = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._threads = [
+            threading.Thread(target=self._dispatch, name=f"{self.name}-dispatcher", daemon=True),
+            threading.Thread(target=self._beat, name=f"{self.name}-heartbeat", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _dispatch(self) -> None:
+        """
+        Hand queued jobs to the process pool, one per free worker.
+        """
+        while True:
+            self._free_workers.acquire()
+            job = self._queue.get()
+            if job is None or self._stopped.is_set():
+                self._free_workers.release()
+                return
+
+            with self._lock:
+                job.state = BaseJobState.RUNNING
+                job.messages.append("Status: RUNNING.")
+                job.touch()
+                self._store.save(job)
+                try:
+                    future = self._executor.submit(self._worker, job_id=job.id, tracer_id=job.tracer_id, **job.args)  # type: ignore
+                except Exception as error:
+                    self._free_workers.release()
+                    self._fail(job, error)
+                    continue
+                self._running[job.id] = (job, future)
+
+            self.logger.info(f"{job.id}: Job started")
+            future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+    def _finish(self, job: BaseJob, future: Future) -> None:
+        self._free_workers.release()
+        with self._lock:
+            self._running.pop(job.id, None)
+            try:
+                job_output: JobOutput = future.result()
+            except Exception as error:
+                self._fail(job, error)
+                return
+
+            job.state = job_output.job_state
+            job.output_source_data_list = job_output.source_data_list or []
+            if job_output.report:
+                self._stage_metrics.merge(job_output.report.get("stages", {}))
+                self._gateway_latencies.merge(job_output.report.get("gateway_latencies", {}))
+            job.messages.append(f"Status: {job_output.job_state.value.upper()}.")
+            job.touch()
+            self._store.save(job)
+
+        self.logger.info(f"{job.id}: Job {job_output.job_state.value}")
+
+    def _fail(self, job: BaseJob, error: BaseException) -> None:
+        with self._lock:
+            job.state = BaseJobState.FAILED
+            job.messages.append(f"Status: FAILED. {error}")
+            job.touch()
+            self._store.save(job)
+        self.logger.error(f"{job.id}: Job failed. Error:\n{error}")
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(self._heartbeat_interval):
+            with self._lock:
+                for job, _ in self._running.values():
+                    job.touch()
+                    self._store.save(job)
 
-    def list_jobs(self) -> List[BaseJob]:
-        return list(self._jobs.values())
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop taking jobs, fail the queued ones and, with wait, let the running ones finish.
+        """
+        self._stopped.set()
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._fail(job, ValueError("The job manager was shut down before the job started"))
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._store.close()
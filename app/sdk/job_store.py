@@ -0,0 +1,257 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from app.sdk.models import BaseJob, BaseJobState
+
+
+# states of jobs that are done, only those are dropped by the retention policy
+FINAL_STATES = (BaseJobState.FINISHED, BaseJobState.FAILED)
+
+
+class BaseJobStore(ABC):
+    """
+    Where a job manager keeps its jobs. Listings are newest first and paginated with `before_id`, the id of the
+    last job of the previous page.
+
+    With a retention, finished and failed jobs whose heartbeat is older than the retention are dropped. The policy is
+    applied at most every `purge_interval` seconds, when jobs are saved.
+    """
+    def __init__(self, retention: timedelta | None = None, purge_interval: float = 60.0) -> None:
+        self._retention = retention
+        self._purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    @property
+    def retention(self) -> timedelta | None:
+        return self._retention
+
+    @abstractmethod
+    def next_id(self) -> int:
+        ...
+
+    @abstractmethod
+    def save(self, job: BaseJob) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: int) -> BaseJob:
+        """
+        :raises KeyError: if there is no such job.
+        """
+
+    @abstractmethod
+    def list(self, tracer_id: str | None = None, state: BaseJobState | None = None, limit: int | None = 100, before_id: int | None = None) -> List[BaseJob]:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """
+        Apply the retention policy, returning the number of jobs dropped.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def _maybe_purge(self) -> None:
+        if self._retention is not None and time.monotonic() - self._last_purge >= self._purge_interval:
+            self._last_purge = time.monotonic()
+            self.purge_expired()
+
+
+class InMemoryJobStore(BaseJobStore):
+    """
+    Keeps jobs in a dict, they are lost on restart.
+    """
+    def __init__(self, retention: timedelta | None = None, purge_interval: float = 60.0) -> None:
+        super().__init__(retention, purge_interval)
+        self._jobs: Dict[int, BaseJob] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._last_id += 1
+            return self._last_id
+
+    def save(self, job: BaseJob) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+        self._maybe_purge()
+
+    def get(self, job_id: int) -> BaseJob:
+        with self._lock:
+            return self._jobs[job_id]
+
+    def list(self, tracer_id: str | None = None, state: BaseJobState | None = None, limit: int | None = 100, before_id: int | None = None) -> List[BaseJob]:
+        with self._lock:
+            ids = sorted(self._jobs, reverse=True)
+            jobs = []
+            for job_id in ids:
+                job = self._jobs[job_id]
+                if before_id is not None and job_id >= before_id:
+                    continue
+                if (tracer_id is not None and job.tracer_id != tracer_id) or (state is not None and job.state != state):
+                    continue
+                jobs.append(job)
+                if limit is not None and len(jobs) >= limit:
+                    break
+            return jobs
+
+    def purge_expired(self) -> int:
+        if self._retention is None:
+            return 0
+        cutoff = datetime.now() - self._retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.state in FINAL_STATES and job.heartbeat < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    Keeps jobs in a local SQLite database, indexed by id, tracer_id, state and created_at, so that they survive
+    restarts and listing stays fast with many historical jobs.
+
+    The `cache_size` most recently used jobs are also kept in memory, so that polling a job does not hit the database.
+    """
+    def __init__(self, path: str, retention: timedelta | None = None, cache_size: int = 1024, purge_interval: float = 60.0) -> None:
+        super().__init__(retention, purge_interval)
+        self._path = path
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[int, BaseJob]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                tracer_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                heartbeat TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_tracer_id ON jobs (tracer_id, id);
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+            CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+            CREATE TABLE IF NOT EXISTS job_ids (last_id INTEGER NOT NULL);
+            """
+        )
+        with self._lock:
+            if self._connection.execute("SELECT COUNT(*) FROM job_ids").fetchone()[0] == 0:
+                last_id = self._connection.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+                self._connection.execute("INSERT INTO job_ids (last_id) VALUES (?)", (last_id,))
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self._logger
+
+    def next_id(self) -> int:
+        # ids are never reused, even after the jobs holding them were purged
+        with self._lock:
+            self._connection.execute("UPDATE job_ids SET last_id = last_id + 1")
+            return self._connection.execute("SELECT last_id FROM job_ids").fetchone()[0]
+
+    def save(self, job: BaseJob) -> None:
+        data = job.model_dump_json(exclude={"state"})
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, tracer_id, state, created_at, heartbeat, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.tracer_id, job.state.value, job.created_at.isoformat(), job.heartbeat.isoformat(), data),
+            )
+            self._remember(job)
+        self._maybe_purge()
+
+    def get(self, job_id: int) -> BaseJob:
+        with self._lock:
+            if job_id in self._cache:
+                self._cache.move_to_end(job_id)
+                return self._cache[job_id]
+
+            row = self._connection.execute("SELECT id, state, data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise KeyError(job_id)
+            job = self._load(*row)
+            self._remember(job)
+            return job
+
+    def list(self, tracer_id: str | None = None, state: BaseJobState | None = None, limit: int | None = 100, before_id: int | None = None) -> List[BaseJob]:
+        clauses = []
+        params: List[object] = []
+        if tracer_id is not None:
+            clauses.append("tracer_id = ?")
+            params.append(tracer_id)
+        if state is not None:
+            clauses.append("state = ?")
+            params.append(state.value)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        query = "SELECT id, state, data FROM jobs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+            # hot jobs are returned as the cached objects, which may be newer than their rows
+            return [self._cache[job_id] if job_id in self._cache else self._load(job_id, state, data) for job_id, state, data in rows]
+
+    def purge_expired(self) -> int:
+        if self._retention is None:
+            return 0
+
+        cutoff = (datetime.now() - self._retention).isoformat()
+        final_states = [state.value for state in FINAL_STATES]
+        with self._lock:
+            expired = [
+                job_id for (job_id,) in self._connection.execute(
+                    f"SELECT id FROM jobs WHERE state IN ({', '.join('?' for _ in final_states)}) AND heartbeat < ?",
+                    (*final_states, cutoff),
+                )
+            ]
+            self._connection.executemany("DELETE FROM jobs WHERE id = ?", ((job_id,) for job_id in expired))
+            for job_id in expired:
+                self._cache.pop(job_id, None)
+
+        if expired:
+            self.logger.info(f"Dropped {len(expired)} jobs older than {self._retention} from {self._path}")
+        return len(expired)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _remember(self, job: BaseJob) -> None:
+        self._cache[job.id] = job
+        self._cache.move_to_end(job.id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _load(job_id: int, state: str, data: str) -> BaseJob:
+        job = BaseJob.model_validate(json.loads(data))
+        job.state = BaseJobState(state)
+        return job
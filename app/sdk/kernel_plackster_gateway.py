@@ -1,19 +1,70 @@
+import copy
 import logging
 import json
+import time
+from typing import Iterator, List
 import httpx
 
+from app.sdk.concurrency import map_isolated
+from app.sdk.gateway_health import GatewayHealth
+from app.sdk.metrics import LatencyHistograms
 from app.sdk.models import KernelPlancksterSourceData
+from app.sdk.resilience import NO_RETRIES, CircuitBreaker, CircuitOpenError, RetryableError, RetryPolicy, call_with_retries
+
+
+class _ServerError(RetryableError):
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__(f"{response.status_code}: {response.text}")
+        self.response = response
 
 
 
 class KernelPlancksterGateway:
-    def __init__(self, host: str, port: str, auth_token: str, scheme: str) -> None:
+    def __init__(
+            self,
+            host: str,
+            port: str,
+            auth_token: str,
+            scheme: str,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30.0,
+            timeout: float = 5.0,
+            health_ttl: float = 30.0,
+            retry_policy: RetryPolicy = RetryPolicy(),
+            breaker: CircuitBreaker | None = None,
+    ) -> None:
         self._host = host
         self._port = port
         self._client_id = 1  # NOTE: this should match the default client for this project
         self._auth_token = auth_token
         self._scheme = scheme
         self._logger = logging.getLogger(__name__)
+        # One pooled, keep-alive client for the lifetime of the gateway, so control plane calls reuse connections
+        self._client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(timeout),
+        )
+        self._health = GatewayHealth(ttl=health_ttl)
+        self._latencies = LatencyHistograms()
+        self._retry_policy = retry_policy
+        self._breaker = breaker or CircuitBreaker("Kernel Planckster")
+
+    def __enter__(self) -> "KernelPlancksterGateway":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the pooled connections of the gateway. The gateway can not be used afterwards.
+        """
+        self._client.close()
 
     @property
     def url(self) -> str:
@@ -23,17 +74,108 @@ class KernelPlancksterGateway:
     def logger(self) -> logging.Logger:
         return self._logger
 
+    @property
+    def health(self) -> GatewayHealth:
+        return self._health
+
+    @property
+    def latencies(self) -> LatencyHistograms:
+        """
+        Request latency histograms by endpoint, e.g. "GET /client/{client_id}/source". Failed requests are included.
+        """
+        return self._latencies
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    def with_own_latencies(self) -> "KernelPlancksterGateway":
+        """
+        A view of the gateway that shares its pooled connections, health and circuit breaker, but records the latencies
+        of its own requests only, e.g. for the report of one of several concurrent jobs. Closing it closes the gateway.
+        """
+        view = copy.copy(self)
+        view._latencies = LatencyHistograms()
+        return view
+
     def ping(self) -> bool:
         self.logger.info(f"Pinging Kernel Plankster Gateway at {self.url}")
-        res = httpx.get(f"{self.url}/ping")
+        self.health.record_ping()
+        start_time = time.perf_counter()
+        try:
+            res = self._client.get(f"{self.url}/ping")
+        except httpx.TransportError:
+            self.health.record_failure()
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._latencies.observe("GET /ping", time.perf_counter() - start_time)
         self.logger.info(f"Ping response: {res.text}")
-        return res.status_code == 200
+        if res.status_code != 200:
+            self.health.record_failure()
+            self.breaker.record_failure()
+            return False
+        self.health.record_success()
+        self.breaker.record_success()
+        return True
+
+    def _ensure_alive(self) -> None:
+        """
+        Ping the gateway only if it has not been seen alive within the health TTL.
+
+        :raises CircuitOpenError: without pinging, while the circuit breaker is open.
+        """
+        if self.breaker.is_open():
+            raise CircuitOpenError(f"Kernel Planckster at {self.url} is unavailable, not calling it for up to {self.breaker.reset_timeout:.0f}s")
+
+        if self.health.is_fresh():
+            self.health.record_skipped_ping()
+            return
 
-    def generate_signed_url(self, source_data: KernelPlancksterSourceData) -> str:
         if not self.ping():
             self.logger.error(f"Failed to ping Kernel Plankster Gateway at {self.url}")
             raise Exception("Failed to ping Kernel Plankster Gateway")
 
+    def _request(self, method: str, url: str, retry: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request over the pooled client, through the circuit breaker. Any answer below 500 proves the gateway
+        is alive.
+
+        With retry, transport errors and 5xx answers are retried with the gateway's retry policy; only pass it for
+        idempotent requests. Once the retries are exhausted, the last 5xx answer is returned.
+        """
+        endpoint = f"{method} {url[len(self.url):]}".replace(f"/client/{self._client_id}/", "/client/{client_id}/")
+
+        def _send() -> httpx.Response:
+            start_time = time.perf_counter()
+            try:
+                res = self._client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                self.health.record_failure()
+                raise
+            finally:
+                self._latencies.observe(endpoint, time.perf_counter() - start_time)
+            if res.status_code >= 500:
+                self.health.record_failure()
+                raise _ServerError(res)
+            self.health.record_success()
+            return res
+
+        try:
+            return call_with_retries(
+                _send,
+                self._retry_policy if retry else NO_RETRIES,
+                (httpx.TransportError, _ServerError),
+                endpoint,
+                self.logger,
+                self.breaker,
+            )
+        except _ServerError as error:
+            return error.response
+
+    def generate_signed_url(self, source_data: KernelPlancksterSourceData) -> str:
+        self._ensure_alive()
+
         self.logger.info(f"Generating signed url for {source_data.relative_path}")
 
         endpoint = f"{self.url}/client/{self._client_id}/upload-credentials"
@@ -48,7 +190,8 @@ class KernelPlancksterGateway:
             "x-auth-token": self._auth_token,
             }
 
-        res = httpx.get(
+        res = self._request(
+            "GET",
             url=endpoint,
             params=params,
             headers=headers,
@@ -69,9 +212,7 @@ class KernelPlancksterGateway:
     
     def download_from_signed_url(self, source_data: KernelPlancksterSourceData):
 
-        if not self.ping():
-            self.logger.error(f"Failed to ping Kernel Plankster Gateway at {self.url}")
-            raise Exception("Failed to ping Kernel Plankster Gateway")
+        self._ensure_alive()
 
         self.logger.info(f"Generating signed url for {source_data.relative_path}")
 
@@ -87,7 +228,8 @@ class KernelPlancksterGateway:
             "x-auth-token": self._auth_token,
             }
 
-        res = httpx.get(
+        res = self._request(
+            "GET",
             url=endpoint,
             params=params,
             headers=headers,
@@ -106,6 +248,36 @@ class KernelPlancksterGateway:
 
         return signed_url
 
+    def generate_signed_urls(self, source_data_list: List[KernelPlancksterSourceData], max_workers: int = 8) -> List[str | Exception]:
+        """
+        Generate upload signed urls for many source data at once.
+
+        Kernel Planckster has no bulk credentials endpoint, so the requests are pipelined concurrently over the pooled client.
+
+        Args:
+        - source_data_list: the source data to generate upload urls for
+        - max_workers: the maximum number of requests in flight
+
+        Returns the signed url of each source data, in order, or the exception that prevented generating it.
+        """
+        self._ensure_alive()
+        return map_isolated(self.generate_signed_url, source_data_list, max_workers)
+
+    def download_from_signed_urls(self, source_data_list: List[KernelPlancksterSourceData], max_workers: int = 8) -> List[str | Exception]:
+        """
+        Generate download signed urls for many source data at once.
+
+        Kernel Planckster has no bulk credentials endpoint, so the requests are pipelined concurrently over the pooled client.
+
+        Args:
+        - source_data_list: the source data to generate download urls for
+        - max_workers: the maximum number of requests in flight
+
+        Returns the signed url of each source data, in order, or the exception that prevented generating it.
+        """
+        self._ensure_alive()
+        return map_isolated(self.download_from_signed_url, source_data_list, max_workers)
+
     def register_new_source_data(self, source_data: KernelPlancksterSourceData) -> dict[str, str]:
         """
         Registers new source data with Kernel Plankster Gateway.
@@ -114,9 +286,7 @@ class KernelPlancksterGateway:
         - source_data: KernelPlancksterSourceData
 
         """
-        if not self.ping():
-            self.logger.error(f"Failed to ping Kernel Plankster Gateway at {self.url}")
-            raise Exception("Failed to ping Kernel Plankster Gateway")
+        self._ensure_alive()
 
         self.logger.info(f"Registering new data with Kernel Plankster Gateway at {self.url}")
 
@@ -133,12 +303,46 @@ class KernelPlancksterGateway:
             "x-auth-token": self._auth_token,
             }
 
-        res = httpx.post(
-            url=endpoint,
-            params=params,
-            headers=headers,
-        )
-
+        # registering is not idempotent, so a failed attempt is only retried once it is known not to have registered.
+        # Once any attempt may have reached the gateway, every later retry looks the source up first, even after
+        # attempts that never connected.
+        ambiguous = False
+        res: httpx.Response | None = None
+        for retry in range(self._retry_policy.retries + 1):
+            if retry > 0:
+                delay = self._retry_policy.delay(retry - 1)
+                self.logger.warning(f"Registering {source_data.relative_path} failed, retrying in {delay:.2f}s ({retry}/{self._retry_policy.retries})")
+                time.sleep(delay)
+                if ambiguous:
+                    registered = self._find_source_data(source_data.relative_path)
+                    if registered:
+                        self.logger.info(f"{source_data.relative_path} was registered by the failed attempt")
+                        return registered
+
+            last_attempt = retry == self._retry_policy.retries
+            try:
+                res = self._request(
+                    "POST",
+                    url=endpoint,
+                    retry=False,
+                    params=params,
+                    headers=headers,
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # the request never reached the gateway
+                if last_attempt:
+                    raise
+                continue
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                ambiguous = True
+                continue
+            if res.status_code < 500:
+                break
+            ambiguous = True
+
+        assert res is not None
         self.logger.info(f"Register new data response: {res.text}")
         if res.status_code != 200:
             raise ValueError(
@@ -162,6 +366,16 @@ class KernelPlancksterGateway:
         return kp_source_data
     
 
+    def _find_source_data(self, relative_path: str) -> dict | None:
+        """
+        The listed source data at exactly relative_path, if it is registered.
+        """
+        for page in self.iter_source_data([relative_path]):
+            for source in page:
+                if source.get("relative_path") == relative_path:
+                    return source
+        return None
+
     def list_all_source_data(self):
         """
         Registers new source data with Kernel Plankster Gateway.
@@ -170,9 +384,7 @@ class KernelPlancksterGateway:
         - source_data: KernelPlancksterSourceData
 
         """
-        if not self.ping():
-            self.logger.error(f"Failed to ping Kernel Plankster Gateway at {self.url}")
-            raise Exception("Failed to ping Kernel Plankster Gateway")
+        self._ensure_alive()
 
         self.logger.info(f"Listing all data with Kernel Plankster Gateway at {self.url}")
 
@@ -185,7 +397,8 @@ class KernelPlancksterGateway:
             "x-auth-token": self._auth_token,
             }
 
-        res = httpx.get(
+        res = self._request(
+            "GET",
             url=endpoint,
             headers=headers,
         )
@@ -203,4 +416,74 @@ class KernelPlancksterGateway:
       
         return kp_list_sources
 
+    def iter_source_data(self, relative_path_prefixes: List[str] | None = None, page_size: int = 1000) -> Iterator[List[dict]]:
+        """
+        List the client's source data page by page, so that callers can start working before the listing is complete.
+
+        Every request asks for one page with the `offset` and `limit` query parameters and, with prefixes, for the
+        sources under them with repeated `relative_path_prefix` parameters. A gateway that ignores these answers with
+        the whole list: it is then split into pages here, and the prefixes are always also applied client-side.
+
+        Args:
+        - relative_path_prefixes: only list sources whose relative_path starts with one of these
+        - page_size: the number of sources asked for per request
+
+        Yields the non-empty pages of source data, as dicts like `list_all_source_data` returns.
+        """
+        self._ensure_alive()
+
+        self.logger.info(f"Listing data page by page with Kernel Plankster Gateway at {self.url}")
+
+        endpoint = f"{self.url}/client/{self._client_id}/source"
+
+        headers = {
+            "Content-Type": "application/json",
+            "x-auth-token": self._auth_token,
+            }
+
+        def relevant(sources: List[dict]) -> List[dict]:
+            if not relative_path_prefixes:
+                return sources
+            return [source for source in sources if source.get("relative_path", "").startswith(tuple(relative_path_prefixes))]
+
+        offset = 0
+        first_relative_path = None
+        while True:
+            params = [("offset", offset), ("limit", page_size)] + [("relative_path_prefix", prefix) for prefix in relative_path_prefixes or []]
+            res = self._request(
+                "GET",
+                url=endpoint,
+                params=params,
+                headers=headers,
+            )
+
+            if res.status_code != 200:
+                raise ValueError(
+                    f"Failed to list sources with Kernel Plankster Gateway: {res.text}"
+                )
+
+            page = res.json().get("source_data_list") or []
+
+            if len(page) > page_size:
+                # the gateway does not paginate and sent everything at once
+                sources = relevant(page)
+                for start in range(0, len(sources), page_size):
+                    yield sources[start:start + page_size]
+                return
+
+            if offset > 0 and page and page[0].get("relative_path") == first_relative_path:
+                # the gateway ignores the offset and sent the first page again, which was all there is
+                return
+
+            if offset == 0 and page:
+                first_relative_path = page[0].get("relative_path")
+
+            sources = relevant(page)
+            if sources:
+                yield sources
+
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
 
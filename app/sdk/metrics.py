@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+# upper bounds in seconds of the request latency histogram buckets, the last bucket is unbounded
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram of observed values, mergeable across processes through its snapshots.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self._buckets = tuple(buckets)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self._buckets) if value <= bound), len(self._buckets))
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        if tuple(snapshot["buckets"]) != self._buckets:
+            raise ValueError("Can not merge histograms with different buckets")
+        with self._lock:
+            self._counts = [count + other for count, other in zip(self._counts, snapshot["counts"])]
+            self._sum += snapshot["sum"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        The bucket bounds, the count of observations in each bucket (not cumulative, the last one is unbounded),
+        their sum and their count.
+        """
+        with self._lock:
+            return {"buckets": list(self._buckets), "counts": list(self._counts), "sum": self._sum, "count": sum(self._counts)}
+
+
+class LatencyHistograms:
+    """
+    One latency histogram per endpoint.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self._buckets = buckets
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, endpoint: str) -> Histogram:
+        with self._lock:
+            if endpoint not in self._histograms:
+                self._histograms[endpoint] = Histogram(self._buckets)
+            return self._histograms[endpoint]
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        self._histogram(endpoint).observe(seconds)
+
+    def merge(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        for endpoint, histogram in snapshot.items():
+            self._histogram(endpoint).merge(histogram)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {endpoint: histogram.snapshot() for endpoint, histogram in sorted(histograms.items())}
+
+
+class StageMetrics:
+    """
+    Wall time, call count, bytes and rows of the stages of a pipeline.
+
+    Stages that run concurrently, e.g. one per date, add up their own durations, so a stage's seconds can exceed the
+    wall time of the run.
+    """
+    def __init__(self) -> None:
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, bytes: int = 0, rows: int = 0, calls: int = 1) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes": 0, "rows": 0})
+            totals["calls"] += calls
+            totals["seconds"] += seconds
+            totals["bytes"] += bytes
+            totals["rows"] += rows
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[Dict[str, int]]:
+        """
+        Time the enclosed block as one call of stage. Set "bytes" and "rows" on the yielded dict to count them.
+        """
+        counts = {"bytes": 0, "rows": 0}
+        start_time = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(stage, time.perf_counter() - start_time, bytes=counts["bytes"], rows=counts["rows"])
+
+    def merge(self, snapshot: Dict[str, Dict[str, float]]) -> None:
+        for stage, totals in snapshot.items():
+            self.record(stage, totals["seconds"], bytes=int(totals["bytes"]), rows=int(totals["rows"]), calls=int(totals["calls"]))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        The totals of every stage, with their throughput in bytes and rows per second.
+        """
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self._stages.items()}
+        for totals in stages.values():
+            seconds = max(totals["seconds"], 1e-9)
+            totals["bytes_per_second"] = totals["bytes"] / seconds
+            totals["rows_per_second"] = totals["rows"] / seconds
+        return stages
+
+
+def _labels(**labels: Any) -> str:
+    def escape(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(stages: Dict[str, Dict[str, float]], latencies: Dict[str, Dict[str, Any]], gauges: Dict[str, Dict[str, float]] | None = None) -> str:
+    """
+    Render stage totals, request latency histograms and labeled gauges in the Prometheus text exposition format.
+
+    :param gauges: gauge name -> label value -> value, e.g. {"augmentation_jobs": {"running": 1}}; the label is "state".
+    """
+    lines: List[str] = []
+
+    for name, field, help_text in [
+        ("augmentation_stage_seconds_total", "seconds", "Time spent in each augmentation stage."),
+        ("augmentation_stage_calls_total", "calls", "Number of times each augmentation stage ran."),
+        ("augmentation_stage_bytes_total", "bytes", "Bytes processed by each augmentation stage."),
+        ("augmentation_stage_rows_total", "rows", "Rows processed by each augmentation stage."),
+    ]:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for stage, totals in sorted(stages.items()):
+            lines.append(f"{name}{_labels(stage=stage)} {totals[field]}")
+
+    name = "kernel_planckster_request_seconds"
+    lines.append(f"# HELP {name} Latency of Kernel Planckster requests by endpoint.")
+    lines.append(f"# TYPE {name} histogram")
+    for endpoint, histogram in sorted(latencies.items()):
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"] + ["+Inf"], histogram["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(endpoint=endpoint)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(endpoint=endpoint)} {histogram['count']}")
+
+    for name, values in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        for state, value in sorted(values.items()):
+            lines.append(f"{name}{_labels(state=state)} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, TypeVar
+from typing import Any, Dict, List, TypeVar
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -83,9 +83,30 @@ class JobOutput(BaseModel):
     - job_state: BaseJobState
     - trace_id: str
     - source_data_list: List[KernelPlancksterSourceData] | None
+    - report: Dict[str, Any] | None, per-stage timings and gateway latencies of the job, if it recorded them
     """
 
     job_state: BaseJobState
     tracer_id: str
     source_data_list: List[KernelPlancksterSourceData] | None
+    report: Dict[str, Any] | None = None
 
+
+
+class DownloadResult(BaseModel):
+    """
+    This class is used to represent the outcome of downloading a file from the object store.
+
+    Attributes:
+    - modified: bool, False if the object store answered that the local copy is still current
+    - size: int, the size in bytes of the local file
+    - etag: str | None, the ETag of the object, if the object store sent one
+    - sha256: str | None, the SHA256 hex digest of the downloaded bytes, if they were downloaded
+    - from_cache: bool, True if the file was served from the local download cache without contacting the object store
+    """
+
+    modified: bool
+    size: int
+    etag: str | None = None
+    sha256: str | None = None
+    from_cache: bool = False
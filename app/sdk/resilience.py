@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+from enum import Enum
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Tuple, Type, TypeVar
+
+
+TResult = TypeVar("TResult")
+
+
+class RetryableError(Exception):
+    """
+    A failure that is safe to retry, e.g. a 5xx answer or a corrupted upload.
+    """
+    pass
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while a circuit breaker is open.
+    """
+    pass
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: retry n waits a random time between 0 and min(max_backoff, backoff * 2^n).
+
+    @attr retries: the number of retries after the first attempt, 0 disables retrying
+    @attr backoff: the base delay in seconds
+    @attr max_backoff: the cap of the delay in seconds
+    """
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+
+NO_RETRIES = RetryPolicy(retries=0)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is down, instead of piling up timeouts and retries against it.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are refused with CircuitOpenError.
+    Once `reset_timeout` seconds have passed, a single trial call is let through: its success closes the circuit,
+    its failure opens it again.
+
+    The clock is a monotonic time source in seconds, tests pass a fake one.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self._name = name
+        self._clock = clock
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._opened = 0
+        self._refused = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    @property
+    def reset_timeout(self) -> float:
+        return self._reset_timeout
+
+    def is_open(self) -> bool:
+        """
+        Whether calls are being refused right now. Unlike before_call, this never claims the trial call.
+        """
+        with self._lock:
+            return self._state == CircuitState.OPEN and self._clock() - self._opened_at < self._reset_timeout
+
+    def before_call(self) -> None:
+        """
+        :raises CircuitOpenError: if the circuit is open, or half open with its trial call still in flight.
+        """
+        with self._lock:
+            if self._state == CircuitState.OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+                self._state = CircuitState.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == CircuitState.CLOSED:
+                return
+            if self._state == CircuitState.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._refused += 1
+        raise CircuitOpenError(f"{self._name} is unavailable, not calling it for up to {self._reset_timeout:.0f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != CircuitState.OPEN:
+                    self._opened += 1
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self._state.value, "consecutive_failures": self._failures, "opened": self._opened, "refused": self._refused}
+
+
+def call_with_retries(
+    fn: Callable[[], TResult],
+    policy: RetryPolicy,
+    retryable: Tuple[Type[BaseException], ...],
+    description: str,
+    logger: logging.Logger,
+    breaker: CircuitBreaker | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> TResult:
+    """
+    Call fn, retrying it with the policy's backoff when it raises one of the retryable exceptions.
+
+    Only pass idempotent calls. With a breaker, every attempt first asks it for permission and reports its outcome;
+    an open circuit stops the retries at once. The last error is re-raised once the retries are exhausted.
+    """
+    for retry in range(policy.retries + 1):
+        if breaker:
+            breaker.before_call()
+        try:
+            result = fn()
+        except retryable as error:
+            if breaker:
+                breaker.record_failure()
+            if retry == policy.retries:
+                raise
+            delay = policy.delay(retry)
+            logger.warning(f"{description} failed, retrying in {delay:.2f}s ({retry + 1}/{policy.retries}). Error: {error}")
+            sleep(delay)
+        except Exception:
+            # any other error is an answer, so the dependency itself is up
+            if breaker:
+                breaker.record_success()
+            raise
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
+    raise AssertionError("unreachable")
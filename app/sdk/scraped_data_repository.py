@@ -1,7 +1,11 @@
 import logging
+import os
+from typing import BinaryIO, List, Tuple
+from app.sdk.concurrency import map_isolated
+from app.sdk.download_cache import DownloadCache
 from app.sdk.file_repository import FileRepository
 from app.sdk.kernel_plackster_gateway import KernelPlancksterGateway
-from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.models import DownloadResult, KernelPlancksterSourceData, ProtocolEnum
 
 
 
@@ -11,10 +15,12 @@ class ScrapedDataRepository:
             protocol: ProtocolEnum,
             kernel_planckster: KernelPlancksterGateway,
             file_repository: FileRepository,
+            download_cache: DownloadCache | None = None,
     ) -> None:
         self.protocol = protocol
         self.kernel_planckster = kernel_planckster
         self.file_repository = file_repository
+        self.download_cache = download_cache
         self._logger = logging.getLogger(__name__)
 
     @property
@@ -87,7 +93,16 @@ class ScrapedDataRepository:
                 )
 
         return source_data
-    def register_scraped_json(self, source_data: KernelPlancksterSourceData, job_id: int, local_file_name: str) -> KernelPlancksterSourceData:
+    def register_scraped_json(self, source_data: KernelPlancksterSourceData, job_id: int, local_file_name: str | None = None, content: bytes | BinaryIO | None = None, content_encoding: str | None = None) -> KernelPlancksterSourceData:
+        """
+        Upload and register a json file, from local_file_name or, without a local file, from the content in memory:
+        bytes, or a seekable binary stream such as an io.BytesIO buffer.
+
+        :param content_encoding: the Content-Encoding of an in-memory content, e.g. "gzip".
+        """
+
+        if (local_file_name is None) == (content is None):
+            raise ValueError("Exactly one of local_file_name and content must be given")
 
         match self.protocol:
 
@@ -97,7 +112,10 @@ class ScrapedDataRepository:
                 
                 self.logger.info(f"{job_id}: Uploading json to object store")
 
-                self.file_repository.public_upload(signed_url, local_file_name)
+                if content is not None:
+                    self.file_repository.public_upload_bytes(signed_url, content, f"'{source_data.relative_path}'", content_encoding=content_encoding)
+                else:
+                    self.file_repository.public_upload(signed_url, local_file_name)
                 
                 self.logger.info(
                 f"{job_id}: Uploaded json to {signed_url}"
@@ -108,28 +126,155 @@ class ScrapedDataRepository:
             case ProtocolEnum.LOCAL:
                 # If local, then we don't use kernel planckster at all
                 # NOTE: local is deprecated
-                self.file_repository.save_file_locally(
-                file_to_save=local_file_name,
-                source_data=source_data,
-                file_type="json",
-                )
+                if content is not None:
+                    self.file_repository.save_bytes_locally(
+                    content=content,
+                    source_data=source_data,
+                    file_type="json",
+                    )
+                else:
+                    self.file_repository.save_file_locally(
+                    file_to_save=local_file_name,
+                    source_data=source_data,
+                    file_type="json",
+                    )
 
         return source_data
     
+    def register_scraped_jsons(self, uploads: List[Tuple[KernelPlancksterSourceData, str | bytes | BinaryIO]], job_id: int, max_workers: int = 8, content_encoding: str | None = None) -> List[KernelPlancksterSourceData | Exception]:
+        """
+        Upload and register many json files, fetching all their signed urls in one batch.
+
+        :param uploads: pairs of the source data to register and what to upload for it: the path of a local file, or
+            the content itself as bytes or as a seekable binary stream.
+        :param job_id: the job the files belong to.
+        :param max_workers: the maximum number of files in flight.
+        :param content_encoding: the Content-Encoding of the in-memory contents, e.g. "gzip".
+        :return: for each upload, in order, the registered source data or the exception that made it fail.
+        """
+
+        match self.protocol:
+
+            case ProtocolEnum.S3:
+
+                signed_urls = self.kernel_planckster.generate_signed_urls(
+                    [source_data for source_data, _ in uploads], max_workers=max_workers
+                )
+
+                def _upload(upload: Tuple[Tuple[KernelPlancksterSourceData, str | bytes | BinaryIO], str | Exception]) -> KernelPlancksterSourceData:
+                    (source_data, body), signed_url = upload
+                    if isinstance(signed_url, Exception):
+                        raise signed_url
+
+                    self.logger.info(f"{job_id}: Uploading json to object store")
+
+                    if isinstance(body, str):
+                        self.file_repository.public_upload(signed_url, body)
+                    else:
+                        self.file_repository.public_upload_bytes(signed_url, body, f"'{source_data.relative_path}'", content_encoding=content_encoding)
+
+                    self.logger.info(
+                    f"{job_id}: Uploaded json to {signed_url}"
+                    )
+
+                    self.kernel_planckster.register_new_source_data(source_data=source_data)
+                    return source_data
+
+                return map_isolated(_upload, list(zip(uploads, signed_urls)), max_workers)
+
+            case _:
+                return map_isolated(
+                    lambda upload: self.register_scraped_json(
+                        source_data=upload[0],
+                        job_id=job_id,
+                        **({"local_file_name": upload[1]} if isinstance(upload[1], str) else {"content": upload[1], "content_encoding": content_encoding}),
+                    ),
+                    uploads,
+                    max_workers=1,
+                )
+
     def download_json(self, source_data: KernelPlancksterSourceData, job_id: int, file_path: str) -> KernelPlancksterSourceData:
 
         match self.protocol:
 
             case ProtocolEnum.S3:
 
-                signed_url = self.kernel_planckster.download_from_signed_url(source_data)
-                
-                self.logger.info(f"{job_id}: Downloading json from object store")
+                download_result = self.download_jsons([(source_data, file_path)], job_id)[0]
+                if isinstance(download_result, Exception):
+                    raise download_result
 
-                self.file_repository.public_download(signed_url, file_path)
-                
-                self.logger.info(
-                f"{job_id}: Downloaded json to {file_path}"
-                )       
+        return source_data
+
+    def download_jsons(self, downloads: List[Tuple[KernelPlancksterSourceData, str]], job_id: int, max_workers: int = 8, etags: List[str | None] | None = None) -> List[DownloadResult | Exception]:
+        """
+        Download many json files, fetching all their signed urls in one batch.
+
+        :param downloads: pairs of the source data to download and the local path to write it to.
+        :param job_id: the job the files belong to.
+        :param max_workers: the maximum number of files in flight.
+        :param etags: for each download, the ETag of an existing local copy. Unchanged objects are then not re-downloaded.
+        :return: for each download, in order, its result or the exception that made it fail.
+
+        Sources are rewritten in place under the same relative path, e.g. the Telegram feed, so a copy from the
+        download cache is only served once the object store confirmed, with a conditional GET on its ETag, that the
+        object did not change. A changed object is downloaded and replaces the cached copy.
+        """
+
+        etags = etags or [None] * len(downloads)
+
+        match self.protocol:
+
+            case ProtocolEnum.S3:
 
-        return source_data
\ No newline at end of file
+                signed_urls = self.kernel_planckster.download_from_signed_urls(
+                    [source_data for source_data, _ in downloads], max_workers=max_workers
+                ) if downloads else []
+
+                def _download(download: Tuple[Tuple[KernelPlancksterSourceData, str], str | Exception, str | None]) -> DownloadResult:
+                    (source_data, file_path), signed_url, etag = download
+                    if isinstance(signed_url, Exception):
+                        raise signed_url
+
+                    cached = None
+                    if etag is None and self.download_cache:
+                        # the cached copy is put in place first, so that an unchanged object is not transferred again
+                        cached = self.download_cache.get(source_data.protocol, source_data.relative_path, file_path)
+                        etag = cached.etag if cached else None
+
+                    self.logger.info(f"{job_id}: Downloading json from object store")
+
+                    try:
+                        download_result = self.file_repository.public_download(signed_url, file_path, etag=etag)
+                    except Exception:
+                        if cached and os.path.exists(file_path):
+                            # the cached copy may be stale, it must not be read as if it was downloaded
+                            os.remove(file_path)
+                        raise
+
+                    if cached and not download_result.modified:
+                        self.logger.info(f"{job_id}: {file_path} served from the download cache")
+                        return cached
+
+                    self.logger.info(
+                    f"{job_id}: Downloaded json to {file_path}" if download_result.modified else f"{job_id}: {file_path} is up to date"
+                    )
+
+                    if self.download_cache:
+                        try:
+                            self.download_cache.put(
+                                source_data.protocol,
+                                source_data.relative_path,
+                                file_path,
+                                etag=download_result.etag,
+                                sha256=download_result.sha256,
+                            )
+                        except OSError as error:
+                            self.logger.warning(f"{job_id}: Failed to add {source_data.relative_path} to the download cache. Error:\n{error}")
+                    return download_result
+
+                results = map_isolated(_download, list(zip(downloads, signed_urls, etags)), max_workers)
+                cached_files = sum(1 for result in results if isinstance(result, DownloadResult) and result.from_cache)
+                self.logger.info(f"{job_id}: {cached_files} of {len(downloads)} json files served from the download cache")
+                return results
+
+        return [ValueError(f"Downloading is not supported for protocol {self.protocol}") for _ in downloads]
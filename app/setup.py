@@ -5,6 +5,23 @@ from typing import Tuple
 from app.sdk.file_repository import FileRepository
 from app.sdk.kernel_plackster_gateway import KernelPlancksterGateway
 from app.sdk.models import ProtocolEnum
+from app.sdk.resilience import CircuitBreaker, RetryPolicy
+
+
+def _retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        retries=int(os.getenv("IO_RETRIES", "3")),
+        backoff=float(os.getenv("IO_RETRY_BACKOFF", "0.5")),
+        max_backoff=float(os.getenv("IO_RETRY_MAX_BACKOFF", "30")),
+    )
+
+
+def _circuit_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+    )
 
 
 def _setup_kernel_planckster(
@@ -26,6 +43,8 @@ def _setup_kernel_planckster(
             port=kernel_planckster_port,
             auth_token=kernel_planckster_auth_token,
             scheme=kernel_planckster_scheme,
+            retry_policy=_retry_policy(),
+            breaker=_circuit_breaker("Kernel Planckster"),
         )
         kernel_planckster.ping()
         logger.info(f"{job_id}: Kernel Planckster Gateway setup successfully.")
@@ -50,6 +69,9 @@ def _setup_file_repository(
 
         file_repository = FileRepository(
             protocol=storage_protocol,
+            chunk_size=int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024))),
+            retry_policy=_retry_policy(),
+            breaker=_circuit_breaker("object store"),
         )
 
         logger.info(f"{job_id}: File Repository setup successfully.")
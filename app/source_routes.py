@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+import os
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from app.matching import SocialFeed, TELEGRAM_FEED, TWITTER_FEED
+
+
+@dataclass(frozen=True)
+class SourceRoute:
+    """
+    Where the sources of one kind are listed on Kernel Planckster and where a job downloads them to.
+
+    @attr kind: the source kind, e.g. "sentinel"
+    @attr path_template: the parent path of the sources of a job, formatted with `tracer_id` and `job_id`
+    @attr local_dir: the directory of the job's work dir the sources are downloaded to
+    @attr feed: for a social feed, how its rows are matched to the Sentinel dates and turned into output rows
+    @attr current_file: for a social feed, picks the file holding the current feed among the downloaded ones
+    """
+    kind: str
+    path_template: str
+    local_dir: str
+    feed: SocialFeed | None = None
+    current_file: Callable[[List[str]], str] = max
+
+    def parent_path(self, job_id: int, tracer_id: str) -> str:
+        return self.path_template.format(tracer_id=tracer_id, job_id=job_id).rstrip("/")
+
+    def feed_path(self, work_dir: str) -> str | None:
+        """
+        The local path of the current feed file of the job, or None if none was downloaded.
+        """
+        local_dir = os.path.join(work_dir, self.local_dir)
+        file_names = os.listdir(local_dir) if os.path.isdir(local_dir) else []
+        return os.path.join(local_dir, self.current_file(file_names)) if file_names else None
+
+
+class JobSourceRoutes:
+    """
+    The routes of one job, compiled to a dict from parent path to route, so that classifying a listed source is a
+    single lookup on the parent of its relative path.
+    """
+    def __init__(self, routes: List[SourceRoute], job_id: int, tracer_id: str, work_dir: str) -> None:
+        self._work_dir = work_dir
+        self._by_parent_path: Dict[str, SourceRoute] = {route.parent_path(job_id, tracer_id): route for route in routes}
+
+    def prefixes(self) -> List[str]:
+        """
+        The relative path prefixes of the routed sources, for server-side filtering of the listing.
+        """
+        return [f"{parent_path}/" for parent_path in self._by_parent_path]
+
+    def locate(self, relative_path: str) -> Tuple[str, str] | None:
+        """
+        The kind of the source at relative_path and the local path to download it to, or None if it is not routed.
+        """
+        parent_path, _, file_name = relative_path.rpartition("/")
+        route = self._by_parent_path.get(parent_path)
+        if route is None:
+            return None
+        return route.kind, os.path.join(self._work_dir, route.local_dir, file_name)
+
+
+class SourceRoutes:
+    """
+    The registry of source kinds an augmentation job downloads. A new social feed registers its route, with its
+    SocialFeed, here: it is then downloaded, indexed and matched against the Sentinel dates like the others.
+    """
+    def __init__(self, routes: List[SourceRoute] | None = None) -> None:
+        self._routes: Dict[str, SourceRoute] = {}
+        for route in routes or []:
+            self.register(route)
+
+    def register(self, route: SourceRoute) -> None:
+        """
+        :raises ValueError: if another route already has the kind or the path template.
+        """
+        if route.kind in self._routes:
+            raise ValueError(f"A source route for {route.kind} is already registered")
+        if any(other.path_template.rstrip("/") == route.path_template.rstrip("/") for other in self._routes.values()):
+            raise ValueError(f"A source route for {route.path_template} is already registered")
+        self._routes[route.kind] = route
+
+    def __getitem__(self, kind: str) -> SourceRoute:
+        return self._routes[kind]
+
+    def __iter__(self) -> Iterator[SourceRoute]:
+        return iter(self._routes.values())
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._routes)
+
+    @property
+    def feed_routes(self) -> List[SourceRoute]:
+        """
+        The routes of the social feeds matched against the Sentinel dates, in the order their rows are output.
+        """
+        return [route for route in self._routes.values() if route.feed is not None]
+
+    def local_dir(self, kind: str, work_dir: str) -> str:
+        return os.path.join(work_dir, self._routes[kind].local_dir)
+
+    def prefixes(self, job_id: int, tracer_id: str) -> List[str]:
+        """
+        The relative path prefixes of the sources of a job, for server-side filtering of the listing.
+        """
+        return [f"{route.parent_path(job_id, tracer_id)}/" for route in self._routes.values()]
+
+    def for_job(self, job_id: int, tracer_id: str, work_dir: str) -> JobSourceRoutes:
+        return JobSourceRoutes(list(self._routes.values()), job_id, tracer_id, work_dir)
+
+
+def _latest_twitter_file(file_names: List[str]) -> str:
+    # the scrape timestamp sits at a fixed position of the file name
+    return max(file_names, key=lambda file_name: file_name[5:20])
+
+
+def _telegram_file(file_names: List[str]) -> str:
+    return "data.json"
+
+
+SENTINEL_KIND = "sentinel"
+
+SOURCE_ROUTES = SourceRoutes([
+    SourceRoute(kind=SENTINEL_KIND, path_template="sentinel/{tracer_id}/{job_id}/augmented", local_dir="wildfire_coords"),
+    SourceRoute(kind=TWITTER_FEED.kind, path_template="twitter/{tracer_id}/{job_id}/augmented", local_dir="twitter_augment", feed=TWITTER_FEED, current_file=_latest_twitter_file),
+    SourceRoute(kind=TELEGRAM_FEED.kind, path_template="telegram/{tracer_id}/{job_id}/augmented", local_dir="telegram_augment", feed=TELEGRAM_FEED, current_file=_telegram_file),
+])
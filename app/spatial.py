@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from app.matching import DateIndexedFeed
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distance in kilometers between pairs of points given in degrees.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype=np.float64)) for values in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class FirePointIndex:
+    """
+    STRtree over the fire points of one Sentinel date, answering which posts lie within a radius of any of them.
+
+    Each post is turned into a lat/lon bounding box of the radius, the tree returns the fire points in that box in
+    logarithmic time, and only those candidates get an exact haversine check. Boxes do not wrap around the antimeridian.
+    """
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray) -> None:
+        # shapely is only needed by the spatial match mode
+        from shapely import STRtree, points
+
+        self._latitudes = np.asarray(latitudes, dtype=np.float64)
+        self._longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = ~(np.isnan(self._latitudes) | np.isnan(self._longitudes))
+        self._latitudes = self._latitudes[valid]
+        self._longitudes = self._longitudes[valid]
+        self._tree = STRtree(points(self._longitudes, self._latitudes))
+
+    def __len__(self) -> int:
+        return len(self._latitudes)
+
+    def within(self, latitudes: np.ndarray, longitudes: np.ndarray, radius_km: float) -> np.ndarray:
+        """
+        A boolean mask of the given points that are within radius_km of at least one fire point.
+        """
+        from shapely import box
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        mask = np.zeros(len(latitudes), dtype=bool)
+        candidates = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        if len(self) == 0 or not candidates.any():
+            return mask
+
+        candidate_positions = np.flatnonzero(candidates)
+        latitudes = latitudes[candidates]
+        longitudes = longitudes[candidates]
+
+        lat_margin = np.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = np.cos(np.radians(np.minimum(np.abs(latitudes) + lat_margin, 90.0)))
+        lon_margin = np.where(cos_lat > 1e-9, lat_margin / np.maximum(cos_lat, 1e-9), 180.0)
+        lon_margin = np.minimum(lon_margin, 180.0)
+
+        boxes = box(longitudes - lon_margin, latitudes - lat_margin, longitudes + lon_margin, latitudes + lat_margin)
+        post_indices, point_indices = self._tree.query(boxes)
+
+        distances = haversine_km(
+            latitudes[post_indices], longitudes[post_indices],
+            self._latitudes[point_indices], self._longitudes[point_indices],
+        )
+        mask[candidate_positions[post_indices[distances <= radius_km]]] = True
+        return mask
+
+
+def positions_near_fires(feed: DateIndexedFeed, fire_index: FirePointIndex, key: int, radius_km: float, day_window: int) -> np.ndarray:
+    """
+    The positions of the feed rows dated within day_window days of the date key and within radius_km of a fire point.
+    """
+    positions = feed.positions_in_window(key, day_window)
+    if len(positions) == 0:
+        return positions
+
+    matched = feed.df.iloc[positions]
+    near = fire_index.within(
+        pd.to_numeric(matched["Resolved_Latitude"], errors="coerce").to_numpy(dtype=np.float64),
+        pd.to_numeric(matched["Resolved_Longitude"], errors="coerce").to_numpy(dtype=np.float64),
+        radius_km,
+    )
+    return positions[near]
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from logging import Logger
+import threading
+from typing import Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.feed_index import FeedDateIndex
+from app.matching import DateIndexedFeed
+from app.sdk.download_cache import DownloadCache
+from app.sdk.scraped_data_repository import ScrapedDataRepository
+from app.setup import setup
+
+
+TValue = TypeVar("TValue")
+
+
+class _LRUCache:
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable[[], TValue]) -> TValue:
+        with self._lock:
+            if key in self._entries:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]  # type: ignore
+            self._misses += 1
+
+        value = load()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+
+class WarmState:
+    """
+    What a long-running worker keeps between jobs: its Kernel Planckster and object store clients, and the parsed
+    tables and date indexes of recent social feed versions.
+
+    Feeds are keyed by the SHA256 of their content, so a new version of a source is a cache miss and is parsed
+    again, while unchanged feeds are reused as they are. Only the `max_feeds` most recently used feeds are kept.
+    """
+    def __init__(self, max_feeds: int = 4) -> None:
+        self._feeds = _LRUCache(max_feeds)
+        self._feed_indexes = _LRUCache(max_feeds)
+        self._repositories: Dict[Tuple, ScrapedDataRepository] = {}
+        self._lock = threading.Lock()
+
+    def scraped_data_repository(
+        self,
+        job_id: int,
+        logger: Logger,
+        kp_auth_token: str,
+        kp_host: str,
+        kp_port: int,
+        kp_scheme: str,
+        download_cache_dir: str | None = None,
+        download_cache_max_bytes: int = 10 * 1024 ** 3,
+    ) -> ScrapedDataRepository:
+        """
+        The repository of a Kernel Planckster, set up and pinged on first use only. Each job gets its own view of the
+        warm clients, whose gateway latencies cover the job's own requests even while other jobs share the clients.
+        """
+        key = (kp_auth_token, kp_host, kp_port, kp_scheme, download_cache_dir, download_cache_max_bytes)
+        with self._lock:
+            if key not in self._repositories:
+                kernel_planckster, protocol, file_repository = setup(
+                    job_id=job_id,
+                    logger=logger,
+                    kp_auth_token=kp_auth_token,
+                    kp_host=kp_host,
+                    kp_port=kp_port,
+                    kp_scheme=kp_scheme,
+                )
+                self._repositories[key] = ScrapedDataRepository(
+                    protocol=protocol,
+                    kernel_planckster=kernel_planckster,
+                    file_repository=file_repository,
+                    download_cache=DownloadCache(download_cache_dir, max_bytes=download_cache_max_bytes) if download_cache_dir else None,
+                )
+            else:
+                logger.info(f"{job_id}: Reusing the warm Kernel Planckster Gateway and File Repository.")
+            scraped_data_repository = self._repositories[key]
+
+        return ScrapedDataRepository(
+            protocol=scraped_data_repository.protocol,
+            kernel_planckster=scraped_data_repository.kernel_planckster.with_own_latencies(),
+            file_repository=scraped_data_repository.file_repository,
+            download_cache=scraped_data_repository.download_cache,
+        )
+
+    def feed_table(self, key: Hashable, load: Callable[[], DateIndexedFeed]) -> DateIndexedFeed:
+        """
+        The parsed table of a feed version, loaded on a miss.
+
+        :param key: identifies the feed version and everything its parsing depends on, starting with the SHA256 of the file.
+        """
+        return self._feeds.get_or_load(key, load)
+
+    def feed_index(self, kind: str, sha256: str, load: Callable[[], FeedDateIndex]) -> FeedDateIndex:
+        """
+        The date index of a feed version, loaded or built on a miss.
+        """
+        return self._feed_indexes.get_or_load((kind, sha256), load)
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "clients": len(self._repositories),
+            "feeds": self._feeds.metrics(),
+            "feed_indexes": self._feed_indexes.metrics(),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for scraped_data_repository in self._repositories.values():
+                scraped_data_repository.kernel_planckster.close()
+                scraped_data_repository.file_repository.close()
+            self._repositories.clear()
+
+
+_process_warm_state: WarmState | None = None
+
+
+def process_warm_state() -> WarmState:
+    """
+    The warm state of this process, shared by every job it runs.
+    """
+    global _process_warm_state
+    if _process_warm_state is None:
+        _process_warm_state = WarmState()
+    return _process_warm_state
@@ -1,8 +1,9 @@
 import logging
-from app.augment import augment
-from app.sdk.models import KernelPlancksterSourceData, BaseJobState
+from app.sdk.models import KernelPlancksterSourceData, BaseJobState, JobOutput
+from app.sdk.download_cache import DownloadCache
 from app.sdk.scraped_data_repository import ScrapedDataRepository
 from app.setup import setup
+from models import AugmentationOptions
 
 
 
@@ -19,8 +20,27 @@ def main(
     kp_port: int,
     kp_scheme: str,
     log_level: str = "WARNING",
+    download_workers: int = 8,
+    upload_workers: int = 8,
+    incremental: bool = False,
+    download_cache_dir: str | None = None,
+    download_cache_max_bytes: int = 10 * 1024 ** 3,
+    work_format: str = "json",
+    output_format: str = "json",
+    match_mode: str = "date",
+    radius_km: float = 10.0,
+    day_window: int = 0,
+    processes: int = 1,
+    feed_ingestion: str = "memory",
+    feed_index: bool = False,
+    list_page_size: int = 1000,
+    publish_queue_size: int = 8,
+    output_json_indent: int | None = None,
+    output_gzip: bool = False,
+    local_outputs: bool = False,
+    keep_warm: bool = False,
     
-) -> None:
+) -> JobOutput:
 
     logger = logging.getLogger(__name__)
     logging.basicConfig(level=log_level)
@@ -30,39 +50,82 @@ def main(
         logger.error(f"{job_id}: job_id, tracer_id, coordinates, and date range must all be set.") 
         raise ValueError("job_id, tracer_id, coordinates, and date range must all be set.")
 
-
-    kernel_planckster, protocol, file_repository = setup(
-        job_id=job_id,
-        logger=logger,
-        kp_auth_token=kp_auth_token,
-        kp_host=kp_host,
-        kp_port=kp_port,
-        kp_scheme=kp_scheme,
-    )
-
-    scraped_data_repository = ScrapedDataRepository(
-        protocol=protocol,
-        kernel_planckster=kernel_planckster,
-        file_repository=file_repository,
-    )
-
-   
-
-    augment(
-        job_id=job_id,
-        tracer_id=tracer_id,
-        scraped_data_repository=scraped_data_repository,
-        log_level=log_level,
-        work_dir = work_dir,
-       
-
-    )
+    # the augmentation pulls in pandas and numpy, imported here so that importing this module, e.g. by the server
+    # to hand it to its worker processes, stays cheap
+    from app.augment import augment
+    from app.warm_state import process_warm_state
+
+    # a resident worker keeps its clients, parsed feeds and date indexes warm between the jobs it runs
+    warm_state = process_warm_state() if keep_warm else None
+    if warm_state:
+        scraped_data_repository = warm_state.scraped_data_repository(
+            job_id=job_id,
+            logger=logger,
+            kp_auth_token=kp_auth_token,
+            kp_host=kp_host,
+            kp_port=kp_port,
+            kp_scheme=kp_scheme,
+            download_cache_dir=download_cache_dir,
+            download_cache_max_bytes=download_cache_max_bytes,
+        )
+    else:
+        kernel_planckster, protocol, file_repository = setup(
+            job_id=job_id,
+            logger=logger,
+            kp_auth_token=kp_auth_token,
+            kp_host=kp_host,
+            kp_port=kp_port,
+            kp_scheme=kp_scheme,
+        )
+
+        scraped_data_repository = ScrapedDataRepository(
+            protocol=protocol,
+            kernel_planckster=kernel_planckster,
+            file_repository=file_repository,
+            download_cache=DownloadCache(download_cache_dir, max_bytes=download_cache_max_bytes) if download_cache_dir else None,
+        )
+
+    try:
+        return augment(
+            job_id=job_id,
+            tracer_id=tracer_id,
+            scraped_data_repository=scraped_data_repository,
+            log_level=log_level,
+            work_dir = work_dir,
+            options=AugmentationOptions(
+                download_workers=download_workers,
+                upload_workers=upload_workers,
+                incremental=incremental,
+                work_format=work_format,
+                output_format=output_format,
+                match_mode=match_mode,
+                radius_km=radius_km,
+                day_window=day_window,
+                processes=processes,
+                feed_ingestion=feed_ingestion,
+                feed_index=feed_index,
+                list_page_size=list_page_size,
+                publish_queue_size=publish_queue_size,
+                output_json_indent=output_json_indent,
+                output_gzip=output_gzip,
+                local_outputs=local_outputs,
+            ),
+            warm_state=warm_state,
+        )
+    finally:
+        if not warm_state:
+            scraped_data_repository.kernel_planckster.close()
+            scraped_data_repository.file_repository.close()
 
 
 
 if __name__ == "__main__":
 
     import argparse
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
 
     parser = argparse.ArgumentParser(description="Scrape data from a telegram channel.")
 
@@ -123,6 +186,132 @@ if __name__ == "__main__":
         default="http",
         help="The Kernel Planckster scheme",
     )
+
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=8,
+        help="The maximum number of sources downloaded concurrently",
+    )
+
+    parser.add_argument(
+        "--upload-workers",
+        type=int,
+        default=8,
+        help="The maximum number of by-date results uploaded concurrently",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only download changed sources and only re-upload dates whose inputs changed since the last run in the same work dir",
+    )
+
+    parser.add_argument(
+        "--download-cache-dir",
+        type=str,
+        default=None,
+        help="A download cache directory shared across jobs. Disabled by default",
+    )
+
+    parser.add_argument(
+        "--download-cache-max-bytes",
+        type=int,
+        default=10 * 1024 ** 3,
+        help="The size budget of the download cache, least recently used sources are evicted beyond it",
+    )
+
+    parser.add_argument(
+        "--work-format",
+        type=str,
+        choices=["json", "parquet"],
+        default="json",
+        help="Parse the downloaded JSON on every run, or convert it once to parquet and memory-map it on later runs",
+    )
+
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=["json", "parquet", "both"],
+        default="json",
+        help="The format of the by-date results",
+    )
+
+    parser.add_argument(
+        "--match-mode",
+        type=str,
+        choices=["date", "spatial"],
+        default="date",
+        help="Attach every post of a Sentinel date, or only posts near its fire points",
+    )
+
+    parser.add_argument(
+        "--radius-km",
+        type=float,
+        default=10.0,
+        help="The distance from a fire point within which posts are attached in the spatial match mode",
+    )
+
+    parser.add_argument(
+        "--day-window",
+        type=int,
+        default=0,
+        help="The number of days around the Sentinel date considered in the spatial match mode",
+    )
+
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="The number of processes matching Sentinel dates in parallel",
+    )
+
+    parser.add_argument(
+        "--feed-ingestion",
+        type=str,
+        default="memory",
+        choices=["memory", "stream"],
+        help="Load the social feeds whole, or stream them and read back only the matched rows",
+    )
+
+    parser.add_argument(
+        "--feed-index",
+        action="store_true",
+        help="Index the downloaded social feeds by date once per file version and reuse the index on later runs",
+    )
+
+    parser.add_argument(
+        "--list-page-size",
+        type=int,
+        default=1000,
+        help="The number of sources asked for per page when listing the job's sources",
+    )
+
+    parser.add_argument(
+        "--publish-queue-size",
+        type=int,
+        default=8,
+        help="The maximum number of matched dates waiting to be serialized and uploaded before matching pauses",
+    )
+
+    parser.add_argument(
+        "--output-json-indent",
+        type=int,
+        default=None,
+        help="Indent the by-date JSON results by this many spaces. They are written compact by default",
+    )
+
+    parser.add_argument(
+        "--output-gzip",
+        action="store_true",
+        help="Upload the by-date JSON results gzip-compressed, with a gzip Content-Encoding",
+    )
+
+    parser.add_argument(
+        "--local-outputs",
+        action="store_true",
+        help="Also write every by-date result to <work_dir>/by_date, for debugging",
+    )
  
    
 
@@ -138,6 +327,24 @@ if __name__ == "__main__":
         kp_host=args.kp_host,
         kp_port=args.kp_port,
         kp_scheme=args.kp_scheme,
+        download_workers=args.download_workers,
+        upload_workers=args.upload_workers,
+        incremental=args.incremental,
+        download_cache_dir=args.download_cache_dir,
+        download_cache_max_bytes=args.download_cache_max_bytes,
+        work_format=args.work_format,
+        output_format=args.output_format,
+        match_mode=args.match_mode,
+        radius_km=args.radius_km,
+        day_window=args.day_window,
+        processes=args.processes,
+        feed_ingestion=args.feed_ingestion,
+        feed_index=args.feed_index,
+        list_page_size=args.list_page_size,
+        publish_queue_size=args.publish_queue_size,
+        output_json_indent=args.output_json_indent,
+        output_gzip=args.output_gzip,
+        local_outputs=args.local_outputs,
         #TODO: put args from parser here
     )
 
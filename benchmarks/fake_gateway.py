@@ -0,0 +1,148 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+
+class FakeGateway:
+    """
+    A local stand-in for Kernel Planckster and its object store, for benchmarks.
+
+    Serves '/ping', the client's 'upload-credentials', 'download-credentials' and 'source' endpoints, and an in-memory
+    object store behind the signed urls ('/store/<relative_path>', with ETags). Every control plane request is delayed
+    by `latency` seconds and every object store request by `store_latency` seconds.
+
+    With paginate, the source listing honors the `offset`, `limit` and `relative_path_prefix` query parameters;
+    without, it always answers with every source, like a gateway that does not support them.
+    """
+    def __init__(self, latency: float = 0.0, store_latency: float = 0.0, host: str = "127.0.0.1", paginate: bool = True) -> None:
+        self.latency = latency
+        self.store_latency = store_latency
+        self.paginate = paginate
+        self.objects: Dict[str, bytes] = {}
+        self.sources: List[Dict[str, str]] = []
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self) -> "FakeGateway":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_source(self, relative_path: str, content: bytes, name: str | None = None) -> None:
+        """
+        Put an object in the store and register it as source data.
+        """
+        with self._lock:
+            self.objects[relative_path] = content
+            self.sources.append({"name": name or relative_path.rsplit("/", 1)[-1], "protocol": "s3", "relative_path": relative_path})
+
+    def _count(self, endpoint: str) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def _handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: Dict[str, str] | None = None) -> None:
+                self.send_response(status)
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, content: Any) -> None:
+                self._send(200, json.dumps(content).encode(), {"Content-Type": "application/json"})
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+
+                if url.path.startswith("/store/"):
+                    gateway._count("GET /store")
+                    time.sleep(gateway.store_latency)
+                    content = gateway.objects.get(unquote(url.path[len("/store/"):]))
+                    if content is None:
+                        return self._send(404)
+                    etag = f'"{hashlib.md5(content).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        return self._send(304, headers={"ETag": etag})
+                    return self._send(200, content, {"ETag": etag})
+
+                gateway._count(f"GET {url.path}")
+                time.sleep(gateway.latency)
+                if url.path == "/ping":
+                    return self._send_json("pong")
+                if url.path.endswith("-credentials"):
+                    signed_url = f"http://{gateway.host}:{gateway.port}/store/{quote(query['relative_path'][0])}"
+                    return self._send_json({"signed_url": signed_url})
+                if url.path.endswith("/source"):
+                    with gateway._lock:
+                        sources = list(gateway.sources)
+                    if gateway.paginate:
+                        prefixes = tuple(query.get("relative_path_prefix", []))
+                        if prefixes:
+                            sources = [source for source in sources if source["relative_path"].startswith(prefixes)]
+                        offset = int(query.get("offset", ["0"])[0])
+                        limit = int(query.get("limit", [str(len(sources))])[0])
+                        sources = sources[offset:offset + limit]
+                    return self._send_json({"source_data_list": sources})
+                self._send(404)
+
+            def do_PUT(self) -> None:
+                url = urlparse(self.path)
+                gateway._count("PUT /store")
+                time.sleep(gateway.store_latency)
+                content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with gateway._lock:
+                    gateway.objects[unquote(url.path[len("/store/"):])] = content
+                self._send(200, headers={"ETag": f'"{hashlib.md5(content).hexdigest()}"'})
+
+            def do_POST(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                gateway._count(f"POST {url.path}")
+                time.sleep(gateway.latency)
+                if not url.path.endswith("/source"):
+                    return self._send(404)
+                source_data = {
+                    "name": query["source_data_name"][0],
+                    "protocol": query["source_data_protocol"][0],
+                    "relative_path": query["source_data_relative_path"][0],
+                }
+                with gateway._lock:
+                    gateway.sources.append(source_data)
+                self._send_json({"source_data": source_data})
+
+        return Handler
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+import json
+import os
+import random
+from typing import Dict, List
+
+from app.matching import MONTHS
+
+
+DISASTER_TYPES = ["wildfire", "wildfire", "flood", "earthquake"]
+LOCATIONS = ["Los Angeles", "Sacramento", "Fresno", "San Diego", "Redding"]
+
+
+def benchmark_dates(n_dates: int, start: date = date(2023, 8, 1)) -> List[date]:
+    return [start + timedelta(days=i) for i in range(n_dates)]
+
+
+def generate_sentinel_files(directory: str, dates: List[date], points_per_file: int, seed: int = 0) -> List[str]:
+    """
+    Write one wildfire coordinates file per date, named 'XXYYYY_MM_DD____wildfire_coords.json' as augment_by_date expects.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for i, sentinel_date in enumerate(dates):
+        points = {
+            str(j): {
+                "latitude": rng.uniform(32.0, 42.0),
+                "longitude": rng.uniform(-124.0, -114.0),
+                "status": "active fire",
+            }
+            for j in range(points_per_file)
+        }
+        path = os.path.join(directory, f"{i % 100:02d}{sentinel_date.strftime('%Y_%m_%d')}____wildfire_coords.json")
+        with open(path, "w") as f:
+            json.dump(points, f)
+        paths.append(path)
+    return paths
+
+
+def generate_feed(path: str, text_column: str, dates: List[date], rows: int, seed: int = 0) -> str:
+    """
+    Write a social feed of rows posts spread over dates, with the columns the scrapers emit, as a JSON object of records.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    records = {}
+    for j in range(rows):
+        post_date = rng.choice(dates)
+        records[str(j)] = {
+            "Title": f"Post {j} about a fire near {rng.choice(LOCATIONS)}",
+            text_column: " ".join(rng.choice(["smoke", "fire", "évacuation", "road", "closed", "🔥", "help"]) for _ in range(rng.randint(5, 40))),
+            "Extracted_Location": rng.choice(LOCATIONS),
+            "Resolved_Latitude": rng.uniform(32.0, 42.0),
+            "Resolved_Longitude": rng.uniform(-124.0, -114.0),
+            "Year": post_date.year,
+            "Month": MONTHS[f"{post_date.month:02d}"],
+            "Day": post_date.day,
+            "Disaster_Type": rng.choice(DISASTER_TYPES),
+        }
+
+    with open(path, "w") as f:
+        json.dump(records, f)
+    return path
+
+
+def generate_sources(root: str, job_id: int, tracer_id: str, n_dates: int, rows: int, points_per_file: int = 20, seed: int = 0) -> Dict[str, str]:
+    """
+    Generate the Sentinel, Twitter and Telegram inputs of one augmentation job under root.
+
+    Feeds get `rows` posts each. Returns the local file of every source by the relative path it is registered under.
+    """
+    dates = benchmark_dates(n_dates)
+    sources: Dict[str, str] = {}
+
+    for path in generate_sentinel_files(os.path.join(root, "wildfire_coords"), dates, points_per_file, seed):
+        sources[f"sentinel/{tracer_id}/{job_id}/augmented/{os.path.basename(path)}"] = path
+
+    twitter_path = generate_feed(os.path.join(root, "twitter", "data_20230815_120000.json"), "Tweet", dates, rows, seed + 1)
+    sources[f"twitter/{tracer_id}/{job_id}/augmented/{os.path.basename(twitter_path)}"] = twitter_path
+
+    telegram_path = generate_feed(os.path.join(root, "telegram", "data.json"), "Telegram", dates, rows, seed + 2)
+    sources[f"telegram/{tracer_id}/{job_id}/augmented/{os.path.basename(telegram_path)}"] = telegram_path
+
+    return sources
@@ -0,0 +1,171 @@
+"""
+Run augment() end-to-end against a local fake gateway over growing input sizes, recording time and peak memory.
+
+    python -m benchmarks.run_augment --sizes 10x1000 30x10000 --latency-ms 5 --output bench.json
+    python -m benchmarks.run_augment --sizes 10x1000 --baseline bench.json
+
+Each size runs in a fresh process, so its peak RSS is its own. A job that does not finish with outputs fails the
+benchmark instead of being timed. With a baseline, the run fails when a size got slower than the baseline by more
+than the tolerance.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.generators import generate_sources
+
+
+JOB_ID = 1
+TRACER_ID = "benchmark"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _run_job(host: str, port: int, work_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs in a fresh process: one augmentation job against the fake gateway.
+    """
+    from app.augment import augment
+    from app.sdk.file_repository import FileRepository
+    from app.sdk.kernel_plackster_gateway import KernelPlancksterGateway
+    from app.sdk.models import ProtocolEnum
+    from app.sdk.scraped_data_repository import ScrapedDataRepository
+    from models import AugmentationOptions
+
+    baseline_rss = _peak_rss_mb()
+    kernel_planckster = KernelPlancksterGateway(host=host, port=str(port), auth_token="benchmark", scheme="http")
+    file_repository = FileRepository(ProtocolEnum.S3)
+    scraped_data_repository = ScrapedDataRepository(protocol=ProtocolEnum.S3, kernel_planckster=kernel_planckster, file_repository=file_repository)
+    try:
+        start_time = time.perf_counter()
+        job_output = augment(JOB_ID, TRACER_ID, scraped_data_repository, "WARNING", work_dir, AugmentationOptions(**options))
+        elapsed = time.perf_counter() - start_time
+    finally:
+        kernel_planckster.close()
+        file_repository.close()
+
+    return {
+        "job_state": job_output.job_state.value,
+        "outputs": len(job_output.source_data_list or []),
+        "seconds": elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+        "stages": (job_output.report or {}).get("stages", {}),
+    }
+
+
+def run_size(n_dates: int, rows: int, options: Dict[str, Any], latency: float, repeat: int, root: str) -> Dict[str, Any]:
+    """
+    Generate the inputs of one size, serve them from a fake gateway and run the job `repeat` times.
+    """
+    inputs_dir = os.path.join(root, f"inputs_{n_dates}x{rows}")
+    sources = generate_sources(inputs_dir, JOB_ID, TRACER_ID, n_dates, rows)
+    input_bytes = sum(os.path.getsize(path) for path in sources.values())
+
+    runs = []
+    with FakeGateway(latency=latency, store_latency=latency) as gateway:
+        for relative_path, path in sources.items():
+            with open(path, "rb") as f:
+                gateway.add_source(relative_path, f.read())
+
+        context = multiprocessing.get_context("spawn")
+        for i in range(repeat):
+            work_dir = os.path.join(root, f"work_{n_dates}x{rows}_{i}")
+            # unlike the daemonic workers of a multiprocessing.Pool, these may start the job's own date processes
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                run = executor.submit(_run_job, gateway.host, gateway.port, work_dir, options).result()
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if not _succeeded(run):
+                raise RuntimeError(f"The {n_dates}x{rows} job ended {run['job_state']} with {run['outputs']} outputs, see its log above")
+            runs.append(run)
+
+    best = min(runs, key=lambda run: run["seconds"])
+    return {
+        "size": f"{n_dates}x{rows}",
+        "dates": n_dates,
+        "rows_per_feed": rows,
+        "input_mb": input_bytes / 1024 ** 2,
+        "seconds": best["seconds"],
+        "seconds_all_runs": [run["seconds"] for run in runs],
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "baseline_rss_mb": best["baseline_rss_mb"],
+        "job_state": best["job_state"],
+        "outputs": best["outputs"],
+        "stages": best["stages"],
+    }
+
+
+def _succeeded(result: Dict[str, Any]) -> bool:
+    return result["job_state"] == "finished" and result["outputs"] > 0
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """
+    The sizes whose job failed, or that got slower than in the baseline by more than the tolerance, as messages.
+    Failed baseline runs are not compared against.
+    """
+    baseline_by_size = {result["size"]: result for result in baseline if _succeeded(result)}
+    regressions = []
+    for result in results:
+        previous = baseline_by_size.get(result["size"])
+        if not _succeeded(result):
+            regressions.append(f"{result['size']}: the job ended {result['job_state']} with {result['outputs']} outputs")
+        elif previous and result["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(f"{result['size']}: {result['seconds']:.3f}s, was {previous['seconds']:.3f}s")
+    return regressions
+
+
+def _parse_size(size: str) -> Tuple[int, int]:
+    n_dates, rows = size.lower().split("x")
+    return int(n_dates), int(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark augment() against a fake Kernel Planckster.")
+    parser.add_argument("--sizes", nargs="+", default=["10x1000", "30x10000", "60x50000"], help="Sizes as <sentinel dates>x<rows per feed>")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="The latency the fake gateway and object store add to every request")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs per size, the fastest one is reported")
+    parser.add_argument("--options", type=str, default="{}", help="AugmentationOptions as JSON, e.g. '{\"processes\": 4}'")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", type=str, default=None, help="Fail if a size got slower than in this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="The slowdown over the baseline that counts as a regression")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated inputs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    root = tempfile.mkdtemp(prefix="augmentation-benchmark-")
+    results = []
+    try:
+        for size in args.sizes:
+            n_dates, rows = _parse_size(size)
+            result = run_size(n_dates, rows, json.loads(args.options), args.latency_ms / 1000, args.repeat, root)
+            results.append(result)
+            print(f"{result['size']:>12}  {result['input_mb']:8.1f} MB in  {result['seconds']:8.3f} s  {result['peak_rss_mb']:8.1f} MB peak RSS  {result['outputs']} outputs")
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"options": json.loads(args.options), "latency_ms": args.latency_ms, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,129 @@
+"""
+Measure the import time of the augmentation entry points and check it against a startup budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget augment_main=500 server=1000 --repeat 5 --output startup.json
+
+Each import runs in a fresh interpreter with `-X importtime`. The median over the runs is checked against the
+module's budget, and the heavy libraries only the augmentation itself needs must not be imported by the entry points
+at all. Either failure makes the run exit with an error.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# milliseconds, with headroom over the cost of the entry points' own imports: pydantic, httpx and requests for
+# augment_main, fastapi on top of it for the server
+DEFAULT_BUDGETS = {"augment_main": 500.0, "server": 1000.0, "worker_daemon": 500.0}
+
+# only needed once a job runs, so importing an entry point must not pull them in
+DEFERRED_MODULES = ["pandas", "numpy", "pyarrow", "cv2"]
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, float, float]]:
+    """
+    The rows of an `-X importtime` report as (module, depth, self ms, cumulative ms), in report order.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """
+    Import the module in a fresh interpreter, returning its cumulative import time, its heaviest direct imports and
+    the modules it left loaded.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {module}; print('\\n'.join(sys.modules))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = parse_importtime(process.stderr)
+    # the module is reported after everything it imported, at depth 0
+    index = max(i for i, (name, depth, _, _) in enumerate(rows) if name == module and depth == 0)
+    children = []
+    for name, depth, _, cumulative_ms in reversed(rows[:index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative_ms))
+    return {
+        "ms": rows[index][3],
+        "imports": sorted(children, key=lambda child: child[1], reverse=True),
+        "modules": set(process.stdout.split()),
+    }
+
+
+def run_module(module: str, budget_ms: float, repeat: int, top: int) -> Dict[str, Any]:
+    runs = [measure_import(module) for _ in range(repeat)]
+    median_ms = statistics.median(run["ms"] for run in runs)
+    typical = min(runs, key=lambda run: abs(run["ms"] - median_ms))
+    loaded = set.union(*(run["modules"] for run in runs))
+    return {
+        "module": module,
+        "ms": median_ms,
+        "ms_all_runs": [run["ms"] for run in runs],
+        "budget_ms": budget_ms,
+        "imports": [{"module": name, "ms": ms} for name, ms in typical["imports"][:top]],
+        "deferred_imported": [name for name in DEFERRED_MODULES if name in loaded],
+    }
+
+
+def violations(result: Dict[str, Any]) -> List[str]:
+    """
+    How the module broke its startup budget, as messages.
+    """
+    messages = []
+    if result["ms"] > result["budget_ms"]:
+        messages.append(f"{result['module']}: imports in {result['ms']:.0f} ms, over its budget of {result['budget_ms']:.0f} ms")
+    if result["deferred_imported"]:
+        messages.append(f"{result['module']}: imports {', '.join(result['deferred_imported'])}, which should only be imported by a running job")
+    return messages
+
+
+def _parse_budget(budget: str) -> Tuple[str, float]:
+    module, ms = budget.split("=")
+    return module, float(ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of the augmentation entry points against a budget.")
+    parser.add_argument("--budget", nargs="+", default=[], help="Budgets as <module>=<milliseconds>, added to or overriding the defaults")
+    parser.add_argument("--modules", nargs="+", default=None, help="The modules to measure, all those with a budget by default")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of fresh imports per module, the median one is reported")
+    parser.add_argument("--top", type=int, default=8, help="The number of heaviest direct imports reported per module")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    budgets = {**DEFAULT_BUDGETS, **dict(_parse_budget(budget) for budget in args.budget)}
+    results = []
+    for module in args.modules or list(budgets):
+        result = run_module(module, budgets.get(module, float("inf")), args.repeat, args.top)
+        results.append(result)
+        print(f"{module:>16}  {result['ms']:8.1f} ms  (budget {result['budget_ms']:.0f} ms)")
+        for child in result["imports"]:
+            print(f"{'':>18}{child['ms']:8.1f} ms  {child['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+    messages = [message for result in results for message in violations(result)]
+    for message in messages:
+        print(f"Over budget: {message}")
+    sys.exit(1 if messages else 0)
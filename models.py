@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
+from typing import Literal
 
 class QueryModel(BaseModel):
     """
@@ -43,3 +44,53 @@ class SentinelHubRequest(PipelineRequestModel):
         q (QueryModel): A QueryModel instance representing geographical coordinates for the Sentinel Hub request.
     """
     q: QueryModel
+
+
+class AugmentationOptions(BaseModel):
+    """
+    Tuning knobs for an augmentation run.
+
+    Attributes:
+        download_workers (int): The maximum number of sources downloaded concurrently.
+        upload_workers (int): The maximum number of by-date results uploaded concurrently.
+        incremental (bool): Skip sources and dates that did not change since the last run in the same work dir.
+        manifest_path (str | None): Where incremental runs keep their manifest. Defaults to '<work_dir>/manifest.json'.
+        work_format (str): "json" to parse the downloaded JSON on every run, or "parquet" to convert it once to typed
+            parquet files under '<work_dir>/columnar' and memory-map those on later runs. Needs pyarrow.
+        output_format (str): Emit by-date results as "json", compact unless `output_json_indent` is set, as "parquet",
+            or "both".
+        match_mode (str): "date" attaches every post of a Sentinel date, "spatial" only the posts within `radius_km`
+            of one of its fire points and within `day_window` days of it.
+        radius_km (float): The haversine radius of the spatial match mode.
+        day_window (int): The number of days before and after the Sentinel date considered by the spatial match mode.
+        processes (int): The number of processes matching Sentinel dates in parallel. 1 matches them in-process.
+        feed_ingestion (str): "memory" loads the social feeds whole, "stream" parses them incrementally and keeps only
+            their date keys, coordinates and file offsets in memory, reading matched rows back from disk. Streamed
+            feeds bypass the parquet work format.
+        feed_index (bool): Index every downloaded social feed by date once per version of the file, and reuse the index
+            on later runs. Indexes are shared through the download cache when there is one, else kept in the work dir.
+        list_page_size (int): The number of sources asked for per page when listing the job's sources.
+        publish_queue_size (int): The maximum number of matched dates waiting to be serialized, and to be uploaded.
+            Matching pauses while publishing is that far behind, which bounds the memory held by pending results.
+        output_json_indent (int | None): The indentation of the by-date JSON results, None writes them compact.
+        output_gzip (bool): Upload the by-date JSON results gzip-compressed, with a gzip Content-Encoding.
+        local_outputs (bool): Also write every by-date result to '<work_dir>/by_date', for debugging. Results are
+            otherwise serialized and uploaded in memory.
+    """
+    download_workers: int = Field(default=8, ge=1)
+    upload_workers: int = Field(default=8, ge=1)
+    incremental: bool = False
+    manifest_path: str | None = None
+    work_format: Literal["json", "parquet"] = "json"
+    output_format: Literal["json", "parquet", "both"] = "json"
+    match_mode: Literal["date", "spatial"] = "date"
+    radius_km: float = Field(default=10.0, gt=0)
+    day_window: int = Field(default=0, ge=0)
+    processes: int = Field(default=1, ge=1)
+    feed_ingestion: Literal["memory", "stream"] = "memory"
+    feed_index: bool = False
+    list_page_size: int = Field(default=1000, ge=1)
+    publish_queue_size: int = Field(default=8, ge=1)
+    output_json_indent: int | None = Field(default=None, ge=0)
+    output_gzip: bool = False
+    local_outputs: bool = False
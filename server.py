@@ -1,42 +1,95 @@
-import os
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from app.sdk.job_manager import BaseJobManager
-from app.sdk.job_router import JobManagerFastAPIRouter
-
-from app.scraper import scrape
-import logging
-from pydantic import BaseModel
-import time
-
-
-
-# Load environment variables
-load_dotenv()
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S')
-
-logging.captureWarnings(True)
-
-logger = logging.getLogger(__name__)
-
-HOST = os.getenv("HOST", "localhost")
-PORT = int(os.getenv("PORT", "8000"))
-MODE = os.getenv("MODE", "production")
-
-# Initialize FastAPI app
-app = FastAPI()
-app.job_manager = BaseJobManager()  # type: ignore
-
-job_manager_router = JobManagerFastAPIRouter(app, scrape)
-
-# Running the server
-if __name__ == "__main__":
-    import uvicorn
-    print(f"Starting server on {HOST}:{PORT}")
-    uvicorn.run("server:app", host=HOST, port=PORT, reload=True)
+from datetime import timedelta
+from functools import partial
+import os
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.sdk.job_manager import BaseJobManager
+from app.sdk.job_store import BaseJobStore, InMemoryJobStore, SQLiteJobStore
+from app.sdk.job_router import JobManagerFastAPIRouter
+
+from augment_main import main as augment_job
+import logging
+from pydantic import BaseModel
+import time
+
+
+
+# Load environment variables
+load_dotenv()
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S')
+
+logging.captureWarnings(True)
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "localhost")
+PORT = int(os.getenv("PORT", "8000"))
+MODE = os.getenv("MODE", "production")
+
+def job_store() -> BaseJobStore:
+    """
+    Jobs are kept in a SQLite database at JOB_STORE_PATH, or in memory if it is not set.
+    """
+    retention_hours = os.getenv("JOB_RETENTION_HOURS")
+    retention = timedelta(hours=float(retention_hours)) if retention_hours else None
+    job_store_path = os.getenv("JOB_STORE_PATH")
+    if job_store_path:
+        return SQLiteJobStore(job_store_path, retention=retention, cache_size=int(os.getenv("JOB_CACHE_SIZE", "1024")))
+    return InMemoryJobStore(retention=retention)
+
+
+def job_manager() -> BaseJobManager:
+    """
+    Jobs run augment_main.main in worker processes, the Kernel Planckster connection comes from the environment;
+    the worker processes outlive their jobs, so with WARM_WORKERS they keep clients and parsed feeds between them.
+    """
+    return BaseJobManager(
+        worker=partial(
+            augment_job,
+            kp_auth_token=os.getenv("KERNEL_PLANCKSTER_AUTH_TOKEN", ""),
+            kp_host=os.getenv("KERNEL_PLANCKSTER_HOST", "localhost"),
+            kp_port=int(os.getenv("KERNEL_PLANCKSTER_PORT", "8000")),
+            kp_scheme=os.getenv("KERNEL_PLANCKSTER_SCHEME", "http"),
+            keep_warm=os.getenv("WARM_WORKERS", "true").lower() == "true",
+        ),
+        max_workers=int(os.getenv("JOB_WORKERS", "2")),
+        max_queued=int(os.getenv("JOB_QUEUE_SIZE", "16")),
+        store=job_store(),
+    )
+
+
+# Initialize FastAPI app
+app = FastAPI()
+
+job_manager_router = JobManagerFastAPIRouter(app)
+
+
+@app.on_event("startup")
+def start_job_manager() -> None:
+    # not at import time: the spawned job workers import this module again, as __mp_main__, and a manager built
+    # there would open the job store too and fail the jobs running right now as interrupted
+    app.job_manager = job_manager()  # type: ignore
+    app.job_manager.recover_interrupted_jobs()  # type: ignore
+
+
+if os.getenv("METRICS_ENABLED", "false").lower() == "true":
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> str:
+        return app.job_manager.metrics()  # type: ignore
+
+
+@app.on_event("shutdown")
+def shutdown_job_manager() -> None:
+    app.job_manager.shutdown()  # type: ignore
+
+# Running the server
+if __name__ == "__main__":
+    import uvicorn
+    print(f"Starting server on {HOST}:{PORT}")
+    uvicorn.run("server:app", host=HOST, port=PORT, reload=True)
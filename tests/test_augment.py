@@ -0,0 +1,72 @@
+import json
+from typing import List, Tuple
+
+import pytest
+
+from app.augment import augment_by_date
+from app.manifest import AugmentationManifest
+from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from models import AugmentationOptions
+
+
+class _FakeScrapedDataRepository:
+    def __init__(self) -> None:
+        self.uploaded: List[Tuple[KernelPlancksterSourceData, bytes]] = []
+
+    def register_scraped_jsons(self, uploads, job_id, max_workers=8, content_encoding=None):
+        self.uploaded.extend(uploads)
+        return [source_data for source_data, _ in uploads]
+
+
+@pytest.fixture
+def work_dir(tmp_path):
+    (tmp_path / "wildfire_coords").mkdir()
+    for day in (10, 11):
+        coordinates = {"0": {"latitude": 40.4442185153, "longitude": -3.2512345678, "status": "fire"}}
+        (tmp_path / "wildfire_coords" / f"0_2023_08_{day}____wildfire.json").write_text(json.dumps(coordinates))
+    (tmp_path / "twitter_augment").mkdir()
+    tweets = {
+        str(day): {
+            "Year": 2023, "Month": "August", "Day": day, "Disaster_Type": "wildfire", "Resolved_Latitude": 40.4442185153,
+            "Resolved_Longitude": -3.2512345678, "Title": "title", "Tweet": "smoke", "Extracted_Location": "somewhere",
+        }
+        for day in (10, 11)
+    }
+    (tmp_path / "twitter_augment" / "data_20230815_120000.json").write_text(json.dumps(tweets))
+    return str(tmp_path)
+
+
+def _run(work_dir: str, **options) -> List[Tuple[KernelPlancksterSourceData, bytes]]:
+    repository = _FakeScrapedDataRepository()
+    manifest = AugmentationManifest.load(f"{work_dir}/manifest.json")
+    minimum_info = {"sentinel": True, "twitter": True, "telegram": False}
+    augment_by_date(work_dir, 1, "tracer", repository, ProtocolEnum.LOCAL, minimum_info, AugmentationOptions(incremental=True, **options), manifest)  # type: ignore
+    return repository.uploaded
+
+
+def test_unchanged_dates_are_skipped(work_dir):
+    assert len(_run(work_dir)) == 2
+    assert _run(work_dir) == []
+    # options that do not change the outputs do not invalidate them
+    assert _run(work_dir, processes=2, upload_workers=1, feed_index=True) == []
+
+
+@pytest.mark.parametrize("options", [
+    {"work_format": "parquet"},
+    {"feed_ingestion": "stream"},
+    {"match_mode": "spatial"},
+    {"output_json_indent": 2},
+])
+def test_dates_are_emitted_again_when_an_option_changes_how_they_are_parsed_or_written(work_dir, options):
+    _run(work_dir)
+
+    assert len(_run(work_dir, **options)) == 2
+    assert _run(work_dir, **options) == []
+
+
+def test_parquet_work_format_changes_the_emitted_coordinates(work_dir):
+    [(_, from_json), _] = sorted(_run(work_dir), key=lambda upload: upload[0].relative_path)
+    [(_, from_parquet), _] = sorted(_run(work_dir, work_format="parquet"), key=lambda upload: upload[0].relative_path)
+
+    # the fingerprint has to cover the work format, or switching it would keep the outputs of the other one
+    assert json.loads(from_json) != json.loads(from_parquet)
@@ -0,0 +1,78 @@
+import os
+
+from app.sdk.download_cache import DownloadCache, file_sha256
+from app.sdk.models import ProtocolEnum
+
+
+RELATIVE_PATH = "telegram/t/1/augmented/data.json"
+
+
+def _blob_bytes(cache: DownloadCache) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(os.path.join(cache.root, "blobs"))
+        for name in names
+    )
+
+
+def _put(cache: DownloadCache, tmp_path, relative_path: str, content: bytes) -> str:
+    file_path = tmp_path / "downloads" / os.path.basename(relative_path)
+    file_path.parent.mkdir(exist_ok=True)
+    file_path.write_bytes(content)
+    cache.put(ProtocolEnum.S3, relative_path, str(file_path))
+    return file_sha256(str(file_path))
+
+
+def test_cached_copy_is_linked_into_place(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"))
+    sha256 = _put(cache, tmp_path, RELATIVE_PATH, b'{"1": "first"}')
+
+    result = cache.get(ProtocolEnum.S3, RELATIVE_PATH, str(tmp_path / "job" / "data.json"))
+
+    assert result is not None and result.from_cache and result.sha256 == sha256
+    assert (tmp_path / "job" / "data.json").read_bytes() == b'{"1": "first"}'
+    assert cache.get(ProtocolEnum.S3, "telegram/t/1/augmented/other.json", str(tmp_path / "job" / "other.json")) is None
+
+
+def test_source_rewritten_in_place_does_not_leave_its_old_blobs_behind(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=1500)
+    job_path = tmp_path / "job" / "data.json"
+
+    for version in range(5):
+        sha256 = _put(cache, tmp_path, RELATIVE_PATH, bytes([version]) * 1000)
+        index_path = os.path.join(cache.indexes_dir, f"{sha256}.telegram.dateindex.npz")
+        with open(index_path, "wb") as f:
+            f.write(b"index")
+        # a job holds a hard link to the current version
+        cache.get(ProtocolEnum.S3, RELATIVE_PATH, str(job_path))
+
+    assert _blob_bytes(cache) == 1000
+    assert os.listdir(cache.indexes_dir) == [f"{sha256}.telegram.dateindex.npz"]
+    # the job's copy is its own link, not removed with the blob it came from
+    assert job_path.read_bytes() == bytes([4]) * 1000
+
+
+def test_blob_shared_by_entries_is_kept_while_one_references_it(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"))
+    _put(cache, tmp_path, "twitter/t/1/augmented/a.json", b"same")
+    _put(cache, tmp_path, "twitter/t/2/augmented/a.json", b"same")
+
+    _put(cache, tmp_path, "twitter/t/1/augmented/a.json", b"changed")
+
+    assert cache.get(ProtocolEnum.S3, "twitter/t/2/augmented/a.json", str(tmp_path / "job" / "a.json")) is not None
+    assert (tmp_path / "job" / "a.json").read_bytes() == b"same"
+    assert _blob_bytes(cache) == len(b"same") + len(b"changed")
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=2500)
+    for name in ("a", "b", "c"):
+        _put(cache, tmp_path, f"twitter/t/1/augmented/{name}.json", name.encode() * 1000)
+        # mtimes are the access order
+        os.utime(os.path.join(cache.root, "entries", f"{DownloadCache.key(ProtocolEnum.S3, f'twitter/t/1/augmented/{name}.json')}.json"), (ord(name), ord(name)))
+
+    _put(cache, tmp_path, "twitter/t/1/augmented/d.json", b"d" * 1000)
+
+    assert _blob_bytes(cache) <= 2500
+    assert cache.get(ProtocolEnum.S3, "twitter/t/1/augmented/a.json", str(tmp_path / "job" / "a.json")) is None
+    assert cache.get(ProtocolEnum.S3, "twitter/t/1/augmented/d.json", str(tmp_path / "job" / "d.json")) is not None
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.augment import _load_feed
+from app.feed_index import FeedDateIndex
+from app.matching import TWITTER_FEED, DateIndexedFeed, date_key
+from app.sdk.download_cache import file_sha256
+from models import AugmentationOptions
+
+
+def _write_feed(path, n_rows: int, title: str = "title") -> str:
+    records = {
+        str(row_id): {
+            "Year": 2023,
+            "Month": "August",
+            "Day": 10 + row_id % 4,
+            "Disaster_Type": "wildfire",
+            "Resolved_Latitude": 40.5 + row_id,
+            "Resolved_Longitude": -3.25,
+            "Title": f"{title} {row_id} ✓",
+            "Tweet": "🔥" * (row_id + 1),
+            "Extracted_Location": "somewhere",
+        }
+        for row_id in range(n_rows)
+    }
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def feed_path(tmp_path):
+    return _write_feed(tmp_path / "feed.json", 30)
+
+
+def test_saved_index_loads_back_identical(tmp_path, feed_path):
+    sha256 = file_sha256(feed_path)
+    index = FeedDateIndex.build(TWITTER_FEED, feed_path, sha256)
+    index_path = index.save(str(tmp_path / "indexes"))
+
+    loaded = FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, sha256)
+
+    assert os.path.basename(index_path) == FeedDateIndex.file_name("twitter", sha256)
+    assert loaded is not None and len(loaded) == 30
+    assert loaded.groups().keys() == index.groups().keys()
+    for key, positions in index.groups().items():
+        np.testing.assert_array_equal(loaded.groups()[key], positions)
+
+
+def test_indexed_streamed_feed_matches_read_json(tmp_path, feed_path):
+    sha256 = file_sha256(feed_path)
+    FeedDateIndex.build(TWITTER_FEED, feed_path, sha256).save(str(tmp_path / "indexes"))
+    index = FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, sha256)
+
+    streamed = index.streamed_feed(TWITTER_FEED, feed_path)
+    in_memory = DateIndexedFeed(TWITTER_FEED, pd.read_json(feed_path, orient="index"))
+
+    for day in (10, 11, 12, 13, 14):
+        key = date_key(2023, 8, day)
+        pd.testing.assert_frame_equal(streamed.rows_for_date(key), in_memory.rows_for_date(key))
+
+
+def test_missing_index_is_not_loaded(tmp_path, feed_path):
+    assert FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, file_sha256(feed_path)) is None
+
+
+def test_index_of_an_older_feed_version_is_not_used(tmp_path, feed_path):
+    FeedDateIndex.build(TWITTER_FEED, feed_path, file_sha256(feed_path)).save(str(tmp_path / "indexes"))
+
+    # the feed is rewritten in place, its new content has no index yet
+    _write_feed(tmp_path / "feed.json", 31, title="new")
+
+    assert FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, file_sha256(feed_path)) is None
+
+
+@pytest.mark.parametrize("content", [b"", b"not an npz file", b"PK\x03\x04truncated"])
+def test_corrupt_index_is_ignored(tmp_path, feed_path, caplog, content):
+    sha256 = file_sha256(feed_path)
+    os.makedirs(tmp_path / "indexes")
+    (tmp_path / "indexes" / FeedDateIndex.file_name("twitter", sha256)).write_bytes(content)
+
+    with caplog.at_level(logging.WARNING):
+        assert FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, sha256) is None
+    assert "Ignoring unreadable feed index" in caplog.text
+
+
+def test_index_of_another_version_of_the_format_is_ignored(tmp_path, feed_path, monkeypatch):
+    sha256 = file_sha256(feed_path)
+    FeedDateIndex.build(TWITTER_FEED, feed_path, sha256).save(str(tmp_path / "indexes"))
+
+    monkeypatch.setattr(FeedDateIndex, "VERSION", FeedDateIndex.VERSION + 1)
+
+    assert FeedDateIndex.load(str(tmp_path / "indexes"), TWITTER_FEED, sha256) is None
+
+
+def test_index_that_does_not_match_the_parsed_feed_is_ignored(tmp_path, feed_path):
+    # e.g. an index built for a feed with duplicate record ids, which read_json collapses
+    stale = FeedDateIndex.build(TWITTER_FEED, _write_feed(tmp_path / "other.json", 12), "stale")
+
+    feed = _load_feed(TWITTER_FEED, feed_path, AugmentationOptions(), None, stale)
+
+    key = date_key(2023, 8, 10)
+    pd.testing.assert_frame_equal(feed.rows_for_date(key), DateIndexedFeed(TWITTER_FEED, pd.read_json(feed_path, orient="index")).rows_for_date(key))
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.feed_stream import StreamedFeed, iter_json_records
+from app.matching import TWITTER_FEED, DateIndexedFeed, date_key
+
+
+def _records() -> dict:
+    texts = ["plain", "café in Zürich", "🔥 near the river 🔥", "中文 text", 'quoted "text" and \\ slash', "x" * 300]
+    return {
+        str(row_id): {
+            "Year": 2023,
+            "Month": "August",
+            "Day": 10 + row_id % 3,
+            "Disaster_Type": "wildfire" if row_id % 2 else "flood",
+            "Resolved_Latitude": 40.5 + row_id,
+            "Resolved_Longitude": -3.25 - row_id,
+            "Title": f"title {row_id} ✓",
+            "Tweet": texts[row_id % len(texts)],
+            "Extracted_Location": "Ærøskøbing",
+        }
+        for row_id in range(40)
+    }
+
+
+@pytest.fixture
+def feed_path(tmp_path):
+    path = tmp_path / "feed.json"
+    # the layout of to_json(orient="index"), plus whitespace between the tokens
+    path.write_text(json.dumps(_records(), ensure_ascii=False, indent=1), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def ndjson_path(tmp_path):
+    path = tmp_path / "feed.ndjson"
+    lines = [json.dumps(record, ensure_ascii=False) for record in _records().values()]
+    path.write_text("\n".join(lines[:20]) + "\n\n" + "\n".join(lines[20:]) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1024 * 1024])
+def test_offsets_point_at_each_record_across_chunk_boundaries(feed_path, chunk_size):
+    with open(feed_path, "rb") as f:
+        content = f.read()
+
+    parsed = list(iter_json_records(feed_path, chunk_size=chunk_size))
+
+    assert [record for record, _, _ in parsed] == list(_records().values())
+    for record, offset, length in parsed:
+        # byte offsets, not character offsets, even after multi-byte UTF-8 text
+        assert json.loads(content[offset:offset + length].decode("utf-8")) == record
+
+
+def test_ndjson_records_and_offsets(ndjson_path):
+    with open(ndjson_path, "rb") as f:
+        content = f.read()
+
+    parsed = list(iter_json_records(ndjson_path))
+
+    assert [record for record, _, _ in parsed] == list(_records().values())
+    for record, offset, length in parsed:
+        assert json.loads(content[offset:offset + length]) == record
+
+
+def test_empty_feed(tmp_path):
+    path = tmp_path / "feed.json"
+    path.write_text("{}")
+
+    assert list(iter_json_records(str(path))) == []
+    assert len(StreamedFeed.scan(TWITTER_FEED, str(path)).rows_for_date(date_key(2023, 8, 10))) == 0
+
+
+@pytest.mark.parametrize("content", ["[]", '{"0": {"Year": 2023}', '{"0" {"Year": 2023}}'])
+def test_malformed_feed_raises(tmp_path, content):
+    path = tmp_path / "feed.json"
+    path.write_text(content)
+
+    with pytest.raises(ValueError):
+        list(iter_json_records(str(path), chunk_size=4))
+
+
+def test_streamed_rows_match_read_json(feed_path):
+    in_memory = DateIndexedFeed(TWITTER_FEED, pd.read_json(feed_path, orient="index"))
+    streamed = StreamedFeed.scan(TWITTER_FEED, feed_path, batch_size=7)
+
+    for day in (9, 10, 11, 12):
+        key = date_key(2023, 8, day)
+        pd.testing.assert_frame_equal(streamed.rows_for_date(key), in_memory.rows_for_date(key))
+
+
+def test_streamed_ndjson_rows_match_read_json(ndjson_path):
+    in_memory = DateIndexedFeed(TWITTER_FEED, pd.read_json(ndjson_path, lines=True))
+    streamed = StreamedFeed.scan(TWITTER_FEED, ndjson_path)
+
+    key = date_key(2023, 8, 11)
+    pd.testing.assert_frame_equal(streamed.rows_for_date(key), in_memory.rows_for_date(key))
+
+
+def test_load_records_keeps_the_order_of_the_positions(feed_path):
+    streamed = StreamedFeed.scan(TWITTER_FEED, feed_path)
+
+    records = streamed.load_records(np.array([5, 2, 5, 0]))
+
+    assert records["Title"].tolist() == ["title 5 ✓", "title 2 ✓", "title 5 ✓", "title 0 ✓"]
@@ -0,0 +1,69 @@
+import hashlib
+import io
+from typing import List
+
+import pytest
+import requests
+
+from app.sdk.file_repository import FileRepository
+from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.resilience import RetryPolicy
+
+
+class _FakeSession:
+    """
+    Stands in for the pooled requests session: reads each PUT body the way requests does, and answers with the
+    given status codes in turn and an S3-style MD5 ETag.
+    """
+    def __init__(self, status_codes: List[int]) -> None:
+        self.status_codes = status_codes
+        self.bodies: List[bytes] = []
+        self.content_lengths: List[int] = []
+
+    def put(self, url, data, headers=None, verify=True) -> requests.Response:
+        self.content_lengths.append(len(data))
+        body = b"".join(data)
+        self.bodies.append(body)
+        response = requests.Response()
+        response.status_code = self.status_codes.pop(0)
+        response.headers["ETag"] = f'"{hashlib.md5(body).hexdigest()}"'
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _repository(status_codes: List[int]) -> FileRepository:
+    repository = FileRepository(ProtocolEnum.S3, chunk_size=4, retry_policy=RetryPolicy(retries=2, backoff=0.0))
+    repository._session = _FakeSession(status_codes)  # type: ignore
+    return repository
+
+
+@pytest.mark.parametrize("content", [b'{"1": "row"}', io.BytesIO(b'{"1": "row"}')])
+def test_in_memory_body_is_uploaded_whole(content):
+    repository = _repository([200])
+
+    sha256 = repository.public_upload_bytes("http://store/signed", content, "'by_date.json'")
+
+    assert repository._session.bodies == [b'{"1": "row"}']  # type: ignore
+    assert repository._session.content_lengths == [12]  # type: ignore
+    assert sha256 == hashlib.sha256(b'{"1": "row"}').hexdigest()
+
+
+def test_stream_is_sent_from_its_position_and_rewound_for_every_retry():
+    repository = _repository([503, 200])
+    stream = io.BytesIO(b'header{"1": "row"}')
+    stream.seek(len(b"header"))
+
+    repository.public_upload_bytes("http://store/signed", stream, "'by_date.json'")
+
+    assert repository._session.bodies == [b'{"1": "row"}', b'{"1": "row"}']  # type: ignore
+
+
+def test_stream_is_saved_locally(tmp_path):
+    repository = FileRepository(ProtocolEnum.LOCAL, data_dir=str(tmp_path))
+    source_data = KernelPlancksterSourceData(name="2023_08_10", protocol=ProtocolEnum.LOCAL, relative_path="augmented/t/1/by_date/2023_08_10.json")
+
+    repository.save_bytes_locally(io.BytesIO(b'{"1": "row"}'), source_data, "json")
+
+    assert (tmp_path / "augmented/t/1/by_date/2023_08_10.json").read_bytes() == b'{"1": "row"}'
@@ -0,0 +1,151 @@
+from datetime import datetime
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.sdk.job_manager import BaseJobManager
+from app.sdk.job_router import JobManagerFastAPIRouter
+from app.sdk.job_store import SQLiteJobStore
+from app.sdk.models import BaseJob, BaseJobState, JobOutput
+
+
+def _never_run(**kwargs) -> JobOutput:
+    raise AssertionError("the jobs of these tests are only queued")
+
+
+def _run_until_released(job_id: int, tracer_id: str, store_path: str, release_path: str) -> JobOutput:
+    # a spawned worker imports the server module again; a manager it opens on the store must leave the job running
+    BaseJobManager(worker=_never_run, store=SQLiteJobStore(store_path)).shutdown()
+    while not os.path.exists(release_path):
+        time.sleep(0.05)
+    return JobOutput(job_state=BaseJobState.FINISHED, tracer_id=tracer_id, source_data_list=[])
+
+
+def _release(release_path: str) -> None:
+    with open(release_path, "w"):
+        pass
+
+
+def _wait_for(condition, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite")
+
+
+@pytest.fixture
+def client(store_path, monkeypatch):
+    app = FastAPI()
+    app.job_manager = BaseJobManager(worker=_never_run, max_workers=1, max_queued=1, store=SQLiteJobStore(store_path))  # type: ignore
+    # without the dispatcher, started jobs stay queued
+    monkeypatch.setattr(app.job_manager, "_start_threads", lambda: None)  # type: ignore
+    JobManagerFastAPIRouter(app)
+    yield TestClient(app)
+    app.job_manager.shutdown()  # type: ignore
+
+
+def _create(client: TestClient, tracer_id: str = "tracer") -> int:
+    response = client.post("/job", params={"tracer_id": tracer_id}, json={"job_args": {"work_dir": "./.tmp"}})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_starting_a_job_while_the_queue_is_full_is_rejected_with_429(client):
+    first, second = _create(client), _create(client)
+
+    assert client.get(f"/job/{first}/start").status_code == 200
+    response = client.get(f"/job/{second}/start")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    # the rejected job can still be started later
+    assert client.get(f"/job/{second}").json()["state"] == BaseJobState.CREATED.value
+
+
+def test_starting_a_job_twice_or_an_unknown_job(client):
+    job_id = _create(client)
+    assert client.get(f"/job/{job_id}/start").status_code == 200
+
+    assert client.get(f"/job/{job_id}/start").status_code == 409
+    assert client.get("/job/999/start").status_code == 404
+    assert client.get("/job/999").status_code == 404
+
+
+def test_list_jobs_pages_and_filters(client):
+    ids = [_create(client, tracer_id="a" if i % 2 else "b") for i in range(5)]
+
+    first_page = client.get("/job", params={"limit": 2}).json()
+    second_page = client.get("/job", params={"limit": 2, "before_id": first_page[-1]["id"]}).json()
+    tracer_a = client.get("/job", params={"tracer_id": "a"}).json()
+
+    assert [job["id"] for job in first_page] == ids[::-1][:2]
+    assert [job["id"] for job in second_page] == ids[::-1][2:4]
+    assert [job["id"] for job in tracer_a] == [ids[3], ids[1]]
+    assert client.get("/job", params={"limit": 0}).status_code == 422
+
+
+def test_jobs_interrupted_by_a_restart_are_failed(store_path):
+    store = SQLiteJobStore(store_path)
+    now = datetime.now()
+
+    def save(state: BaseJobState, messages) -> int:
+        job_id = store.next_id()
+        store.save(BaseJob(id=job_id, name=f"job-{job_id}", tracer_id="tracer", state=state, messages=messages, created_at=now, heartbeat=now))
+        return job_id
+
+    running = save(BaseJobState.RUNNING, ["Status: QUEUED.", "Status: RUNNING."])
+    queued = save(BaseJobState.CREATED, ["Status: QUEUED."])
+    created = save(BaseJobState.CREATED, [])
+    finished = save(BaseJobState.FINISHED, ["Status: QUEUED.", "Status: RUNNING.", "Status: FINISHED."])
+    store.close()
+
+    job_manager = BaseJobManager(worker=_never_run, store=SQLiteJobStore(store_path))
+    # opening a manager on the store does not touch its jobs, only the explicit recovery does
+    assert job_manager.get_job(running).state == BaseJobState.RUNNING
+    job_manager.recover_interrupted_jobs()
+    try:
+        assert job_manager.get_job(running).state == BaseJobState.FAILED
+        assert job_manager.get_job(queued).state == BaseJobState.FAILED
+        assert "interrupted by a restart" in job_manager.get_job(queued).messages[-1]
+        # never started, so it can still be started
+        assert job_manager.get_job(created).state == BaseJobState.CREATED
+        assert job_manager.get_job(finished).state == BaseJobState.FINISHED
+    finally:
+        job_manager.shutdown()
+
+
+def test_a_started_job_is_running_in_the_store_until_it_finishes(store_path, tmp_path):
+    app = FastAPI()
+    app.job_manager = BaseJobManager(worker=_run_until_released, max_workers=1, store=SQLiteJobStore(store_path))  # type: ignore
+    JobManagerFastAPIRouter(app)
+    client = TestClient(app)
+    release_path = str(tmp_path / "release")
+    try:
+        response = client.post("/job", params={"tracer_id": "tracer"}, json={"job_args": {"store_path": store_path, "release_path": release_path}})
+        job_id = response.json()["id"]
+        assert client.get(f"/job/{job_id}/start").status_code == 200
+
+        _wait_for(lambda: client.get(f"/job/{job_id}").json()["state"] == BaseJobState.RUNNING.value)
+        # long enough for the worker process to have started and opened the store
+        time.sleep(2)
+
+        assert client.get(f"/job/{job_id}").json()["state"] == BaseJobState.RUNNING.value
+        store = SQLiteJobStore(store_path)
+        try:
+            assert store.get(job_id).state == BaseJobState.RUNNING
+        finally:
+            store.close()
+
+        _release(release_path)
+        _wait_for(lambda: client.get(f"/job/{job_id}").json()["state"] == BaseJobState.FINISHED.value)
+    finally:
+        _release(release_path)
+        app.job_manager.shutdown()  # type: ignore
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+
+from app.sdk.job_store import BaseJobStore, InMemoryJobStore, SQLiteJobStore
+from app.sdk.models import BaseJob, BaseJobState
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        job_store = InMemoryJobStore(retention=timedelta(hours=1))
+    else:
+        job_store = SQLiteJobStore(str(tmp_path / "jobs.sqlite"), retention=timedelta(hours=1), cache_size=2)
+    yield job_store
+    job_store.close()
+
+
+def _job(store: BaseJobStore, tracer_id: str = "tracer", state: BaseJobState = BaseJobState.CREATED, age: timedelta = timedelta()) -> BaseJob:
+    job_id = store.next_id()
+    heartbeat = datetime.now() - age
+    job = BaseJob(id=job_id, name=f"job-{job_id}", tracer_id=tracer_id, state=state, created_at=heartbeat, heartbeat=heartbeat)
+    store.save(job)
+    return job
+
+
+def _ids(jobs: List[BaseJob]) -> List[int]:
+    return [job.id for job in jobs]
+
+
+def test_a_store_missing_a_method_can_not_be_created():
+    class IncompleteJobStore(BaseJobStore):
+        def next_id(self) -> int:
+            return 1
+
+    with pytest.raises(TypeError):
+        IncompleteJobStore()  # type: ignore
+
+
+def test_get_returns_the_saved_job(store):
+    job = _job(store)
+    job.args = {"work_dir": "./.tmp"}
+    job.messages.append("Status: QUEUED.")
+    store.save(job)
+
+    loaded = store.get(job.id)
+
+    assert loaded.args == {"work_dir": "./.tmp"}
+    assert loaded.messages == ["Status: QUEUED."]
+    assert loaded.state == BaseJobState.CREATED
+
+
+def test_get_unknown_job_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store.get(42)
+
+
+def test_list_pages_newest_first(store):
+    jobs = [_job(store) for _ in range(7)]
+    ids = _ids(jobs)
+
+    first_page = store.list(limit=3)
+    second_page = store.list(limit=3, before_id=first_page[-1].id)
+    last_page = store.list(limit=3, before_id=second_page[-1].id)
+
+    assert _ids(first_page) == ids[::-1][:3]
+    assert _ids(second_page) == ids[::-1][3:6]
+    assert _ids(last_page) == ids[::-1][6:]
+    assert store.list(limit=3, before_id=last_page[-1].id) == []
+    assert _ids(store.list(limit=None)) == ids[::-1]
+
+
+def test_list_filters_by_tracer_id_and_state(store):
+    a_created = _job(store, tracer_id="a")
+    b_finished = _job(store, tracer_id="b", state=BaseJobState.FINISHED)
+    a_finished = _job(store, tracer_id="a", state=BaseJobState.FINISHED)
+
+    assert _ids(store.list(tracer_id="a")) == [a_finished.id, a_created.id]
+    assert _ids(store.list(state=BaseJobState.FINISHED)) == [a_finished.id, b_finished.id]
+    assert _ids(store.list(tracer_id="a", state=BaseJobState.FINISHED)) == [a_finished.id]
+    assert _ids(store.list(tracer_id="a", state=BaseJobState.FINISHED, before_id=a_finished.id)) == []
+
+
+def test_purge_drops_only_expired_final_jobs(store):
+    old_finished = _job(store, state=BaseJobState.FINISHED, age=timedelta(hours=2))
+    old_failed = _job(store, state=BaseJobState.FAILED, age=timedelta(hours=2))
+    old_running = _job(store, state=BaseJobState.RUNNING, age=timedelta(hours=2))
+    recent_finished = _job(store, state=BaseJobState.FINISHED)
+
+    # saving applies the policy too, at most once per purge interval
+    store.purge_expired()
+
+    assert store.purge_expired() == 0
+    assert _ids(store.list()) == [recent_finished.id, old_running.id]
+    for job in (old_finished, old_failed):
+        with pytest.raises(KeyError):
+            store.get(job.id)
+
+
+def test_sqlite_jobs_and_ids_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = SQLiteJobStore(path, retention=timedelta(hours=1))
+    finished = _job(store, state=BaseJobState.FINISHED, age=timedelta(hours=2))
+    running = _job(store, state=BaseJobState.RUNNING)
+    store.purge_expired()
+    store.close()
+
+    store = SQLiteJobStore(path, retention=timedelta(hours=1))
+    try:
+        assert store.get(running.id).state == BaseJobState.RUNNING
+        # the purged job's id is not handed out again
+        assert store.next_id() == max(finished.id, running.id) + 1
+    finally:
+        store.close()
+
+
+def test_sqlite_reads_past_the_cache(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite"), cache_size=1)
+    try:
+        jobs = [_job(store, tracer_id=f"tracer-{i}") for i in range(3)]
+
+        assert [store.get(job.id).tracer_id for job in jobs] == ["tracer-0", "tracer-1", "tracer-2"]
+        assert _ids(store.list()) == _ids(jobs)[::-1]
+    finally:
+        store.close()
@@ -0,0 +1,68 @@
+from typing import List
+
+import httpx
+import pytest
+
+import app.sdk.kernel_plackster_gateway
+from app.sdk.kernel_plackster_gateway import KernelPlancksterGateway
+from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.resilience import RetryPolicy
+
+
+SOURCE_DATA = KernelPlancksterSourceData(name="2023_08_10", protocol=ProtocolEnum.S3, relative_path="augmented/tracer/1/by_date/2023_08_10.json")
+REGISTERED = {"name": SOURCE_DATA.name, "protocol": "s3", "relative_path": SOURCE_DATA.relative_path}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(app.sdk.kernel_plackster_gateway.time, "sleep", lambda seconds: None)
+
+
+def _gateway(registrations: List[Exception | None]) -> KernelPlancksterGateway:
+    """
+    A gateway whose registration attempts fail with the given transport errors, or succeed on None. The failures
+    that reached the server register the source anyway, but are only listed from the second lookup on.
+    """
+    registered: List[dict] = []
+    lookups: List[int] = [0]
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/ping":
+            return httpx.Response(200, text="pong")
+        if request.method == "GET":
+            lookups[0] += 1
+            return httpx.Response(200, json={"source_data_list": registered if lookups[0] > 1 else []})
+        error = registrations.pop(0)
+        if not isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            registered.append(REGISTERED)
+        if error:
+            raise error
+        return httpx.Response(200, json={"source_data": REGISTERED})
+
+    gateway = KernelPlancksterGateway("kp", "8000", "token", "http", retry_policy=RetryPolicy(retries=3))
+    gateway._client = httpx.Client(transport=httpx.MockTransport(handle))
+    return gateway
+
+
+def test_registration_is_retried_after_a_connect_error():
+    gateway = _gateway([httpx.ConnectError("refused"), None])
+
+    assert gateway.register_new_source_data(SOURCE_DATA) == REGISTERED
+
+
+def test_registration_that_may_have_reached_the_gateway_is_not_repeated():
+    registrations: List[Exception | None] = [httpx.ReadTimeout("no answer"), httpx.ReadTimeout("no answer"), None]
+    gateway = _gateway(registrations)
+
+    assert gateway.register_new_source_data(SOURCE_DATA) == REGISTERED
+    # the second retry found the source registered and did not register it a third time
+    assert registrations == [None]
+
+
+def test_a_connect_error_after_an_ambiguous_attempt_does_not_clear_it():
+    registrations: List[Exception | None] = [httpx.ReadTimeout("no answer"), httpx.ConnectError("refused"), None]
+    gateway = _gateway(registrations)
+
+    assert gateway.register_new_source_data(SOURCE_DATA) == REGISTERED
+    # the timed out attempt may still register, so the retry after the connect error looks it up first
+    assert registrations == [None]
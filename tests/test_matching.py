@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from app.matching import (
+    INVALID_DATE_KEY,
+    OUTPUT_COLUMNS,
+    TELEGRAM_FEED,
+    TWITTER_FEED,
+    DateIndexedFeed,
+    date_key,
+    feed_date_keys,
+    join_date_rows,
+    sentinel_date_from_file_name,
+    sentinel_date_key,
+    sentinel_rows,
+)
+
+
+def _tweets() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Year": [2023, "2023", 2023.0, None, 2023],
+            "Month": ["August", "August", "August", "August", "Augustus"],
+            "Day": [10, "11", 10.7, 10, 10],
+            "Disaster_Type": ["fire", "flood", "fire", "fire", "fire"],
+            "Resolved_Latitude": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "Resolved_Longitude": [10.0, 20.0, 30.0, 40.0, 50.0],
+            "Title": ["a", "b", "c", "d", "e"],
+            "Tweet": ["t1", "t2", "t3", "t4", "t5"],
+            "Extracted_Location": ["x", "y", "z", "w", "v"],
+        }
+    )
+
+
+def test_feed_date_keys_truncate_and_invalidate_like_the_scrapers():
+    keys = feed_date_keys(_tweets())
+
+    assert keys.tolist() == [
+        date_key(2023, 8, 10),
+        date_key(2023, 8, 11),
+        date_key(2023, 8, 10),
+        INVALID_DATE_KEY,
+        INVALID_DATE_KEY,
+    ]
+
+
+def test_rows_for_date_keeps_feed_order():
+    feed = DateIndexedFeed(TWITTER_FEED, _tweets())
+
+    rows = feed.rows_for_date(date_key(2023, 8, 10))
+
+    assert list(rows.columns) == OUTPUT_COLUMNS
+    assert rows["Text"].tolist() == ["t1", "t3"]
+    assert rows["Status"].tolist() == ["tweet about fire", "tweet about fire"]
+
+
+def test_missing_feed_matches_nothing():
+    feed = DateIndexedFeed(TELEGRAM_FEED, pd.DataFrame())
+
+    rows = feed.rows_for_date(date_key(2023, 8, 10))
+
+    assert len(rows) == 0
+    assert list(rows.columns) == OUTPUT_COLUMNS
+
+
+def test_date_with_one_missing_feed_keeps_sentinel_and_other_feed_rows():
+    sentinel = pd.DataFrame({"status": ["fire"], "latitude": [1.5], "longitude": [2.5]})
+    key = date_key(2023, 8, 10)
+
+    date_df = join_date_rows([
+        sentinel_rows(sentinel),
+        DateIndexedFeed(TWITTER_FEED, _tweets()).rows_for_date(key),
+        DateIndexedFeed(TELEGRAM_FEED, pd.DataFrame()).rows_for_date(key),
+    ])
+
+    assert date_df["Status"].tolist() == ["fire", "tweet about fire", "tweet about fire"]
+
+
+def test_sentinel_date_from_file_name():
+    assert sentinel_date_from_file_name("XX2023_08_15____coords.json") == ("2023", "August", "15")
+
+
+def test_unparseable_sentinel_date_matches_nothing():
+    assert sentinel_date_key("2023", "August", "15") == date_key(2023, 8, 15)
+    assert sentinel_date_key("2023", "February", "30") == INVALID_DATE_KEY
+    assert sentinel_date_key("2023", "August", "1x") == INVALID_DATE_KEY
+    assert sentinel_date_key("2023", "Augustus", "15") == INVALID_DATE_KEY
+
+    feed = DateIndexedFeed(TWITTER_FEED, _tweets())
+    assert len(feed.rows_for_date(INVALID_DATE_KEY)) == 0
+    assert feed.positions_for_date(INVALID_DATE_KEY).dtype == np.int64
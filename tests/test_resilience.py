@@ -0,0 +1,224 @@
+import json
+import logging
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+import app.augment
+import app.sdk.resilience
+from app.augment import augment_by_date
+from app.manifest import AugmentationManifest
+from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.resilience import CircuitBreaker, CircuitOpenError, CircuitState, RetryableError, RetryPolicy, call_with_retries
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _FakeClock:
+    """
+    A monotonic clock that only moves when something sleeps on it.
+    """
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return _FakeClock()
+
+
+@pytest.mark.parametrize("retry", range(10))
+def test_delay_stays_within_the_capped_exponential_bound(retry):
+    policy = RetryPolicy(retries=10, backoff=0.5, max_backoff=30.0)
+    bound = min(30.0, 0.5 * 2 ** retry)
+
+    assert all(0 <= policy.delay(retry) <= bound for _ in range(200))
+
+
+def test_delay_reaches_the_cap_and_no_further(monkeypatch):
+    monkeypatch.setattr(app.sdk.resilience.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(retries=10, backoff=0.5, max_backoff=30.0)
+
+    assert [policy.delay(retry) for retry in range(8)] == [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+
+
+def test_retryable_errors_are_retried_with_backoff_then_reraised(clock):
+    policy = RetryPolicy(retries=3, backoff=1.0, max_backoff=3.0)
+    attempts: List[int] = []
+
+    def fail():
+        attempts.append(len(attempts))
+        raise RetryableError(f"attempt {len(attempts)}")
+
+    with pytest.raises(RetryableError, match="attempt 4"):
+        call_with_retries(fail, policy, (RetryableError,), "fail", LOGGER, sleep=clock.sleep)
+
+    assert len(attempts) == 4
+    assert len(clock.sleeps) == 3
+    assert all(0 <= delay <= bound for delay, bound in zip(clock.sleeps, [1.0, 2.0, 3.0]))
+
+
+def test_a_retry_that_succeeds_returns_its_result(clock):
+    results = iter([RetryableError("first"), "second"])
+
+    def call():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert call_with_retries(call, RetryPolicy(retries=3), (RetryableError,), "call", LOGGER, sleep=clock.sleep) == "second"
+    assert len(clock.sleeps) == 1
+
+
+def test_non_retryable_errors_pass_through_and_count_as_an_answer(clock):
+    breaker = CircuitBreaker("dependency", failure_threshold=2, clock=clock)
+    breaker.record_failure()
+
+    def reject():
+        raise ValueError("400: bad request")
+
+    with pytest.raises(ValueError, match="bad request"):
+        call_with_retries(reject, RetryPolicy(retries=3), (RetryableError,), "reject", LOGGER, breaker, sleep=clock.sleep)
+
+    assert clock.sleeps == []
+    # the dependency answered, so its earlier failure no longer counts towards opening the circuit
+    assert breaker.metrics()["consecutive_failures"] == 0
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_circuit_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker("dependency", failure_threshold=2, reset_timeout=30.0, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN and breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.sleep(29.9)
+    assert breaker.is_open()
+
+    clock.sleep(0.1)
+    assert not breaker.is_open()
+    # a single trial call is let through, the others are still refused while it is in flight
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
+    assert breaker.metrics() == {"state": "closed", "consecutive_failures": 0, "opened": 1, "refused": 2}
+
+
+def test_failed_trial_call_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker("dependency", failure_threshold=2, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.sleep(30.0)
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitState.OPEN and breaker.is_open()
+    clock.sleep(29.0)
+    # the reset timeout starts over from the failed trial
+    assert breaker.is_open()
+    assert breaker.metrics()["opened"] == 2
+
+
+def test_open_circuit_stops_the_retries_at_once(clock):
+    breaker = CircuitBreaker("dependency", failure_threshold=2, clock=clock)
+    attempts: List[int] = []
+
+    def fail():
+        attempts.append(len(attempts))
+        raise RetryableError("down")
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(fail, RetryPolicy(retries=5), (RetryableError,), "fail", LOGGER, breaker, sleep=clock.sleep)
+
+    assert len(attempts) == 2
+
+
+class _FlakyScrapedDataRepository:
+    """
+    Fails the first `failures` uploads of every output, and opens the object store's circuit breaker while doing so.
+    """
+    def __init__(self, clock: _FakeClock, failures: int) -> None:
+        self.kernel_planckster = SimpleNamespace(breaker=CircuitBreaker("Kernel Planckster", clock=clock))
+        self.file_repository = SimpleNamespace(breaker=CircuitBreaker("object store", failure_threshold=1, reset_timeout=30.0, clock=clock))
+        self.failures = failures
+        self.attempts: List[str] = []
+
+    def register_scraped_jsons(self, uploads, job_id, max_workers=8, content_encoding=None):
+        results = []
+        for source_data, _ in uploads:
+            self.attempts.append(source_data.relative_path)
+            if self.attempts.count(source_data.relative_path) <= self.failures:
+                self.file_repository.breaker.record_failure()
+                results.append(RetryableError(f"upload of {source_data.relative_path} failed"))
+            else:
+                results.append(source_data)
+        return results
+
+
+def _work_dir(tmp_path) -> str:
+    (tmp_path / "wildfire_coords").mkdir()
+    for day in (10, 11):
+        coordinates = {"0": {"latitude": 40.5, "longitude": -3.25, "status": "fire"}}
+        (tmp_path / "wildfire_coords" / f"0_2023_08_{day}____wildfire.json").write_text(json.dumps(coordinates))
+    (tmp_path / "twitter_augment").mkdir()
+    tweets = {
+        str(day): {
+            "Year": 2023, "Month": "August", "Day": day, "Disaster_Type": "wildfire", "Resolved_Latitude": 40.5,
+            "Resolved_Longitude": -3.25, "Title": "title", "Tweet": "smoke", "Extracted_Location": "somewhere",
+        }
+        for day in (10, 11)
+    }
+    (tmp_path / "twitter_augment" / "data_20230815_120000.json").write_text(json.dumps(tweets))
+    return str(tmp_path)
+
+
+def _augment(work_dir: str, repository: _FlakyScrapedDataRepository, manifest: AugmentationManifest) -> List[KernelPlancksterSourceData]:
+    minimum_info = {"sentinel": True, "twitter": True, "telegram": False}
+    return augment_by_date(work_dir, 1, "tracer", repository, ProtocolEnum.LOCAL, minimum_info, manifest=manifest)  # type: ignore
+
+
+def test_dead_lettered_uploads_are_replayed_once_the_circuit_lets_calls_through(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(app.augment.time, "sleep", clock.sleep)
+    repository = _FlakyScrapedDataRepository(clock, failures=1)
+    manifest = AugmentationManifest(str(tmp_path / "manifest.json"))
+
+    outputs = _augment(_work_dir(tmp_path), repository, manifest)
+
+    assert len(outputs) == 2
+    assert sorted(repository.attempts) == sorted([output.relative_path for output in outputs] * 2)
+    # the replay waited out the open object store circuit once, not once per output
+    assert clock.sleeps == [30.0]
+    assert all(manifest.date_fingerprint(f"0_2023_08_{day}____wildfire.json") for day in (10, 11))
+
+
+def test_dates_whose_replay_fails_are_left_for_the_next_run(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(app.augment.time, "sleep", clock.sleep)
+    repository = _FlakyScrapedDataRepository(clock, failures=2)
+    manifest = AugmentationManifest(str(tmp_path / "manifest.json"))
+
+    outputs = _augment(_work_dir(tmp_path), repository, manifest)
+
+    assert outputs == []
+    assert len(repository.attempts) == 4
+    assert all(manifest.date_fingerprint(f"0_2023_08_{day}____wildfire.json") is None for day in (10, 11))
@@ -0,0 +1,86 @@
+import hashlib
+import os
+from typing import Dict, List
+
+from app.sdk.download_cache import DownloadCache
+from app.sdk.models import DownloadResult, KernelPlancksterSourceData, ProtocolEnum
+from app.sdk.scraped_data_repository import ScrapedDataRepository
+
+
+class _FakeKernelPlanckster:
+    def download_from_signed_urls(self, source_data_list: List[KernelPlancksterSourceData], max_workers: int = 8) -> List[str]:
+        return [source_data.relative_path for source_data in source_data_list]
+
+
+class _FakeObjectStore:
+    """
+    Stands in for the FileRepository: serves objects by signed url, honouring If-None-Match like S3.
+    """
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+        self.transferred: List[str] = []
+
+    def public_download(self, signed_url: str, file_path: str, etag: str | None = None) -> DownloadResult:
+        content = self.objects[signed_url]
+        current_etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if etag == current_etag and os.path.exists(file_path):
+            return DownloadResult(modified=False, size=os.path.getsize(file_path), etag=etag)
+
+        self.transferred.append(signed_url)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # replaced, not written in place, like FileRepository does
+        with open(f"{file_path}.part", "wb") as f:
+            f.write(content)
+        os.replace(f"{file_path}.part", file_path)
+        return DownloadResult(modified=True, size=len(content), etag=current_etag, sha256=hashlib.sha256(content).hexdigest())
+
+
+def _repository(tmp_path) -> ScrapedDataRepository:
+    return ScrapedDataRepository(
+        protocol=ProtocolEnum.S3,
+        kernel_planckster=_FakeKernelPlanckster(),  # type: ignore
+        file_repository=_FakeObjectStore(),  # type: ignore
+        download_cache=DownloadCache(str(tmp_path / "cache")),
+    )
+
+
+def _download(repository: ScrapedDataRepository, source_data: KernelPlancksterSourceData, file_path: str) -> DownloadResult:
+    result = repository.download_jsons([(source_data, file_path)], job_id=1)[0]
+    assert isinstance(result, DownloadResult)
+    return result
+
+
+def test_unchanged_source_is_served_from_the_cache_without_a_transfer(tmp_path):
+    repository = _repository(tmp_path)
+    store = repository.file_repository
+    source_data = KernelPlancksterSourceData(name="data.json", protocol=ProtocolEnum.S3, relative_path="telegram/t/1/augmented/data.json")
+    store.objects[source_data.relative_path] = b'{"1": "first"}'
+
+    _download(repository, source_data, str(tmp_path / "job1" / "data.json"))
+    result = _download(repository, source_data, str(tmp_path / "job2" / "data.json"))
+
+    assert result.from_cache
+    assert store.transferred == [source_data.relative_path]
+    assert (tmp_path / "job2" / "data.json").read_bytes() == b'{"1": "first"}'
+
+
+def test_source_rewritten_in_place_is_not_served_stale_from_the_cache(tmp_path):
+    repository = _repository(tmp_path)
+    store = repository.file_repository
+    source_data = KernelPlancksterSourceData(name="data.json", protocol=ProtocolEnum.S3, relative_path="telegram/t/1/augmented/data.json")
+    store.objects[source_data.relative_path] = b'{"1": "first"}'
+    _download(repository, source_data, str(tmp_path / "job1" / "data.json"))
+
+    store.objects[source_data.relative_path] = b'{"1": "second"}'
+    result = _download(repository, source_data, str(tmp_path / "job2" / "data.json"))
+
+    assert not result.from_cache
+    assert result.sha256 == hashlib.sha256(b'{"1": "second"}').hexdigest()
+    assert (tmp_path / "job2" / "data.json").read_bytes() == b'{"1": "second"}'
+    # the earlier job's copy is a link to the old blob, it is not rewritten under it
+    assert (tmp_path / "job1" / "data.json").read_bytes() == b'{"1": "first"}'
+
+    # and the new version is what the cache serves from now on
+    result = _download(repository, source_data, str(tmp_path / "job3" / "data.json"))
+    assert result.from_cache
+    assert (tmp_path / "job3" / "data.json").read_bytes() == b'{"1": "second"}'
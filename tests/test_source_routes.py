@@ -0,0 +1,78 @@
+import json
+from typing import List, Tuple
+
+import pytest
+
+import app.augment
+from app.augment import augment_by_date
+from app.matching import SocialFeed
+from app.source_routes import SENTINEL_KIND, SOURCE_ROUTES, SourceRoute, SourceRoutes
+from app.sdk.models import KernelPlancksterSourceData, ProtocolEnum
+
+
+class _FakeScrapedDataRepository:
+    def __init__(self) -> None:
+        self.uploaded: List[Tuple[KernelPlancksterSourceData, bytes]] = []
+
+    def register_scraped_jsons(self, uploads, job_id, max_workers=8, content_encoding=None):
+        self.uploaded.extend(uploads)
+        return [source_data for source_data, _ in uploads]
+
+
+MASTODON_FEED = SocialFeed(kind="mastodon", text_column="Toot", status_prefix="toot about")
+
+
+def _post(text_column: str, text: str) -> dict:
+    return {
+        "Year": 2023,
+        "Month": "August",
+        "Day": 10,
+        "Disaster_Type": "wildfire",
+        "Resolved_Latitude": 40.5,
+        "Resolved_Longitude": -3.25,
+        "Title": "title",
+        text_column: text,
+        "Extracted_Location": "somewhere",
+    }
+
+
+def test_duplicate_kinds_and_paths_are_rejected():
+    with pytest.raises(ValueError):
+        SourceRoutes([*SOURCE_ROUTES, SourceRoute(kind="twitter", path_template="x/{tracer_id}/{job_id}", local_dir="x")])
+    with pytest.raises(ValueError):
+        SourceRoutes([*SOURCE_ROUTES, SourceRoute(kind="x", path_template="twitter/{tracer_id}/{job_id}/augmented/", local_dir="x")])
+
+
+def test_feed_routes_are_the_routes_with_a_feed():
+    assert [route.kind for route in SOURCE_ROUTES.feed_routes] == ["twitter", "telegram"]
+
+
+def test_feed_path_picks_the_current_file(tmp_path):
+    twitter_route = SOURCE_ROUTES.feed_routes[0]
+    assert twitter_route.feed_path(str(tmp_path)) is None
+
+    (tmp_path / "twitter_augment").mkdir()
+    for file_name in ("data_20230815_120000.json", "data_20230816_080000.json", "data_20230801_230000.json"):
+        (tmp_path / "twitter_augment" / file_name).write_text("{}")
+
+    assert twitter_route.feed_path(str(tmp_path)) == str(tmp_path / "twitter_augment" / "data_20230816_080000.json")
+
+
+def test_a_registered_feed_is_matched_without_further_changes(tmp_path, monkeypatch):
+    mastodon_route = SourceRoute(kind="mastodon", path_template="mastodon/{tracer_id}/{job_id}/augmented", local_dir="mastodon_augment", feed=MASTODON_FEED)
+    monkeypatch.setattr(app.augment, "SOURCE_ROUTES", SourceRoutes([*SOURCE_ROUTES, mastodon_route]))
+
+    (tmp_path / "wildfire_coords").mkdir()
+    (tmp_path / "wildfire_coords" / "0_2023_08_10____wildfire.json").write_text(json.dumps({"0": {"latitude": 40.5, "longitude": -3.25, "status": "fire"}}))
+    (tmp_path / "mastodon_augment").mkdir()
+    (tmp_path / "mastodon_augment" / "feed.json").write_text(json.dumps({"0": _post("Toot", "smoke over the hills")}))
+    repository = _FakeScrapedDataRepository()
+
+    minimum_info = {SENTINEL_KIND: True, "twitter": False, "telegram": False, "mastodon": True}
+    augment_by_date(str(tmp_path), 1, "tracer", repository, ProtocolEnum.LOCAL, minimum_info)  # type: ignore
+
+    [(source_data, content)] = repository.uploaded
+    rows = list(json.loads(content).values())
+    assert source_data.relative_path.startswith("augmented/tracer/1/by_date/2023_August_10_")
+    assert [row["Status"] for row in rows] == ["fire", "toot about wildfire"]
+    assert rows[1]["Text"] == "smoke over the hills"
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.matching import TWITTER_FEED, DateIndexedFeed, date_key
+from app.spatial import EARTH_RADIUS_KM, FirePointIndex, haversine_km, positions_near_fires
+
+
+def _brute_force_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _brute_force_within(fire_points, posts, radius_km: float) -> list:
+    return [
+        any(_brute_force_km(lat, lon, fire_lat, fire_lon) <= radius_km for fire_lat, fire_lon in fire_points)
+        for lat, lon in posts
+    ]
+
+
+def _north_of(lat: float, km: float) -> float:
+    return lat + math.degrees(km / EARTH_RADIUS_KM)
+
+
+def test_haversine_matches_the_brute_force():
+    assert haversine_km(np.array([0.0]), np.array([0.0]), np.array([0.0]), np.array([1.0]))[0] == pytest.approx(111.195, abs=1e-3)
+    assert haversine_km(np.array([40.44]), np.array([-3.25]), np.array([48.85]), np.array([2.35]))[0] == pytest.approx(_brute_force_km(40.44, -3.25, 48.85, 2.35))
+
+
+@pytest.mark.parametrize("latitude", [0.0, 40.44, 69.5, -55.0])
+def test_points_just_inside_the_radius_match_and_just_outside_do_not(latitude):
+    index = FirePointIndex(np.array([latitude]), np.array([10.0]))
+    radius_km = 10.0
+    # along a meridian and along a parallel, where the longitude margin of the bounding box grows with the latitude
+    east_inside = 10.0 + math.degrees(0.99 * radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    posts = [
+        (_north_of(latitude, 0.99 * radius_km), 10.0),
+        (_north_of(latitude, 1.01 * radius_km), 10.0),
+        (_north_of(latitude, -0.99 * radius_km), 10.0),
+        (latitude, east_inside),
+        (latitude, 10.0 + 2 * (east_inside - 10.0)),
+    ]
+
+    mask = index.within(np.array([lat for lat, _ in posts]), np.array([lon for _, lon in posts]), radius_km)
+
+    assert mask.tolist() == _brute_force_within([(latitude, 10.0)], posts, radius_km)
+    assert mask.tolist()[:3] == [True, False, True]
+
+
+@pytest.mark.parametrize("radius_km", [0.5, 10.0, 250.0])
+def test_random_points_match_the_brute_force(radius_km):
+    rng = np.random.default_rng(7)
+    # away from the antimeridian, which the bounding boxes do not wrap around
+    fire_points = list(zip(rng.uniform(-60, 60, 40), rng.uniform(-170, 170, 40)))
+    near = [(lat + rng.normal(0, 0.02 * radius_km / 10), lon + rng.normal(0, 0.02 * radius_km / 10)) for lat, lon in fire_points]
+    posts = near + list(zip(rng.uniform(-60, 60, 300), rng.uniform(-170, 170, 300)))
+    index = FirePointIndex(np.array([lat for lat, _ in fire_points]), np.array([lon for _, lon in fire_points]))
+
+    mask = index.within(np.array([lat for lat, _ in posts]), np.array([lon for _, lon in posts]), radius_km)
+
+    assert mask.tolist() == _brute_force_within(fire_points, posts, radius_km)
+    assert mask.any()
+
+
+def test_nan_coordinates_never_match():
+    index = FirePointIndex(np.array([40.0, np.nan, 41.0]), np.array([np.nan, 10.0, 11.0]))
+
+    mask = index.within(np.array([41.0, np.nan, 41.0, 40.0]), np.array([11.0, 11.0, np.nan, 10.0]), 10.0)
+
+    # the fire points with a NaN coordinate are dropped, the posts with one are never within the radius
+    assert len(index) == 1
+    assert mask.tolist() == [True, False, False, False]
+
+
+def test_index_without_fire_points_matches_nothing():
+    index = FirePointIndex(np.array([np.nan]), np.array([np.nan]))
+
+    assert index.within(np.array([40.0]), np.array([10.0]), 10_000.0).tolist() == [False]
+
+
+def _feed() -> DateIndexedFeed:
+    near, far = _north_of(40.0, 5.0), _north_of(40.0, 50.0)
+    days = [8, 9, 10, 11, 12, 10, 10, 10]
+    return DateIndexedFeed(TWITTER_FEED, pd.DataFrame({
+        "Year": [2023] * len(days),
+        "Month": ["August"] * len(days),
+        "Day": days,
+        "Disaster_Type": ["wildfire"] * len(days),
+        "Resolved_Latitude": [near, near, near, near, near, far, None, "not a number"],
+        "Resolved_Longitude": [10.0] * len(days),
+        "Title": [f"title {row}" for row in range(len(days))],
+        "Tweet": [f"tweet {row}" for row in range(len(days))],
+        "Extracted_Location": ["somewhere"] * len(days),
+    }))
+
+
+@pytest.mark.parametrize("day_window, expected", [(0, [2]), (1, [1, 2, 3]), (2, [0, 1, 2, 3, 4])])
+def test_positions_near_fires_keep_the_day_window_edges(day_window, expected):
+    index = FirePointIndex(np.array([40.0]), np.array([10.0]))
+
+    positions = positions_near_fires(_feed(), index, date_key(2023, 8, 10), 10.0, day_window)
+
+    # rows 5 to 7 are dated within the window, but too far away or without a usable coordinate
+    assert positions.tolist() == expected
@@ -0,0 +1,57 @@
+import logging
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import app.warm_state
+from app.sdk.kernel_plackster_gateway import KernelPlancksterGateway
+from app.sdk.models import ProtocolEnum
+from app.warm_state import WarmState
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def warm_state(monkeypatch):
+    setups = []
+
+    def setup(job_id, logger, kp_auth_token, kp_host, kp_port, kp_scheme):
+        gateway = KernelPlancksterGateway(kp_host, str(kp_port), kp_auth_token, kp_scheme)
+        gateway._client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="pong")))
+        setups.append(job_id)
+        return gateway, ProtocolEnum.S3, SimpleNamespace(close=lambda: None)
+
+    monkeypatch.setattr(app.warm_state, "setup", setup)
+    state = WarmState()
+    state.setups = setups  # type: ignore
+    yield state
+    state.close()
+
+
+def _repository(warm_state: WarmState, job_id: int):
+    return warm_state.scraped_data_repository(job_id, LOGGER, "token", "kp", 8000, "http")
+
+
+def test_jobs_share_the_warm_clients(warm_state):
+    first, second = _repository(warm_state, 1), _repository(warm_state, 2)
+
+    assert warm_state.setups == [1]  # type: ignore
+    assert first.file_repository is second.file_repository
+    assert first.kernel_planckster.breaker is second.kernel_planckster.breaker
+    assert first.kernel_planckster.health is second.kernel_planckster.health
+    assert first.kernel_planckster._client is second.kernel_planckster._client
+
+
+def test_concurrent_jobs_report_only_their_own_gateway_latencies(warm_state):
+    first = _repository(warm_state, 1)
+    first.kernel_planckster.ping()
+
+    # a job starting while the first one runs does not clear its latencies, nor records into them
+    second = _repository(warm_state, 2)
+    second.kernel_planckster.ping()
+    second.kernel_planckster.ping()
+
+    assert first.kernel_planckster.latencies.snapshot()["GET /ping"]["count"] == 1
+    assert second.kernel_planckster.latencies.snapshot()["GET /ping"]["count"] == 2
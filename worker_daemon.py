@@ -0,0 +1,215 @@
+"""
+A resident augmentation worker that takes its jobs from a queue directory.
+
+Unlike one-shot runs of augment_main.py, the worker pays interpreter startup, imports and the Kernel Planckster
+setup once, and keeps the parsed social feeds and their date indexes warm between jobs.
+
+    <queue_dir>/incoming/<name>.json    a job to run, written by the client (write it elsewhere and rename it in)
+    <queue_dir>/processing/<name>.json  the job being run
+    <queue_dir>/done/<name>.json        the job and its output, once finished
+    <queue_dir>/failed/<name>.json      the job and its output or error, if it failed
+
+A job file holds the `job_id`, `tracer_id` and `work_dir` of the job and, optionally, any other keyword argument of
+augment_main.main except the Kernel Planckster connection, which is the worker's.
+"""
+import inspect
+import json
+import logging
+import os
+import signal
+import time
+from typing import Any, Dict, List
+
+from app.sdk.models import BaseJobState
+import augment_main
+
+
+# the arguments a job file can not set, they are the worker's own
+WORKER_ARGUMENTS = ("kp_auth_token", "kp_host", "kp_port", "kp_scheme", "keep_warm")
+JOB_ARGUMENTS = [name for name in inspect.signature(augment_main.main).parameters if name not in WORKER_ARGUMENTS]
+QUEUE_DIRS = ("incoming", "processing", "done", "failed")
+
+
+class QueueDirWorker:
+    def __init__(self, queue_dir: str, worker_arguments: Dict[str, Any], poll_interval: float = 1.0) -> None:
+        self._queue_dir = queue_dir
+        self._worker_arguments = worker_arguments
+        self._poll_interval = poll_interval
+        self._stopping = False
+        self._logger = logging.getLogger(__name__)
+        for name in QUEUE_DIRS:
+            os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self._logger
+
+    def stop(self, *_: Any) -> None:
+        """
+        Stop once the current job is done.
+        """
+        self._stopping = True
+
+    def pending(self) -> List[str]:
+        """
+        The queued job files, oldest first.
+        """
+        incoming = os.path.join(self._queue_dir, "incoming")
+        names = [name for name in os.listdir(incoming) if name.endswith(".json")]
+        return sorted(names, key=lambda name: (os.path.getmtime(os.path.join(incoming, name)), name))
+
+    def run(self, once: bool = False) -> None:
+        """
+        Run queued jobs one at a time until stopped or, with once, until the queue is empty.
+        """
+        self._fail_interrupted_jobs()
+        while not self._stopping:
+            names = self.pending()
+            if not names:
+                if once:
+                    return
+                time.sleep(self._poll_interval)
+                continue
+            for name in names:
+                if self._stopping:
+                    break
+                self.run_job(name)
+
+    def run_job(self, name: str) -> None:
+        processing_path = os.path.join(self._queue_dir, "processing", name)
+        try:
+            # the rename claims the job, another worker on the same queue dir may have claimed it first
+            os.rename(os.path.join(self._queue_dir, "incoming", name), processing_path)
+        except FileNotFoundError:
+            return
+
+        job: Dict[str, Any] = {}
+        try:
+            with open(processing_path) as f:
+                job = json.load(f)
+            unknown = set(job) - set(JOB_ARGUMENTS)
+            if unknown:
+                raise ValueError(f"Unknown job arguments: {', '.join(sorted(unknown))}")
+
+            self.logger.info(f"Running job {name}")
+            start_time = time.time()
+            job_output = augment_main.main(**job, **self._worker_arguments, keep_warm=True)
+            self.logger.info(f"Job {name} is {job_output.job_state.value} after {time.time() - start_time:.2f}s")
+            result = {"job": job, "output": job_output.model_dump(mode="json")}
+            finished = job_output.job_state == BaseJobState.FINISHED
+        except Exception as error:
+            self.logger.error(f"Job {name} failed. Error:\n{error}")
+            result = {"job": job, "error": str(error)}
+            finished = False
+
+        self._write_result(name, result, "done" if finished else "failed")
+        os.remove(processing_path)
+
+    def _write_result(self, name: str, result: Dict[str, Any], state_dir: str) -> None:
+        result_path = os.path.join(self._queue_dir, state_dir, name)
+        tmp_path = f"{result_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp_path, result_path)
+
+    def _fail_interrupted_jobs(self) -> None:
+        processing = os.path.join(self._queue_dir, "processing")
+        for name in os.listdir(processing):
+            if not name.endswith(".json"):
+                continue
+            self.logger.warning(f"Job {name} was interrupted by a restart, marking it failed")
+            try:
+                with open(os.path.join(processing, name)) as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                job = {}
+            self._write_result(name, {"job": job, "error": "interrupted by a worker restart"}, "failed")
+            os.remove(os.path.join(processing, name))
+
+
+if __name__ == "__main__":
+
+    import argparse
+    from dotenv import load_dotenv
+
+    # Load environment variables, the Kernel Planckster defaults below come from them
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run augmentation jobs from a queue directory, keeping state warm between them.")
+
+    parser.add_argument(
+        "--queue-dir",
+        type=str,
+        default="./.queue",
+        help="The queue directory, with incoming, processing, done and failed subdirectories",
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="How often the queue directory is checked for new jobs, in seconds",
+    )
+
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Exit once the queue is empty instead of waiting for more jobs",
+    )
+
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        default="INFO",
+        help="The log level of the worker. Possible values are DEBUG, INFO, WARNING, ERROR, CRITICAL.",
+    )
+
+    parser.add_argument(
+        "--kp-auth-token",
+        type=str,
+        default=os.getenv("KERNEL_PLANCKSTER_AUTH_TOKEN", ""),
+        help="The Kernel Planckster auth token",
+    )
+
+    parser.add_argument(
+        "--kp-host",
+        type=str,
+        default=os.getenv("KERNEL_PLANCKSTER_HOST", "localhost"),
+        help="The Kernel Planckster host",
+    )
+
+    parser.add_argument(
+        "--kp-port",
+        type=int,
+        default=int(os.getenv("KERNEL_PLANCKSTER_PORT", "8000")),
+        help="The Kernel Planckster port",
+    )
+
+    parser.add_argument(
+        "--kp-scheme",
+        type=str,
+        default=os.getenv("KERNEL_PLANCKSTER_SCHEME", "http"),
+        help="The Kernel Planckster scheme",
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+
+    worker = QueueDirWorker(
+        args.queue_dir,
+        worker_arguments={
+            "kp_auth_token": args.kp_auth_token,
+            "kp_host": args.kp_host,
+            "kp_port": args.kp_port,
+            "kp_scheme": args.kp_scheme,
+        },
+        poll_interval=args.poll_interval,
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.run(once=args.once)
+    finally:
+        from app.warm_state import process_warm_state
+        process_warm_state().close()